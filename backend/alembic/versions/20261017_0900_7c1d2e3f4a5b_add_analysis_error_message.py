@@ -0,0 +1,25 @@
+"""Add error_message to analyses
+
+Revision ID: 7c1d2e3f4a5b
+Revises: 3142b8e35dfd
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1d2e3f4a5b'
+down_revision = '3142b8e35dfd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('analyses', sa.Column('error_message', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('analyses', 'error_message')
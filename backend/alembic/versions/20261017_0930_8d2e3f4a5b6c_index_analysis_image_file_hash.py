@@ -0,0 +1,27 @@
+"""Index analysis_images.file_hash
+
+Revision ID: 8d2e3f4a5b6c
+Revises: 7c1d2e3f4a5b
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e3f4a5b6c'
+down_revision = '7c1d2e3f4a5b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        op.f('ix_analysis_images_file_hash'), 'analysis_images', ['file_hash'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_analysis_images_file_hash'), table_name='analysis_images')
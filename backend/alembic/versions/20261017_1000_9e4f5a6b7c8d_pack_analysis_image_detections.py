@@ -0,0 +1,93 @@
+"""Store detections packed on analysis_images only
+
+Revision ID: 9e4f5a6b7c8d
+Revises: 8d2e3f4a5b6c
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.detections import expand_summary, pack_detections, unpack_detections
+from app.schemas import Detection
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4f5a6b7c8d'
+down_revision = '8d2e3f4a5b6c'
+branch_labels = None
+depends_on = None
+
+
+images = sa.table(
+    'analysis_images',
+    sa.column('id', sa.Integer()),
+    sa.column('analysis_id', sa.Integer()),
+    sa.column('view_type', sa.String()),
+    sa.column('detections_data', sa.JSON()),
+    sa.column('detections_packed', sa.LargeBinary()),
+)
+analyses = sa.table(
+    'analyses',
+    sa.column('id', sa.Integer()),
+    sa.column('summary', sa.JSON()),
+)
+
+
+def upgrade() -> None:
+    op.add_column('analysis_images', sa.Column('detections_packed', sa.LargeBinary(), nullable=True))
+    bind = op.get_bind()
+
+    rows = bind.execute(
+        sa.select(images.c.id, images.c.detections_data).where(images.c.detections_data.is_not(None))
+    )
+    for image_id, data in rows.all():
+        detections = [Detection.model_validate(d) for d in (data or {}).get('detections', [])]
+        bind.execute(
+            images.update()
+            .where(images.c.id == image_id)
+            .values(detections_packed=pack_detections(detections), detections_data=sa.null())
+        )
+
+    for analysis_id, summary in bind.execute(sa.select(analyses.c.id, analyses.c.summary)).all():
+        if not summary or not isinstance(summary.get('views'), dict):
+            continue
+        views = {
+            key: {name: value for name, value in view.items() if name != 'detections'}
+            for key, view in summary['views'].items()
+        }
+        bind.execute(
+            analyses.update()
+            .where(analyses.c.id == analysis_id)
+            .values(summary={**summary, 'views': views})
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    by_analysis: dict = {}
+    rows = bind.execute(
+        sa.select(
+            images.c.id, images.c.analysis_id, images.c.view_type, images.c.detections_packed
+        ).where(images.c.detections_packed.is_not(None))
+    )
+    for image_id, analysis_id, view_type, packed in rows.all():
+        detections = unpack_detections(packed)
+        by_analysis.setdefault(analysis_id, {})[view_type.lower()] = detections
+        bind.execute(
+            images.update()
+            .where(images.c.id == image_id)
+            .values(detections_data={'detections': detections})
+        )
+
+    for analysis_id, summary in bind.execute(sa.select(analyses.c.id, analyses.c.summary)).all():
+        if not summary or not isinstance(summary.get('views'), dict):
+            continue
+        bind.execute(
+            analyses.update()
+            .where(analyses.c.id == analysis_id)
+            .values(summary=expand_summary(summary, by_analysis.get(analysis_id, {})))
+        )
+
+    op.drop_column('analysis_images', 'detections_packed')
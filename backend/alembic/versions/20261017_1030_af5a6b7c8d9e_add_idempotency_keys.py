@@ -0,0 +1,41 @@
+"""Add idempotency_keys
+
+Revision ID: af5a6b7c8d9e
+Revises: 9e4f5a6b7c8d
+Create Date: 2026-10-17 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'af5a6b7c8d9e'
+down_revision = '9e4f5a6b7c8d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+        sa.Column('analysis_id', sa.Integer(), nullable=True),
+        sa.Column('request_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index(
+        op.f('ix_idempotency_keys_analysis_id'), 'idempotency_keys', ['analysis_id'], unique=False
+    )
+    op.create_index(
+        op.f('ix_idempotency_keys_expires_at'), 'idempotency_keys', ['expires_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_idempotency_keys_expires_at'), table_name='idempotency_keys')
+    op.drop_index(op.f('ix_idempotency_keys_analysis_id'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
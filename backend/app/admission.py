@@ -0,0 +1,184 @@
+"""Admission control for the inference endpoints.
+
+Each budget (interactive studies, bulk batches) admits a bounded number of
+requests at once and parks a bounded number of further requests in a FIFO
+wait queue. A request is shed with 503 and ``Retry-After`` instead of queued
+when the queue is full or the wait estimated from recent service times exceeds
+the budget's deadline, and a queued request that is still waiting at the
+deadline is shed the same way. Shedding happens before the upload body is
+read, so an overloaded API answers in milliseconds instead of letting clients
+time out.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, Mapping
+from urllib.parse import parse_qs
+
+from .config import get_settings
+from .exceptions import ServiceUnavailableError
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Weight of the newest service time in the moving average.
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionController:
+    """Bounded in-flight limit plus a bounded, deadline-aware wait queue.
+
+    All methods run on the event loop, so the counters need no lock. A slot
+    freed by ``release`` is handed directly to the oldest waiter.
+    """
+
+    def __init__(
+        self, name: str, max_in_flight: int, max_queue: int, max_wait_s: float
+    ) -> None:
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_s = max_wait_s
+        self.in_flight = 0
+        self.service_time_s = 0.0  # moving average, 0 until the first release
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._counters: Dict[str, int] = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_estimated_wait": 0,
+            "rejected_timed_out": 0,
+        }
+
+    def estimated_wait(self) -> float:
+        """Seconds a request arriving now would wait for a slot."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            return 0.0
+        return (len(self._waiters) + 1) / self.max_in_flight * self.service_time_s
+
+    async def acquire(self) -> None:
+        """Take a slot, wait for one, or raise ``ServiceUnavailableError``."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._counters["admitted"] += 1
+            return
+
+        estimate = self.estimated_wait()
+        if len(self._waiters) >= self.max_queue:
+            self._reject("rejected_queue_full", "queue is full", estimate)
+        if estimate > self.max_wait_s:
+            self._reject("rejected_estimated_wait", "estimated wait exceeds deadline", estimate)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait_s)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._reject("rejected_timed_out", "waited past deadline", self.estimated_wait())
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self._counters["admitted"] += 1
+
+    def release(self, service_time_s: float) -> None:
+        """Free a slot and record how long the request held it."""
+        if self.service_time_s:
+            self.service_time_s += SERVICE_TIME_ALPHA * (service_time_s - self.service_time_s)
+        else:
+            self.service_time_s = service_time_s
+        self._hand_over()
+
+    def stats(self) -> Dict[str, object]:
+        """Return queue depth, limits and admission counters."""
+        return {
+            **self._counters,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait_s,
+            "mean_service_ms": self.service_time_s * 1000,
+            "estimated_wait_ms": self.estimated_wait() * 1000,
+        }
+
+    def _hand_over(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot passes on; in_flight is unchanged
+                return
+        self.in_flight -= 1
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Leave the queue; a slot handed over in the meantime is passed on."""
+        if waiter.done():
+            self._hand_over()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def _reject(self, counter: str, reason: str, estimate: float) -> None:
+        self._counters[counter] += 1
+        retry_after = max(1, math.ceil(estimate or self.service_time_s or 1.0))
+        logger.warning(f"Shedding {self.name} inference request: {reason}")
+        raise ServiceUnavailableError(
+            "Inference capacity exhausted, retry later",
+            details={"budget": self.name, "reason": reason},
+            retry_after=retry_after,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_admission_controller(budget: str) -> AdmissionController:
+    """Shared controller for the ``interactive`` or ``bulk`` budget."""
+    settings = get_settings()
+    return AdmissionController(
+        budget,
+        max_in_flight=getattr(settings, f"{budget}_max_in_flight"),
+        max_queue=getattr(settings, f"{budget}_max_queue"),
+        max_wait_s=getattr(settings, f"{budget}_max_wait_s"),
+    )
+
+
+def _queued_submission(scope) -> bool:
+    """``?async=true`` only stores uploads; the job queue bounds that work."""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("async", [""])[-1].lower() in {"1", "true", "yes", "on"}
+
+
+class AdmissionMiddleware:
+    """Admit requests to the mapped paths through their budget's controller.
+
+    A pure ASGI middleware, so a shed request is answered before its body is
+    read and an admitted one keeps its slot until the response, streamed or
+    not, has been sent.
+    """
+
+    def __init__(self, app, budgets: Mapping[str, str]) -> None:
+        self.app = app
+        self.budgets = dict(budgets)
+
+    async def __call__(self, scope, receive, send) -> None:
+        budget = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            budget = self.budgets.get(scope["path"])
+        if budget is None or _queued_submission(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Request deadlines (app.deadlines) count from arrival, admission wait included.
+        scope.setdefault("state", {})["received_at"] = time.time()
+        controller = get_admission_controller(budget)
+        await controller.acquire()
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(time.monotonic() - started)
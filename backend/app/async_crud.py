@@ -0,0 +1,628 @@
+"""Async CRUD helpers for patient, analysis, and image entities.
+
+Mirrors ``crud`` on an ``AsyncSession`` for the API endpoints, so database
+round trips never block the event loop. ``crud`` remains the sync variant for
+scripts, Alembic, the job worker threads and ``app.worker``.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models, schemas
+from .exceptions import DatabaseError, NotFoundError, ValidationError
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# ============ Patient CRUD ============
+
+async def create_patient(session: AsyncSession, data: schemas.PatientCreate) -> models.Patient:
+    """Create a new patient."""
+    try:
+        # Check for duplicate medical record number
+        if data.medical_record_number:
+            existing = await get_patient_by_mrn(session, data.medical_record_number)
+            if existing:
+                raise ValidationError(
+                    f"Patient with medical record number {data.medical_record_number} already exists"
+                )
+
+        patient = models.Patient(**data.model_dump())
+        session.add(patient)
+        await session.commit()
+        await session.refresh(patient)
+        logger.info(f"Created patient: {patient.id}")
+        return patient
+    except ValidationError:
+        await session.rollback()
+        raise
+    except Exception as exc:
+        logger.error(f"Failed to create patient: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to create patient: {str(exc)}")
+
+
+async def list_patients(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+) -> list[models.Patient]:
+    """List patients with optional filtering."""
+    try:
+        statement = select(models.Patient)
+
+        if search:
+            search_filter = f"%{search}%"
+            statement = statement.where(
+                (models.Patient.full_name.ilike(search_filter)) |
+                (models.Patient.medical_record_number.ilike(search_filter)) |
+                (models.Patient.email.ilike(search_filter))
+            )
+
+        if is_active is not None:
+            statement = statement.where(models.Patient.is_active == is_active)
+
+        statement = statement.order_by(models.Patient.created_at.desc())
+        statement = statement.offset(skip).limit(limit)
+
+        return list((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to list patients: {exc}")
+        raise DatabaseError(f"Failed to list patients: {str(exc)}")
+
+
+async def count_patients(session: AsyncSession, is_active: Optional[bool] = None) -> int:
+    """Count total patients."""
+    try:
+        statement = select(func.count(models.Patient.id))
+        if is_active is not None:
+            statement = statement.where(models.Patient.is_active == is_active)
+        return (await session.exec(statement)).one()
+    except Exception as exc:
+        logger.error(f"Failed to count patients: {exc}")
+        raise DatabaseError(f"Failed to count patients: {str(exc)}")
+
+
+async def get_patient(session: AsyncSession, patient_id: int) -> models.Patient:
+    """Get a patient by ID."""
+    patient = await session.get(models.Patient, patient_id)
+    if not patient:
+        raise NotFoundError(f"Patient with ID {patient_id} not found")
+    return patient
+
+
+async def get_patient_by_mrn(
+    session: AsyncSession, medical_record_number: str
+) -> Optional[models.Patient]:
+    """Get a patient by medical record number, or ``None`` if there is none."""
+    try:
+        result = await session.exec(
+            select(models.Patient).where(
+                models.Patient.medical_record_number == medical_record_number
+            )
+        )
+        return result.first()
+    except Exception as exc:
+        logger.error(f"Failed to look up patient: {exc}")
+        raise DatabaseError(f"Failed to look up patient: {str(exc)}")
+
+
+async def update_patient(
+    session: AsyncSession, patient: models.Patient, data: schemas.PatientUpdate
+) -> models.Patient:
+    """Update a patient."""
+    try:
+        update_payload = data.model_dump(exclude_unset=True)
+        for key, value in update_payload.items():
+            setattr(patient, key, value)
+
+        patient.updated_at = datetime.utcnow()
+        session.add(patient)
+        await session.commit()
+        await session.refresh(patient)
+        logger.info(f"Updated patient: {patient.id}")
+        return patient
+    except Exception as exc:
+        logger.error(f"Failed to update patient: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to update patient: {str(exc)}")
+
+
+async def delete_patient(session: AsyncSession, patient_id: int) -> None:
+    """Soft delete a patient."""
+    try:
+        patient = await get_patient(session, patient_id)
+        patient.is_active = False
+        patient.updated_at = datetime.utcnow()
+        session.add(patient)
+        await session.commit()
+        logger.info(f"Deleted patient: {patient_id}")
+    except NotFoundError:
+        raise
+    except Exception as exc:
+        logger.error(f"Failed to delete patient: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to delete patient: {str(exc)}")
+
+
+# ============ Analysis CRUD ============
+
+async def create_analysis(
+    session: AsyncSession, data: schemas.AnalysisCreate
+) -> models.Analysis:
+    """Create a new analysis."""
+    try:
+        analysis = models.Analysis(**data.model_dump())
+        session.add(analysis)
+        await session.commit()
+        await session.refresh(analysis)
+        logger.info(f"Created analysis: {analysis.id}")
+        return analysis
+    except Exception as exc:
+        logger.error(f"Failed to create analysis: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to create analysis: {str(exc)}")
+
+
+async def list_patient_analyses(
+    session: AsyncSession,
+    patient_id: int,
+    skip: int = 0,
+    limit: int = 50,
+) -> list[models.Analysis]:
+    """List analyses for a patient."""
+    try:
+        statement = (
+            select(models.Analysis)
+            .where(models.Analysis.patient_id == patient_id)
+            .order_by(models.Analysis.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return list((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to list analyses: {exc}")
+        raise DatabaseError(f"Failed to list analyses: {str(exc)}")
+
+
+async def list_all_analyses(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[models.AnalysisStatus] = None,
+    patient_id: Optional[int] = None,
+) -> list[models.Analysis]:
+    """List all analyses with optional filtering."""
+    try:
+        statement = select(models.Analysis)
+
+        if status:
+            statement = statement.where(models.Analysis.status == status)
+        if patient_id:
+            statement = statement.where(models.Analysis.patient_id == patient_id)
+
+        statement = statement.order_by(models.Analysis.created_at.desc())
+        statement = statement.offset(skip).limit(limit)
+
+        return list((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to list analyses: {exc}")
+        raise DatabaseError(f"Failed to list analyses: {str(exc)}")
+
+
+async def get_analysis(session: AsyncSession, analysis_id: int) -> models.Analysis:
+    """Get an analysis by ID."""
+    analysis = await session.get(models.Analysis, analysis_id)
+    if not analysis:
+        raise NotFoundError(f"Analysis with ID {analysis_id} not found")
+    return analysis
+
+
+async def update_analysis(
+    session: AsyncSession,
+    analysis: models.Analysis,
+    data: schemas.AnalysisUpdate,
+) -> models.Analysis:
+    """Update an analysis."""
+    try:
+        update_payload = data.model_dump(exclude_unset=True)
+        for key, value in update_payload.items():
+            setattr(analysis, key, value)
+
+        analysis.updated_at = datetime.utcnow()
+        session.add(analysis)
+        await session.commit()
+        await session.refresh(analysis)
+        logger.info(f"Updated analysis: {analysis.id}")
+        return analysis
+    except Exception as exc:
+        logger.error(f"Failed to update analysis: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to update analysis: {str(exc)}")
+
+
+async def delete_analysis(session: AsyncSession, analysis: models.Analysis) -> None:
+    """Delete an analysis and its associated images."""
+    try:
+        analysis_id = analysis.id
+        await session.delete(analysis)
+        await session.commit()
+        logger.info(f"Deleted analysis: {analysis_id}")
+    except Exception as exc:
+        logger.error(f"Failed to delete analysis: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to delete analysis: {str(exc)}")
+
+
+async def complete_analysis(
+    session: AsyncSession,
+    analysis: models.Analysis,
+    findings_description: Optional[str] = None,
+    recommendations: Optional[str] = None,
+    total_findings: Optional[int] = None,
+    dominant_label: Optional[str] = None,
+    dominant_category: Optional[str] = None,
+    summary: Optional[dict] = None,
+    images: Sequence[schemas.AnalysisImageCreate] = (),
+) -> models.Analysis:
+    """Mark an analysis as completed, optionally recording its inference results.
+
+    ``analysis`` may be new; it is then inserted here. The analysis, its
+    ``images`` (one batched INSERT) and the final status are written in a
+    single transaction.
+    """
+    try:
+        analysis.status = models.AnalysisStatus.COMPLETED
+        analysis.completed_at = datetime.utcnow()
+        analysis.updated_at = datetime.utcnow()
+        analysis.error_message = None
+        if findings_description is not None:
+            analysis.findings_description = findings_description
+        if recommendations is not None:
+            analysis.recommendations = recommendations
+        if total_findings is not None:
+            analysis.total_findings = total_findings
+        if dominant_label is not None:
+            analysis.dominant_label = dominant_label
+        if dominant_category is not None:
+            analysis.dominant_category = dominant_category
+        if summary is not None:
+            analysis.summary = summary
+        session.add(analysis)
+        if images:
+            if analysis.id is None:
+                await session.flush()  # assigns the id the images refer to
+            await session.exec(
+                insert(models.AnalysisImage),
+                params=[{**image.model_dump(), "analysis_id": analysis.id} for image in images],
+            )
+        await session.commit()  # expire_on_commit=False: no refresh needed
+        logger.info(f"Completed analysis: {analysis.id}")
+        return analysis
+    except Exception as exc:
+        logger.error(f"Failed to complete analysis: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to complete analysis: {str(exc)}")
+
+
+async def fail_analysis(
+    session: AsyncSession, analysis: models.Analysis, reason: str
+) -> models.Analysis:
+    """Mark an analysis as failed and record why."""
+    try:
+        analysis.status = models.AnalysisStatus.FAILED
+        analysis.error_message = reason
+        analysis.updated_at = datetime.utcnow()
+        session.add(analysis)
+        await session.commit()  # expire_on_commit=False: no refresh needed
+        logger.info(f"Failed analysis: {analysis.id} ({reason})")
+        return analysis
+    except Exception as exc:
+        logger.error(f"Failed to mark analysis as failed: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to mark analysis as failed: {str(exc)}")
+
+
+# ============ Analysis Image CRUD ============
+
+async def create_analysis_image(
+    session: AsyncSession,
+    analysis_id: int,
+    data: schemas.AnalysisImageCreate,
+) -> models.AnalysisImage:
+    """Create a new analysis image."""
+    try:
+        image_data = data.model_dump()
+        image_data["analysis_id"] = analysis_id
+        image = models.AnalysisImage(**image_data)
+        session.add(image)
+        await session.commit()
+        await session.refresh(image)
+        logger.info(f"Created analysis image: {image.id}")
+        return image
+    except Exception as exc:
+        logger.error(f"Failed to create analysis image: {exc}")
+        await session.rollback()
+        raise DatabaseError(f"Failed to create analysis image: {str(exc)}")
+
+
+async def list_analysis_images(
+    session: AsyncSession, analysis_id: int
+) -> list[models.AnalysisImage]:
+    """List images for an analysis."""
+    try:
+        statement = (
+            select(models.AnalysisImage)
+            .where(models.AnalysisImage.analysis_id == analysis_id)
+            .order_by(models.AnalysisImage.created_at.asc())
+        )
+        return list((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to list analysis images: {exc}")
+        raise DatabaseError(f"Failed to list analysis images: {str(exc)}")
+
+
+async def get_analysis_image(session: AsyncSession, image_id: int) -> models.AnalysisImage:
+    """Get an analysis image by ID."""
+    image = await session.get(models.AnalysisImage, image_id)
+    if not image:
+        raise NotFoundError(f"Analysis image with ID {image_id} not found")
+    return image
+
+
+async def find_image_hashes(session: AsyncSession, hashes: Iterable[str]) -> set[str]:
+    """Return the subset of ``hashes`` already stored on some analysis image."""
+    hashes = list(set(hashes))
+    if not hashes:
+        return set()
+    try:
+        statement = select(models.AnalysisImage.file_hash).where(
+            models.AnalysisImage.file_hash.in_(hashes)
+        )
+        return set((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to look up image hashes: {exc}")
+        raise DatabaseError(f"Failed to look up image hashes: {str(exc)}")
+
+
+# ============ Idempotency Keys ============
+
+async def claim_idempotency_key(
+    session: AsyncSession, key: str, lease_s: float
+) -> Optional[models.IdempotencyKey]:
+    """Reserve ``key`` for a new request.
+
+    Returns ``None`` when the caller now holds the key, otherwise the record of
+    the request holding it (``analysis_id`` is ``None`` while that request is
+    in flight). Expired keys, including abandoned in-flight ones, are purged
+    first and can be claimed again.
+    """
+    now = datetime.utcnow()
+    try:
+        await session.exec(
+            delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < now)
+        )
+        # Core insert: a failed claim must not leave an instance in the session.
+        await session.exec(
+            insert(models.IdempotencyKey).values(
+                key=key, expires_at=now + timedelta(seconds=lease_s)
+            )
+        )
+        await session.commit()
+        return None
+    except IntegrityError:
+        await session.rollback()
+    holder = await session.get(models.IdempotencyKey, key, populate_existing=True)
+    # Released between our insert and this read: report it as in flight so the
+    # caller tries to claim it again.
+    return holder or models.IdempotencyKey(key=key, expires_at=now)
+
+
+async def complete_idempotency_key(
+    session: AsyncSession, key: str, analysis_id: int, request_hash: str, ttl_s: float
+) -> None:
+    """Map a claimed key to its analysis for ``ttl_s`` seconds."""
+    record = await session.get(models.IdempotencyKey, key)
+    if record is None:
+        record = models.IdempotencyKey(key=key, expires_at=datetime.utcnow())
+    record.analysis_id = analysis_id
+    record.request_hash = request_hash
+    record.expires_at = datetime.utcnow() + timedelta(seconds=ttl_s)
+    session.add(record)
+    await session.commit()
+
+
+async def release_idempotency_key(session: AsyncSession, key: str) -> None:
+    """Drop an in-flight claim so a retry of a failed request runs again."""
+    await session.exec(
+        delete(models.IdempotencyKey).where(
+            models.IdempotencyKey.key == key, models.IdempotencyKey.analysis_id.is_(None)
+        )
+    )
+    await session.commit()
+
+
+async def forget_idempotency_key(session: AsyncSession, key: str) -> None:
+    """Drop a key whose analysis no longer exists."""
+    await session.exec(delete(models.IdempotencyKey).where(models.IdempotencyKey.key == key))
+    await session.commit()
+
+
+# ============ Statistics ============
+
+async def get_statistics(session: AsyncSession) -> dict:
+    """Get overall statistics."""
+    try:
+        async def count(model, *conditions) -> int:
+            return (await session.exec(select(func.count(model.id)).where(*conditions))).one()
+
+        total_findings = (
+            await session.exec(select(func.sum(models.Analysis.total_findings)))
+        ).one() or 0
+
+        return {
+            "total_patients": await count(models.Patient),
+            "active_patients": await count(models.Patient, models.Patient.is_active == True),
+            "total_analyses": await count(models.Analysis),
+            "completed_analyses": await count(
+                models.Analysis, models.Analysis.status == models.AnalysisStatus.COMPLETED
+            ),
+            "pending_analyses": await count(
+                models.Analysis, models.Analysis.status == models.AnalysisStatus.PENDING
+            ),
+            "processing_analyses": await count(
+                models.Analysis, models.Analysis.status == models.AnalysisStatus.PROCESSING
+            ),
+            "failed_analyses": await count(
+                models.Analysis, models.Analysis.status == models.AnalysisStatus.FAILED
+            ),
+            "total_findings": int(total_findings),
+        }
+    except Exception as exc:
+        logger.error(f"Failed to get statistics: {exc}")
+        raise DatabaseError(f"Failed to get statistics: {str(exc)}")
+
+
+async def count_analyses(
+    session: AsyncSession,
+    status: Optional[models.AnalysisStatus] = None,
+    patient_id: Optional[int] = None,
+) -> int:
+    """Count analyses with filters."""
+    try:
+        statement = select(func.count(models.Analysis.id))
+
+        if status:
+            statement = statement.where(models.Analysis.status == status)
+        if patient_id:
+            statement = statement.where(models.Analysis.patient_id == patient_id)
+
+        return (await session.exec(statement)).one()
+    except Exception as exc:
+        logger.error(f"Failed to count analyses: {exc}")
+        raise DatabaseError(f"Failed to count analyses: {str(exc)}")
+
+
+async def search_patients(
+    session: AsyncSession,
+    query: str,
+    limit: int = 10
+) -> list[models.Patient]:
+    """Search patients by name, MRN, email, phone."""
+    try:
+        search_filter = f"%{query}%"
+        statement = (
+            select(models.Patient)
+            .where(
+                (models.Patient.full_name.ilike(search_filter)) |
+                (models.Patient.medical_record_number.ilike(search_filter)) |
+                (models.Patient.email.ilike(search_filter)) |
+                (models.Patient.phone.ilike(search_filter))
+            )
+            .where(models.Patient.is_active == True)
+            .limit(limit)
+        )
+        return list((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to search patients: {exc}")
+        raise DatabaseError(f"Failed to search patients: {str(exc)}")
+
+
+async def search_analyses(
+    session: AsyncSession,
+    query: str,
+    limit: int = 10
+) -> list[models.Analysis]:
+    """Search analyses by ID, dominant label, findings."""
+    try:
+        statement = select(models.Analysis)
+
+        # Try to parse as ID
+        if query.isdigit():
+            statement = statement.where(models.Analysis.id == int(query))
+        else:
+            search_filter = f"%{query}%"
+            statement = statement.where(
+                (models.Analysis.dominant_label.ilike(search_filter)) |
+                (models.Analysis.findings_description.ilike(search_filter))
+            )
+
+        statement = statement.order_by(models.Analysis.created_at.desc()).limit(limit)
+        return list((await session.exec(statement)).all())
+    except Exception as exc:
+        logger.error(f"Failed to search analyses: {exc}")
+        raise DatabaseError(f"Failed to search analyses: {str(exc)}")
+
+
+async def get_analysis_trends(
+    session: AsyncSession,
+    days: int = 30
+) -> dict:
+    """Get analysis trends for the last N days."""
+    try:
+        start_date = datetime.utcnow() - timedelta(days=days)
+
+        # Get all analyses from start_date
+        statement = (
+            select(models.Analysis)
+            .where(models.Analysis.created_at >= start_date)
+            .order_by(models.Analysis.created_at.asc())
+        )
+        analyses = (await session.exec(statement)).all()
+
+        # Group by date
+        daily_data = defaultdict(lambda: {"count": 0, "findings": 0})
+
+        for analysis in analyses:
+            date_key = analysis.created_at.strftime("%Y-%m-%d")
+            daily_data[date_key]["count"] += 1
+            daily_data[date_key]["findings"] += analysis.total_findings or 0
+
+        # Generate labels and values
+        labels = []
+        counts = []
+        findings = []
+
+        for i in range(days):
+            date = (datetime.utcnow() - timedelta(days=days-i-1)).strftime("%Y-%m-%d")
+            labels.append(date)
+            counts.append(daily_data[date]["count"])
+            findings.append(daily_data[date]["findings"])
+
+        return {
+            "labels": labels,
+            "analyses": counts,
+            "findings": findings,
+        }
+    except Exception as exc:
+        logger.error(f"Failed to get analysis trends: {exc}")
+        raise DatabaseError(f"Failed to get analysis trends: {str(exc)}")
+
+
+async def get_findings_breakdown(session: AsyncSession) -> dict:
+    """Get breakdown of findings by category."""
+    try:
+        # Count by dominant category
+        breakdown = {}
+        for category in ("normal", "benign", "malignant"):
+            breakdown[category] = (
+                await session.exec(
+                    select(func.count(models.Analysis.id))
+                    .where(models.Analysis.dominant_category == category)
+                )
+            ).one()
+        return breakdown
+    except Exception as exc:
+        logger.error(f"Failed to get findings breakdown: {exc}")
+        raise DatabaseError(f"Failed to get findings breakdown: {str(exc)}")
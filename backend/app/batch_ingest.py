@@ -0,0 +1,177 @@
+"""Manifest and archive handling for batch study submissions (``/infer/batch``)."""
+
+from __future__ import annotations
+
+import io
+import json
+import tarfile
+import threading
+import zipfile
+from typing import Dict, Iterator, List, Optional, Sequence, TypeVar
+
+from fastapi import UploadFile
+from pydantic import TypeAdapter
+from pydantic import ValidationError as PydanticValidationError
+
+from . import schemas
+from .exceptions import ValidationError
+
+MULTI_VIEWS = frozenset({"lcc", "rcc", "lmlo", "rmlo"})
+MANIFEST_NAME = "manifest.json"
+
+T = TypeVar("T")
+
+_manifest_adapter = TypeAdapter(List[schemas.BatchStudy])
+
+
+def parse_manifest(raw: str | bytes) -> List[schemas.BatchStudy]:
+    """Parse a manifest: a JSON list of studies, or ``{"studies": [...]}``."""
+    try:
+        data = json.loads(raw)
+        if isinstance(data, dict):
+            data = data.get("studies")
+        studies = _manifest_adapter.validate_python(data)
+    except (ValueError, PydanticValidationError) as exc:
+        raise ValidationError(f"Invalid batch manifest: {exc}")
+    if not studies:
+        raise ValidationError("Batch manifest lists no studies")
+    for index, study in enumerate(studies):
+        if study.mode == "multi" and set(study.views) != MULTI_VIEWS:
+            raise ValidationError(
+                f"Study {study.study_id or index} must map either 'image' or all of "
+                f"{sorted(MULTI_VIEWS)} to files"
+            )
+    return studies
+
+
+def _member_name(name: str) -> str:
+    return name[2:] if name.startswith("./") else name
+
+
+class _TarMember(io.RawIOBase):
+    """One tar member with its own position over the archive's shared file.
+
+    ``tarfile.ExFileObject``s of an archive share the archive's file position,
+    so members read concurrently (one group stored while the previous one is
+    decoded) would get each other's bytes. Like ``zipfile._SharedFile``, every
+    read seeks to the member's data under a lock shared by the archive.
+    """
+
+    def __init__(self, fileobj, lock: threading.Lock, offset: int, size: int) -> None:
+        super().__init__()
+        self._fileobj = fileobj
+        self._lock = lock
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self._size - self._pos)
+        if count <= 0:
+            return 0
+        with self._lock:
+            self._fileobj.seek(self._offset + self._pos)
+            data = self._fileobj.read(count)
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def _tar_member_file(bundle: tarfile.TarFile, member: tarfile.TarInfo, lock: threading.Lock):
+    if member.sparse is not None:
+        # Sparse members are rare and need tarfile's hole handling; read them whole.
+        with lock:
+            return io.BytesIO(bundle.extractfile(member).read())
+    return io.BufferedReader(_TarMember(bundle.fileobj, lock, member.offset_data, member.size))
+
+
+def archive_members(archive: UploadFile) -> Dict[str, UploadFile]:
+    """Open every regular file of a zip or tar upload as an ``UploadFile``.
+
+    Members are read lazily from the spooled archive; nothing is extracted to
+    a temporary directory. Each member can be read independently of the
+    others. Compressed tars work but seek slowly, so plain tar or zip is
+    preferable for large batches.
+    """
+    source = archive.file
+    source.seek(0)
+    if zipfile.is_zipfile(source):
+        source.seek(0)
+        bundle = zipfile.ZipFile(source)
+        return {
+            _member_name(info.filename): UploadFile(
+                bundle.open(info), filename=_member_name(info.filename), size=info.file_size
+            )
+            for info in bundle.infolist()
+            if not info.is_dir()
+        }
+    source.seek(0)
+    try:
+        bundle = tarfile.open(fileobj=source, mode="r:*")
+    except tarfile.TarError as exc:
+        raise ValidationError(f"Archive must be a zip or tar file: {exc}")
+    lock = threading.Lock()
+    return {
+        _member_name(member.name): UploadFile(
+            _tar_member_file(bundle, member, lock), filename=_member_name(member.name), size=member.size
+        )
+        for member in bundle.getmembers()
+        if member.isfile()
+    }
+
+
+async def collect_batch(
+    manifest: Optional[str],
+    files: Sequence[UploadFile],
+    archive: Optional[UploadFile],
+) -> tuple[List[schemas.BatchStudy], Dict[str, UploadFile]]:
+    """Resolve a batch submission into its studies and the uploads they reference.
+
+    Files come from the multipart list (by filename) and/or the archive (by
+    member path). Without a ``manifest`` form field the archive's
+    ``manifest.json`` is used.
+    """
+    members: Dict[str, UploadFile] = {}
+    if archive is not None:
+        members.update(archive_members(archive))
+    for upload in files:
+        members[upload.filename or ""] = upload
+
+    if manifest is None:
+        manifest_upload = members.pop(MANIFEST_NAME, None)
+        if manifest_upload is None:
+            raise ValidationError(f"A manifest form field or an archived {MANIFEST_NAME} is required")
+        await manifest_upload.seek(0)
+        manifest = (await manifest_upload.read()).decode()
+    studies = parse_manifest(manifest)
+
+    missing = sorted(
+        {name for study in studies for name in study.views.values()} - set(members)
+    )
+    if missing:
+        raise ValidationError("Manifest references files that were not uploaded", {"missing": missing})
+    return studies, members
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    """Consecutive slices of ``items`` with at most ``size`` elements."""
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
@@ -0,0 +1,162 @@
+"""Dynamic micro-batching in front of a model service."""
+
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List
+
+from .image_decode import ImageInput
+from .logger import get_logger
+from .schemas import ViewPrediction
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _PendingPrediction:
+    """Image waiting in the batch queue together with its result future."""
+
+    image: ImageInput
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # The caller's context, so the batch is traced as part of a request.
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+class MicroBatchingService:
+    """Coalesce concurrent single-image predictions into batched model calls.
+
+    Callers keep using ``predict``/``predict_batch``; pending images are collected
+    for at most ``max_wait_ms`` (or until ``max_batch_size`` is reached) and sent
+    to the wrapped service's ``predict_many`` as one batch.
+    """
+
+    def __init__(
+        self,
+        service,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        workers: int = 1,
+    ) -> None:
+        self.service = service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_PendingPrediction]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        self._largest_batch = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._total_queue_wait = 0.0
+        # One worker per replica lets batches run concurrently on a replica pool.
+        self._workers = [
+            threading.Thread(target=self._run, name=f"micro-batcher-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def __getattr__(self, name: str):
+        # Expose the wrapped service's attributes (model_info, imgsz, ...).
+        return getattr(self.service, name)
+
+    def predict(self, image: ImageInput) -> ViewPrediction:
+        """Queue an image and block until its batch has been predicted."""
+        return self.submit(image).result()
+
+    def predict_batch(self, images: Dict[str, ImageInput]) -> Dict[str, ViewPrediction]:
+        """Queue several named views and wait until all have been predicted."""
+        futures = {view: self.submit(image) for view, image in images.items()}
+        return {view: future.result() for view, future in futures.items()}
+
+    def predict_many(self, images: List[ImageInput]) -> List[ViewPrediction]:
+        """Queue several images and wait for all of their predictions."""
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+
+    def submit(self, image: ImageInput) -> Future:
+        """Queue an image for the next batch and return its result future."""
+        pending = _PendingPrediction(image=image)
+        self._queue.put(pending)
+        return pending.future
+
+    def stats(self) -> Dict[str, object]:
+        """Return queue-depth and batch-size statistics."""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "workers": len(self._workers),
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "images": self._images,
+                "mean_batch_size": self._images / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_wait_ms": (
+                    self._total_queue_wait / self._images * 1000.0 if self._images else 0.0
+                ),
+            }
+
+    def _run(self) -> None:
+        """Worker loop: gather a batch, run it, repeat."""
+        while True:
+            batch = self._collect_batch()
+            self._execute(batch)
+
+    def _collect_batch(self) -> List[_PendingPrediction]:
+        """Block for the first image, then gather more until full or timed out."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _execute(self, batch: List[_PendingPrediction]) -> None:
+        """Run one batch through the wrapped service and resolve the futures."""
+        started = time.monotonic()
+        with self._stats_lock:
+            self._batches += 1
+            self._images += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._total_queue_wait += sum(started - item.enqueued_at for item in batch)
+
+        images = [item.image for item in batch]
+        try:
+            predictions = batch[0].context.run(self.service.predict_many, images)
+        except Exception as exc:
+            logger.error(f"Batched inference failed for {len(batch)} image(s): {exc}")
+            for item in batch:
+                item.future.set_exception(exc)
+            return
+
+        for item, prediction in zip(batch, predictions):
+            item.future.set_result(prediction)
+
+
+@lru_cache(maxsize=None)
+def get_micro_batcher(
+    service, max_batch_size: int, max_wait_ms: float, workers: int = 1
+) -> MicroBatchingService:
+    """Return the shared micro-batcher wrapping ``service``."""
+    logger.info(
+        f"Micro-batching enabled (max_batch_size={max_batch_size}, "
+        f"max_wait_ms={max_wait_ms}, workers={workers})"
+    )
+    return MicroBatchingService(
+        service, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, workers=workers
+    )
@@ -0,0 +1,466 @@
+"""Resumable bulk ingest of historical mammograms from a directory tree.
+
+Walks ``ROOT``, maps each image to a patient, study and view with a filename
+rule, and runs every study through the same storage, model and database code
+as the API::
+
+    python -m app.bulk_ingest /data/archive --create-patients
+
+The default rule expects ``<patient>/<study>/<file>`` where the file name
+contains the view (``L_CC``, ``RMLO``, ...); pass ``--pattern`` with named
+groups ``patient``, ``study`` and ``view`` for other layouts. A study with all
+four views becomes a multi-view analysis, any other image a single-view one.
+
+Reading, hashing and decoding run in ``--workers`` processes while the main
+process predicts ``--batch-size`` studies per model call and writes the
+results. Images whose hash is already stored are skipped, and every finished
+study is appended to the ``--checkpoint`` file so an interrupted run picks up
+where it stopped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import mimetypes
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from fastapi import UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from . import crud, models, schemas
+from .batch_ingest import MULTI_VIEWS
+from .config import get_settings
+from .image_decode import DecodedImage, decode_image
+from .logger import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+DEFAULT_PATTERN = (
+    r"^(?P<patient>[^/]+)/(?:(?P<study>[^/]+)/)?"
+    r"(?:[^/]*?(?<![a-z])(?P<view>[lr][_-]?(?:cc|mlo))(?![a-z]))?[^/]*$"
+)
+DEFAULT_CHECKPOINT = "bulk_ingest_checkpoint.jsonl"
+READ_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+REPORT_INTERVAL_S = 10.0
+
+
+@dataclass
+class Study:
+    """Images of one future analysis, keyed by view (``image`` for single)."""
+
+    key: str
+    patient: str
+    mode: str
+    files: Dict[str, Path]
+
+
+@dataclass
+class LoadedImage:
+    """Result of reading one image in a worker process."""
+
+    file_hash: str
+    image: Optional[DecodedImage] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestReport:
+    """Counters of a bulk-ingest run."""
+
+    completed: int = 0
+    failed: int = 0
+    duplicates: int = 0
+    resumed: int = 0
+    unmatched: int = 0
+    images: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / max(time.perf_counter() - self.started, 1e-9)
+
+
+def normalise_view(view: Optional[str]) -> Optional[str]:
+    """``L_CC``/``l-mlo``/``RCC`` -> ``lcc``/``lmlo``/``rcc``; other values -> ``None``."""
+    if not view:
+        return None
+    name = re.sub(r"[^a-z]", "", view.lower())
+    return name if name in MULTI_VIEWS else None
+
+
+def discover_studies(
+    root: Path,
+    pattern: str = DEFAULT_PATTERN,
+    extensions: Optional[Iterable[str]] = None,
+) -> List[Study]:
+    """Group the images under ``root`` into studies using the filename rule.
+
+    ``pattern`` is matched case-insensitively against each path relative to
+    ``root`` (with ``/`` separators) and must define a ``patient`` group.
+    Files it does not match are logged and ignored.
+    """
+    rule = re.compile(pattern, re.IGNORECASE)
+    if "patient" not in rule.groupindex:
+        raise ValueError("The filename pattern needs a named 'patient' group")
+    allowed = {ext.lower() for ext in (extensions or get_settings().allowed_extensions)}
+
+    grouped: Dict[Tuple[str, str], Dict[str, List[Path]]] = {}
+    singles: List[Study] = []
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in allowed:
+            continue
+        relative = path.relative_to(root).as_posix()
+        match = rule.search(relative)
+        if match is None:
+            logger.warning(f"Skipping {relative}: does not match the filename rule")
+            continue
+        groups = match.groupdict()
+        patient = groups["patient"]
+        view = normalise_view(groups.get("view"))
+        study = groups.get("study")
+        if view is None or study is None:
+            singles.append(Study(relative, patient, "single", {"image": path}))
+            continue
+        grouped.setdefault((patient, study), {}).setdefault(view, []).append(path)
+
+    studies: List[Study] = []
+    for (patient, study), views in grouped.items():
+        if set(views) == MULTI_VIEWS and all(len(paths) == 1 for paths in views.values()):
+            files = {view: paths[0] for view, paths in sorted(views.items())}
+            studies.append(Study(f"{patient}/{study}", patient, "multi", files))
+            continue
+        for paths in views.values():
+            for path in paths:
+                relative = path.relative_to(root).as_posix()
+                singles.append(Study(relative, patient, "single", {"image": path}))
+    return studies + sorted(singles, key=lambda study: study.key)
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of the studies a run has finished."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                        self.done[entry["study"]] = entry["status"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # a line cut short by an interrupted run
+        self._handle = path.open("a", encoding="utf-8")
+
+    def pending(self, study: Study, retry_failed: bool = False) -> bool:
+        """Whether ``study`` still has to be ingested."""
+        status = self.done.get(study.key)
+        return status is None or (retry_failed and status == "failed")
+
+    def record(self, study: Study, status: str, **details: object) -> None:
+        self.done[study.key] = status
+        self._handle.write(json.dumps({"study": study.key, "status": status, **details}) + "\n")
+        self._handle.flush()
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+def load_study(files: Dict[str, Path], target_size: Optional[int]) -> Dict[str, LoadedImage]:
+    """Read, hash and decode the images of a study (runs in a worker process)."""
+    loaded: Dict[str, LoadedImage] = {}
+    for view, path in files.items():
+        digest = hashlib.sha256()
+        with path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(READ_CHUNK_SIZE), b""):
+                digest.update(chunk)
+            handle.seek(0)
+            try:
+                image: Optional[DecodedImage] = decode_image(handle, target_size)
+                error = None
+            except Exception as exc:
+                image, error = None, f"{path.name} is not a valid image: {exc}"
+        loaded[view] = LoadedImage(digest.hexdigest(), image, error)
+    return loaded
+
+
+def _load_all(
+    studies: List[Study], target_size: Optional[int], executor: Optional[Executor], window: int
+) -> Iterator[Tuple[Study, Union[Dict[str, LoadedImage], Exception]]]:
+    """Yield studies with their loaded images, keeping ``window`` loads in flight."""
+    if executor is None:
+        for study in studies:
+            try:
+                yield study, load_study(study.files, target_size)
+            except Exception as exc:
+                yield study, exc
+        return
+
+    in_flight: Deque[Tuple[Study, Future]] = deque()
+    queue = iter(studies)
+    for study in queue:
+        in_flight.append((study, executor.submit(load_study, study.files, target_size)))
+        if len(in_flight) >= window:
+            break
+    while in_flight:
+        study, future = in_flight.popleft()
+        next_study = next(queue, None)
+        if next_study is not None:
+            in_flight.append((next_study, executor.submit(load_study, next_study.files, target_size)))
+        try:
+            yield study, future.result()
+        except Exception as exc:
+            yield study, exc
+
+
+class BulkIngest:
+    """Drives one run: dedupe, batch prediction, storage and checkpointing."""
+
+    def __init__(
+        self,
+        checkpoint: Checkpoint,
+        create_patients: bool = False,
+        batch_size: int = 8,
+        service=None,
+    ) -> None:
+        # Imported here so worker processes never load the API or the model.
+        from . import main as api
+
+        self.api = api
+        self.checkpoint = checkpoint
+        self.create_patients = create_patients
+        self.batch_size = max(1, batch_size)
+        self.service = service or api.get_model_service()
+        self.report = IngestReport()
+        self._seen_hashes: Set[str] = set()
+        self._patients: Dict[str, Optional[int]] = {}
+        self._last_report = time.perf_counter()
+        # One event loop for the whole run, shared by every study's storage.
+        self._runner: Optional[asyncio.Runner] = None
+
+    def run(
+        self,
+        studies: List[Study],
+        workers: int = 0,
+        retry_failed: bool = False,
+    ) -> IngestReport:
+        """Ingest every pending study; ``workers=0`` loads images in-process."""
+        pending = [study for study in studies if self.checkpoint.pending(study, retry_failed)]
+        self.report.resumed = len(studies) - len(pending)
+        if self.report.resumed:
+            logger.info(f"Resuming: {self.report.resumed} studies already in the checkpoint")
+        target_size = self.api._decode_target_size(self.service)
+
+        executor: Optional[Executor] = None
+        if workers > 0:
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        self._runner = asyncio.Runner()
+        try:
+            batch: List[Tuple[Study, Dict[str, LoadedImage]]] = []
+            for study, loaded in _load_all(pending, target_size, executor, max(1, workers) * 4):
+                if isinstance(loaded, Exception):
+                    self._fail(study, None, f"Could not read study: {loaded}")
+                    continue
+                if not self._admit(study, loaded):
+                    continue
+                batch.append((study, loaded))
+                if len(batch) >= self.batch_size:
+                    self._ingest_batch(batch)
+                    batch = []
+            if batch:
+                self._ingest_batch(batch)
+        finally:
+            self._runner.close()
+            self._runner = None
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        self._log_progress(final=True)
+        return self.report
+
+    def _admit(self, study: Study, loaded: Dict[str, LoadedImage]) -> bool:
+        """Skip studies whose images are all stored already, or whose patient is unknown."""
+        hashes = {image.file_hash for image in loaded.values()}
+        with self.api.session_scope() as session:
+            stored = crud.find_image_hashes(session, hashes) | (hashes & self._seen_hashes)
+        if hashes <= stored:
+            self.report.duplicates += 1
+            self.checkpoint.record(study, "duplicate")
+            return False
+        if self._patient_id(study.patient) is None:
+            self.report.unmatched += 1
+            logger.warning(f"Skipping {study.key}: no patient with record number {study.patient}")
+            return False
+        self._seen_hashes |= hashes
+        return True
+
+    def _patient_id(self, record_number: str) -> Optional[int]:
+        if record_number not in self._patients:
+            with self.api.session_scope() as session:
+                patient = crud.get_patient_by_mrn(session, record_number)
+                if patient is None and self.create_patients:
+                    patient = crud.create_patient(
+                        session,
+                        schemas.PatientCreate(
+                            full_name=record_number, medical_record_number=record_number
+                        ),
+                    )
+                self._patients[record_number] = patient.id if patient else None
+        return self._patients[record_number]
+
+    def _ingest_batch(self, batch: List[Tuple[Study, Dict[str, LoadedImage]]]) -> None:
+        """Predict a batch of studies with one model call, then store each study."""
+        for study, outcome in zip(batch, self._predict(batch)):
+            self._store(study[0], study[1], outcome)
+            self._log_progress()
+
+    def _predict(self, batch: List[Tuple[Study, Dict[str, LoadedImage]]]) -> List[Union[dict, Exception]]:
+        """One flat model batch; on failure each study is retried on its own."""
+        def predict(studies):
+            images: Dict[str, LoadedImage] = {}
+            for index, (_, loaded) in enumerate(studies):
+                for view, image in loaded.items():
+                    if image.error:
+                        raise ValueError(image.error)
+                    images[f"{index}/{view}"] = image
+            flat = self.api._predict_cached_sync(
+                self.service,
+                list(images),
+                lambda key: images[key].file_hash,
+                lambda key: images[key].image,
+            )
+            results: List[dict] = [{} for _ in studies]
+            for key, prediction in flat.items():
+                index, view = key.split("/", 1)
+                results[int(index)][view] = prediction
+            return results
+
+        if len(batch) > 1:
+            try:
+                return predict(batch)
+            except Exception as exc:
+                logger.warning(f"Batched prediction of {len(batch)} studies failed, running them one by one: {exc}")
+        outcomes: List[Union[dict, Exception]] = []
+        for item in batch:
+            try:
+                outcomes.extend(predict([item]))
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
+
+    def _store(self, study: Study, loaded: Dict[str, LoadedImage], outcome: Union[dict, Exception]) -> None:
+        """Store the files and thumbnails, then write the analysis in one transaction.
+
+        If the study fails after its files were stored, they are deleted again.
+        """
+        api = self.api
+        patient_id = self._patient_id(study.patient)
+        analysis = models.Analysis(
+            patient_id=patient_id, mode=study.mode, status=models.AnalysisStatus.PROCESSING
+        )
+        files: Dict[str, Dict[str, object]] = {}
+        with api.session_scope() as session:
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                uploads = _open_uploads(study.files)
+                try:
+                    files = self._runner.run(api._ingest_uploads(uploads, study.mode, patient_id))
+                finally:
+                    for upload in uploads.values():
+                        upload.file.close()
+                for view, file_info in files.items():
+                    api.file_manager.store_thumbnail(file_info, Image.fromarray(loaded[view].image.pixels))
+                api._complete_analysis_sync(session, analysis, study.mode, outcome, files)
+            except Exception as exc:
+                for file_info in files.values():
+                    api.file_manager.remove_file(str(file_info["file_path"]))
+                self._fail(study, (session, analysis), api._failure_reason(exc))
+                return
+            analysis_id = analysis.id
+        self.report.completed += 1
+        self.report.images += len(study.files)
+        self.checkpoint.record(study, "completed", analysis_id=analysis_id)
+
+    def _fail(self, study: Study, target, reason: str) -> None:
+        logger.error(f"Failed to ingest {study.key}: {reason}")
+        if target is not None:
+            session, analysis = target
+            crud.fail_analysis(session, analysis, reason)
+        self.report.failed += 1
+        self.checkpoint.record(study, "failed", reason=reason)
+
+    def _log_progress(self, final: bool = False) -> None:
+        now = time.perf_counter()
+        if not final and now - self._last_report < REPORT_INTERVAL_S:
+            return
+        self._last_report = now
+        report = self.report
+        logger.info(
+            f"{'Finished' if final else 'Progress'}: {report.images} images, "
+            f"{report.completed} studies completed, {report.failed} failed, "
+            f"{report.duplicates} duplicates, {report.unmatched} unmatched "
+            f"({report.images_per_second:.1f} images/s)"
+        )
+
+
+def _open_uploads(files: Dict[str, Path]) -> Dict[str, UploadFile]:
+    uploads: Dict[str, UploadFile] = {}
+    for view, path in files.items():
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        uploads[view] = UploadFile(
+            path.open("rb"),
+            filename=path.name,
+            size=path.stat().st_size,
+            headers=Headers({"content-type": content_type}),
+        )
+    return uploads
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point for ``python -m app.bulk_ingest``."""
+    parser = argparse.ArgumentParser(prog="python -m app.bulk_ingest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", type=Path, help="directory tree of historical images")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="regex with named groups patient, study, view")
+    parser.add_argument("--checkpoint", type=Path, default=Path(DEFAULT_CHECKPOINT), help="resume file (JSON lines)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="decode processes (0: in-process)")
+    parser.add_argument("--batch-size", type=int, default=get_settings().inference_batch_studies, help="studies per model call")
+    parser.add_argument("--create-patients", action="store_true", help="create patients for unknown record numbers")
+    parser.add_argument("--retry-failed", action="store_true", help="retry studies the checkpoint lists as failed")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if not args.root.is_dir():
+        parser.error(f"{args.root} is not a directory")
+    studies = discover_studies(args.root, args.pattern)
+    logger.info(f"Found {len(studies)} studies under {args.root}")
+
+    checkpoint = Checkpoint(args.checkpoint)
+    try:
+        ingest = BulkIngest(checkpoint, args.create_patients, args.batch_size)
+        report = ingest.run(studies, workers=args.workers, retry_failed=args.retry_failed)
+    finally:
+        checkpoint.close()
+    print(
+        f"{report.completed} studies ingested ({report.images} images, "
+        f"{report.images_per_second:.1f} images/s), {report.failed} failed, "
+        f"{report.duplicates} duplicates, {report.unmatched} without a patient, "
+        f"{report.resumed} done in earlier runs"
+    )
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -33,6 +33,44 @@ class Settings(BaseSettings):
     model_imgsz: Optional[int] = 1280
     model_iou: Optional[float] = 0.4
     model_augment: bool = False
+    model_auto_crop: bool = False  # crop to the breast region before inference
+    
+    # Inference scheduling
+    model_batch_size: int = 1  # >1 enables micro-batching of concurrent requests
+    model_batch_wait_ms: float = 5.0
+    model_replicas: int = 1  # >1 loads a pool of replicas sharing the weights
+    model_threads_per_replica: Optional[int] = None  # defaults to cpu_count // replicas
+    model_process_workers: int = 2  # worker processes when MODEL_TYPE=process
+    inference_cache_max_bytes: int = 0  # in-process result cache, 0 disables (opt in, e.g. 67108864)
+    reduced_decode: bool = True  # decode oversized uploads close to MODEL_IMGSZ
+    inference_job_workers: int = 2  # worker threads for ?async=true submissions
+    inference_job_queue_size: int = 64  # queued jobs before submissions get 503
+    inference_batch_studies: int = 8  # studies per model batch in /infer/batch
+    job_backend: str = "thread"  # "thread" (in-process) or "redis" (app.worker fleet)
+    job_stream: str = "inference:jobs"
+    job_group: str = "inference-workers"
+    worker_batch_size: int = 4  # jobs read and predicted together by app.worker
+    worker_block_ms: int = 5000  # XREADGROUP block time while idle
+    worker_visibility_timeout_s: int = 300  # unacked jobs older than this are redelivered
+    worker_max_deliveries: int = 3  # deliveries before a job is marked FAILED
+    idempotency_ttl_s: int = 24 * 3600  # Idempotency-Key -> analysis mapping lifetime
+    idempotency_lease_s: int = 600  # in-flight claims older than this can be retaken
+    idempotency_wait_s: float = 60.0  # retry waits this long for the original, then 409
+    
+    # Admission control: concurrent requests, waiting requests and the wait
+    # beyond which requests are shed with 503 (interactive = /infer/single,
+    # /infer/multi and /infer/multi/stream; bulk = /infer/batch)
+    interactive_max_in_flight: int = 4
+    interactive_max_queue: int = 32
+    interactive_max_wait_s: float = 10.0
+    bulk_max_in_flight: int = 1
+    bulk_max_queue: int = 4
+    bulk_max_wait_s: float = 30.0
+    
+    # Deadlines: queued inference older than this (or the X-Request-Timeout
+    # header) is dropped before the model and its analysis FAILED
+    inference_deadline_s: float = 30.0
+    bulk_deadline_s: Optional[float] = None  # /infer/batch, no deadline by default
     
     # File Storage
     upload_dir: str = "uploads"
@@ -52,7 +90,18 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_file: Optional[str] = "logs/app.log"
     
-    # Redis (for caching)
+    # Tracing: "none", "jsonl" (spans appended to TRACE_FILE) or "otlp"
+    # (OTLP/HTTP JSON posted to OTLP_ENDPOINT/v1/traces)
+    trace_exporter: str = "none"
+    trace_file: str = "logs/traces.jsonl"
+    otlp_endpoint: str = "http://localhost:4318"
+    
+    # On-demand profiling (/admin/profiling, X-Profiling-Token header);
+    # disabled unless a token is set
+    profiling_token: Optional[str] = None
+    profiling_dir: str = "logs/profiles"
+    
+    # Redis (result cache second tier when set)
     redis_url: Optional[str] = None
     cache_ttl: int = 3600
     
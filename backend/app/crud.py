@@ -3,9 +3,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Iterable, Optional, Sequence
 
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from sqlmodel import Session, select
 
 from . import models, schemas
@@ -98,6 +98,19 @@ def get_patient(session: Session, patient_id: int) -> models.Patient:
     return patient
 
 
+def get_patient_by_mrn(session: Session, medical_record_number: str) -> Optional[models.Patient]:
+    """Get a patient by medical record number, or ``None`` if there is none."""
+    try:
+        return session.exec(
+            select(models.Patient).where(
+                models.Patient.medical_record_number == medical_record_number
+            )
+        ).first()
+    except Exception as exc:
+        logger.error(f"Failed to look up patient: {exc}")
+        raise DatabaseError(f"Failed to look up patient: {str(exc)}")
+
+
 def update_patient(
     session: Session, patient: models.Patient, data: schemas.PatientUpdate
 ) -> models.Patient:
@@ -250,17 +263,43 @@ def complete_analysis(
     analysis: models.Analysis,
     findings_description: Optional[str] = None,
     recommendations: Optional[str] = None,
+    total_findings: Optional[int] = None,
+    dominant_label: Optional[str] = None,
+    dominant_category: Optional[str] = None,
+    summary: Optional[dict] = None,
+    images: Sequence[schemas.AnalysisImageCreate] = (),
 ) -> models.Analysis:
-    """Mark an analysis as completed."""
+    """Mark an analysis as completed, optionally recording its inference results.
+
+    ``analysis`` may be new; it is then inserted here. The analysis, its
+    ``images`` (one batched INSERT) and the final status are written in a
+    single transaction.
+    """
     try:
         analysis.status = models.AnalysisStatus.COMPLETED
         analysis.completed_at = datetime.utcnow()
         analysis.updated_at = datetime.utcnow()
+        analysis.error_message = None
         if findings_description is not None:
             analysis.findings_description = findings_description
         if recommendations is not None:
             analysis.recommendations = recommendations
+        if total_findings is not None:
+            analysis.total_findings = total_findings
+        if dominant_label is not None:
+            analysis.dominant_label = dominant_label
+        if dominant_category is not None:
+            analysis.dominant_category = dominant_category
+        if summary is not None:
+            analysis.summary = summary
         session.add(analysis)
+        if images:
+            if analysis.id is None:
+                session.flush()  # assigns the id the images refer to
+            session.exec(
+                insert(models.AnalysisImage),
+                params=[{**image.model_dump(), "analysis_id": analysis.id} for image in images],
+            )
         session.commit()
         session.refresh(analysis)
         logger.info(f"Completed analysis: {analysis.id}")
@@ -271,6 +310,25 @@ def complete_analysis(
         raise DatabaseError(f"Failed to complete analysis: {str(exc)}")
 
 
+def fail_analysis(
+    session: Session, analysis: models.Analysis, reason: str
+) -> models.Analysis:
+    """Mark an analysis as failed and record why."""
+    try:
+        analysis.status = models.AnalysisStatus.FAILED
+        analysis.error_message = reason
+        analysis.updated_at = datetime.utcnow()
+        session.add(analysis)
+        session.commit()
+        session.refresh(analysis)
+        logger.info(f"Failed analysis: {analysis.id} ({reason})")
+        return analysis
+    except Exception as exc:
+        logger.error(f"Failed to mark analysis as failed: {exc}")
+        session.rollback()
+        raise DatabaseError(f"Failed to mark analysis as failed: {str(exc)}")
+
+
 # ============ Analysis Image CRUD ============
 
 def create_analysis_image(
@@ -318,6 +376,21 @@ def get_analysis_image(session: Session, image_id: int) -> models.AnalysisImage:
     return image
 
 
+def find_image_hashes(session: Session, hashes: Iterable[str]) -> set[str]:
+    """Return the subset of ``hashes`` already stored on some analysis image."""
+    hashes = list(set(hashes))
+    if not hashes:
+        return set()
+    try:
+        statement = select(models.AnalysisImage.file_hash).where(
+            models.AnalysisImage.file_hash.in_(hashes)
+        )
+        return set(session.exec(statement).all())
+    except Exception as exc:
+        logger.error(f"Failed to look up image hashes: {exc}")
+        raise DatabaseError(f"Failed to look up image hashes: {str(exc)}")
+
+
 # ============ Statistics ============
 
 def get_statistics(session: Session) -> dict:
@@ -6,13 +6,24 @@ import os
 from contextlib import asynccontextmanager, contextmanager
 from typing import AsyncGenerator, Generator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import get_settings
+from .metrics import TimedCheckout
 
 settings = get_settings()
 
+
+class _TimedAsyncPool(TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+class _TimedSyncPool(TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
 # Async engine for production (PostgreSQL)
 async_engine = create_async_engine(
     settings.database_url,
@@ -21,6 +32,12 @@ async_engine = create_async_engine(
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20,
+    poolclass=_TimedAsyncPool,
+)
+# Objects stay loaded after commit: an expired attribute would need implicit
+# IO, which an AsyncSession cannot do on attribute access.
+async_session_factory = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
 # Sync engine for migrations and scripts
@@ -29,6 +46,7 @@ sync_engine = create_engine(
     sync_database_url,
     echo=settings.database_echo,
     pool_pre_ping=True,
+    poolclass=_TimedSyncPool,
 )
 
 
@@ -39,13 +57,13 @@ async def init_db() -> None:
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency that provides an async SQLModel session."""
-    async with AsyncSession(async_engine) as session:
+    """Dependency that provides an async SQLModel session (used by the API)."""
+    async with async_session_factory() as session:
         yield session
 
 
 def get_session() -> Generator[Session, None, None]:
-    """Dependency that provides a sync SQLModel session (for backwards compatibility)."""
+    """Sync SQLModel session, for scripts and code running outside the event loop."""
     with Session(sync_engine) as session:
         yield session
 
@@ -65,7 +83,7 @@ def session_scope() -> Generator[Session, None, None]:
 @asynccontextmanager
 async def async_session_scope() -> AsyncGenerator[AsyncSession, None]:
     """Provide an async transactional scope."""
-    async with AsyncSession(async_engine) as session:
+    async with async_session_factory() as session:
         try:
             yield session
             await session.commit()
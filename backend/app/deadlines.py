@@ -0,0 +1,208 @@
+"""Per-request deadlines and client-disconnect cancellation for inference.
+
+Every inference request carries a ``Deadline``: ``X-Request-Timeout``
+seconds (or the configured default) counted from when the request arrived.
+Work that is still queued when the deadline passes, or when the client has
+disconnected, is dropped before it reaches the model and its analysis is
+marked FAILED with the reason, freeing model capacity for live requests.
+Each unit of worker-thread work runs as an ``Attempt``: once it has reached
+the model it is always waited for, so a slow forward pass is never wasted.
+
+Deadlines are wall-clock times so they survive the trip to ``app.worker``
+processes inside an ``InferenceJob``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import Header, Request
+
+from .config import get_settings
+from .exceptions import RequestCancelledError
+
+DEADLINE_EXCEEDED = "Request deadline exceeded"
+CLIENT_DISCONNECTED = "Client disconnected"
+# How often a waiting request checks whether its client is still there.
+DISCONNECT_POLL_S = 0.25
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """When a request stops being worth answering, and whether it already has.
+
+    ``check`` is safe to call from worker threads.
+    """
+
+    def __init__(self, expires_at: Optional[float] = None, request: Optional[Request] = None):
+        self.expires_at = expires_at
+        self.request = request
+        # Set when the client sent X-Request-Timeout rather than relying on the default
+        self.from_client = False
+        self._reason: Optional[str] = None
+
+    @classmethod
+    def after(
+        cls,
+        seconds: Optional[float],
+        start: Optional[float] = None,
+        request: Optional[Request] = None,
+    ) -> "Deadline":
+        """Deadline ``seconds`` after ``start`` (default now); ``None`` never expires."""
+        if seconds is None:
+            return cls(None, request)
+        return cls((start if start is not None else time.time()) + seconds, request)
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Why the request should be abandoned, or ``None`` while it is live."""
+        if self._reason is None and self.expires_at is not None and time.time() >= self.expires_at:
+            self._reason = DEADLINE_EXCEEDED
+        return self._reason
+
+    def cancel(self, reason: str) -> None:
+        """Abandon the request; the first reason sticks."""
+        if self._reason is None:
+            self._reason = reason
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or ``None`` without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+    def check(self) -> None:
+        """Raise ``RequestCancelledError`` if the request has been abandoned."""
+        reason = self.reason
+        if reason is not None:
+            status_code = 499 if reason == CLIENT_DISCONNECTED else 504
+            raise RequestCancelledError(reason, status_code=status_code)
+
+    async def wait(self, watch_client: bool = True) -> None:
+        """Return once the deadline passes or (optionally) the client disconnects."""
+        polling = watch_client and self.request is not None
+        while self.reason is None:
+            if polling and await self.request.is_disconnected():
+                self.cancel(CLIENT_DISCONNECTED)
+                return
+            remaining = self.remaining()
+            if not polling and remaining is None:
+                await asyncio.get_running_loop().create_future()  # never expires
+            delay = DISCONNECT_POLL_S if polling else remaining
+            if remaining is not None:
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+
+
+    def attempt(self) -> "Attempt":
+        """Track one unit of worker-thread work done under this deadline."""
+        return Attempt(self)
+
+
+class Attempt:
+    """One unit of worker-thread work under a ``Deadline``.
+
+    The worker calls ``start`` before decoding and ``reach_model`` right before
+    the model call; the event loop calls ``abandon``. Whichever comes first
+    under the lock wins, so work is either dropped before the model or runs
+    to completion. Both worker calls raise ``RequestCancelledError`` once the
+    attempt is abandoned or its deadline has passed.
+    """
+
+    def __init__(self, deadline: Deadline) -> None:
+        self.deadline = deadline
+        self.started = False
+        self.reached_model = False
+        self._abandoned = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self._check()
+            self.started = True
+
+    def reach_model(self) -> None:
+        with self._lock:
+            if not self.reached_model:
+                self._check()
+                self.reached_model = True
+
+    def abandon(self) -> bool:
+        """Stop the work at its next check; ``False`` if it already reached the model."""
+        with self._lock:
+            if self.reached_model:
+                return False
+            self._abandoned = True
+            return True
+
+    def _check(self) -> None:
+        if self._abandoned:
+            self.deadline.check()
+            raise RequestCancelledError(DEADLINE_EXCEEDED)
+        self.deadline.check()
+
+
+async def run_until_cancelled(
+    work: Awaitable[T], attempt: Attempt, watch_client: bool = True
+) -> T:
+    """Await ``work`` unless the deadline passes or the client leaves before it reaches the model.
+
+    Then ``RequestCancelledError`` is raised. Work still waiting for an
+    executor thread is cancelled. Work already running is awaited until it
+    stops at its next check, so it is not writing files the caller discards.
+    Work that has reached the model is awaited to the end and its result
+    returned.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(attempt.deadline.wait(watch_client))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if task in done:
+        return task.result()
+    if not attempt.abandon():
+        return await task
+    if attempt.started:
+        with contextlib.suppress(Exception):
+            await task
+    else:
+        # A thread picking it up now fails ``start`` at once.
+        task.cancel()
+    attempt.deadline.check()
+    raise RequestCancelledError(DEADLINE_EXCEEDED)
+
+
+def _from_request(request: Request, timeout: Optional[float], default: Optional[float]) -> Deadline:
+    received_at = getattr(request.state, "received_at", None)
+    deadline = Deadline.after(timeout or default, start=received_at, request=request)
+    deadline.from_client = timeout is not None
+    return deadline
+
+
+async def request_deadline(
+    request: Request,
+    x_request_timeout: Optional[float] = Header(
+        None, gt=0, description="Seconds the client will wait for the result."
+    ),
+) -> Deadline:
+    """Dependency: the request's deadline, counted from its arrival."""
+    return _from_request(request, x_request_timeout, get_settings().inference_deadline_s)
+
+
+async def bulk_request_deadline(
+    request: Request,
+    x_request_timeout: Optional[float] = Header(
+        None, gt=0, description="Seconds the client will wait for the whole batch."
+    ),
+) -> Deadline:
+    """Dependency: ``request_deadline`` for bulk work, whose default is ``BULK_DEADLINE_S``."""
+    return _from_request(request, x_request_timeout, get_settings().bulk_deadline_s)
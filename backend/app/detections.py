@@ -0,0 +1,119 @@
+"""Compact columnar storage for detections.
+
+A view's detections are stored once, on its ``AnalysisImage`` row, as a small
+binary blob instead of a list of verbose JSON objects::
+
+    header   <4sII>      magic, detection count, class table length
+    classes  JSON        [[label, category, traffic_light], ...]
+    boxes    float32     n x 4 (x1, y1, x2, y2)
+    scores   float32     n
+    ids      uint16      n, indices into the class table
+
+The API shape (``{"detections": [{"bbox": {...}, ...}]}``) is rebuilt on demand
+by ``unpack_detections``; the analysis summary keeps only per-view counts and
+``expand_summary`` re-attaches the detections for detail views and exports.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .schemas import Detection
+
+MAGIC = b"DET1"
+_HEADER = struct.Struct("<4sII")
+_BOX_KEYS = ("x1", "y1", "x2", "y2")
+
+
+def pack_detections(detections: Sequence[Detection]) -> bytes:
+    """Encode detections as packed float32 boxes/scores and uint16 class ids."""
+    classes: Dict[tuple, int] = {}
+    class_ids = np.empty(len(detections), dtype="<u2")
+    boxes = np.empty((len(detections), 4), dtype="<f4")
+    scores = np.empty(len(detections), dtype="<f4")
+    for index, det in enumerate(detections):
+        key = (det.label, det.category, det.traffic_light)
+        class_ids[index] = classes.setdefault(key, len(classes))
+        boxes[index] = (det.bbox.x1, det.bbox.y1, det.bbox.x2, det.bbox.y2)
+        scores[index] = det.confidence
+    table = json.dumps(list(classes), separators=(",", ":")).encode("utf-8")
+    return b"".join(
+        (
+            _HEADER.pack(MAGIC, len(detections), len(table)),
+            table,
+            boxes.tobytes(),
+            scores.tobytes(),
+            class_ids.tobytes(),
+        )
+    )
+
+
+def unpack_detections(blob: bytes) -> List[dict]:
+    """Rebuild the API detection dicts from a packed blob.
+
+    Floats are reported with the shortest decimal that round-trips through
+    float32, so a stored ``0.9`` reads back as ``0.9``.
+    """
+    magic, count, table_length = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not a packed detections blob")
+    offset = _HEADER.size
+    table = json.loads(blob[offset : offset + table_length])
+    offset += table_length
+    boxes = np.frombuffer(blob, dtype="<f4", count=count * 4, offset=offset).reshape(count, 4)
+    offset += boxes.nbytes
+    scores = np.frombuffer(blob, dtype="<f4", count=count, offset=offset)
+    offset += scores.nbytes
+    class_ids = np.frombuffer(blob, dtype="<u2", count=count, offset=offset)
+
+    detections = []
+    for box, score, class_id in zip(_as_floats(boxes), _as_floats(scores), class_ids.tolist()):
+        label, category, traffic_light = table[class_id]
+        detections.append(
+            {
+                "bbox": dict(zip(_BOX_KEYS, box)),
+                "confidence": score,
+                "label": label,
+                "category": category,
+                "traffic_light": traffic_light,
+            }
+        )
+    return detections
+
+
+def _as_floats(values: np.ndarray) -> list:
+    """float32 array to nested Python floats, without float32 noise digits."""
+    if values.ndim > 1:
+        return [_as_floats(row) for row in values]
+    return [float(str(value)) for value in values]
+
+
+def image_detections(image) -> List[dict]:
+    """Detections of an ``AnalysisImage`` in API shape, packed or legacy JSON."""
+    if image.detections_packed is not None:
+        return unpack_detections(image.detections_packed)
+    return list((image.detections_data or {}).get("detections", []))
+
+
+def expand_summary(
+    summary: Optional[Mapping[str, object]], detections: Mapping[str, List[dict]]
+) -> Optional[Dict[str, object]]:
+    """Re-attach each view's detections to a compact analysis summary.
+
+    ``detections`` maps stored view types (``"lcc"``, ``"single"``) to the
+    view's detection dicts.
+    """
+    if not summary or not isinstance(summary.get("views"), dict):
+        return summary  # type: ignore[return-value]
+    views = {}
+    for key, view in summary["views"].items():
+        view = dict(view)
+        view_type = "single" if summary.get("mode") == "single" else str(key).lower()
+        view.setdefault("detections", detections.get(view_type, []))
+        views[key] = view
+    return {**summary, "views": views}
+
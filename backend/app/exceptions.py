@@ -6,10 +6,17 @@ from __future__ import annotations
 class AppException(Exception):
     """Base exception for application errors."""
     
-    def __init__(self, message: str, status_code: int = 500, details: dict | None = None):
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 500,
+        details: dict | None = None,
+        headers: dict | None = None,
+    ):
         self.message = message
         self.status_code = status_code
         self.details = details or {}
+        self.headers = headers or {}
         super().__init__(self.message)
 
 
@@ -20,6 +27,13 @@ class ValidationError(AppException):
         super().__init__(message, status_code=400, details=details)
 
 
+class ForbiddenError(AppException):
+    """Raised when a request lacks the credentials for a privileged endpoint."""
+    
+    def __init__(self, message: str, details: dict | None = None):
+        super().__init__(message, status_code=403, details=details)
+
+
 class NotFoundError(AppException):
     """Raised when a resource is not found."""
     
@@ -27,6 +41,20 @@ class NotFoundError(AppException):
         super().__init__(message, status_code=404, details=details)
 
 
+class ConflictError(AppException):
+    """Raised when a request conflicts with one already received."""
+    
+    def __init__(self, message: str, details: dict | None = None):
+        super().__init__(message, status_code=409, details=details)
+
+
+class RequestCancelledError(AppException):
+    """Raised when a request's deadline passes or its client disconnects before inference."""
+    
+    def __init__(self, message: str, details: dict | None = None, status_code: int = 504):
+        super().__init__(message, status_code=status_code, details=details)
+
+
 class FileProcessingError(AppException):
     """Raised when file processing fails."""
     
@@ -34,6 +62,13 @@ class FileProcessingError(AppException):
         super().__init__(message, status_code=422, details=details)
 
 
+class PayloadTooLargeError(AppException):
+    """Raised when an upload exceeds the configured size limit."""
+    
+    def __init__(self, message: str, details: dict | None = None):
+        super().__init__(message, status_code=413, details=details)
+
+
 class ModelInferenceError(AppException):
     """Raised when model inference fails."""
     
@@ -46,3 +81,11 @@ class DatabaseError(AppException):
     
     def __init__(self, message: str, details: dict | None = None):
         super().__init__(message, status_code=500, details=details)
+
+
+class ServiceUnavailableError(AppException):
+    """Raised when the service is temporarily unable to accept work."""
+    
+    def __init__(self, message: str, details: dict | None = None, retry_after: int | None = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        super().__init__(message, status_code=503, details=details, headers=headers)
@@ -4,22 +4,30 @@ from __future__ import annotations
 
 import hashlib
 import shutil
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 import aiofiles
 from fastapi import UploadFile
 from PIL import Image
 
 from .config import get_settings
-from .exceptions import FileProcessingError, ValidationError
+from .exceptions import FileProcessingError, PayloadTooLargeError, ValidationError
 from .logger import get_logger
+from . import tracing
+from .metrics import observe_stage, stage
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+# Uploads are streamed to disk in chunks of this size.
+CHUNK_SIZE = 1024 * 1024
+
+THUMBNAIL_SUFFIX = "_thumb.jpg"
+
 
 class FileManager:
     """Manage file uploads, storage, and processing."""
@@ -36,6 +44,129 @@ class FileManager:
         for directory in [self.images_dir, self.thumbnails_dir, self.temp_dir]:
             directory.mkdir(parents=True, exist_ok=True)
     
+    async def ingest_upload(
+        self,
+        upload: UploadFile,
+        patient_id: Optional[int] = None,
+        analysis_id: Optional[int] = None,
+        view_name: Optional[str] = None,
+    ) -> dict[str, object]:
+        """
+        Stream an upload to its final path in chunks, hashing it on the way.
+        
+        The size limit is enforced while streaming, so an oversized upload is
+        rejected without being held in memory. No thumbnail is created: the
+        caller decodes the image once and passes it to ``store_thumbnail``.
+        Returns the same metadata dict as ``save_upload``.
+        """
+        self._validate_upload(upload)
+        if upload.size is not None and upload.size > settings.max_upload_size:
+            raise self._too_large(upload)
+        
+        file_path, file_id, filename = self._new_image_path(upload, patient_id, analysis_id, view_name)
+        with tracing.span("save_upload", view=view_name or "") as span:
+            file_info = await self._stream_to_disk(upload, file_path)
+            if span is not None:
+                span.set(bytes=file_info["file_size"])
+        logger.info(f"Saved file: {file_path}")
+        return {
+            "file_id": file_id,
+            "filename": filename,
+            "original_filename": upload.filename or "unknown",
+            "file_path": str(file_path),
+            "relative_path": str(file_path.relative_to(self.upload_dir)),
+            "thumbnail_path": None,
+            **file_info,
+            "content_type": upload.content_type,
+            "extension": file_path.suffix,
+        }
+
+    async def _stream_to_disk(self, upload: UploadFile, file_path: Path) -> dict[str, object]:
+        """Copy ``upload`` to ``file_path`` chunk by chunk; return its size and SHA-256."""
+        digest = hashlib.sha256()
+        size = 0
+        read_s = write_s = 0.0
+        try:
+            await upload.seek(0)
+            async with aiofiles.open(file_path, "wb") as f:
+                while True:
+                    started = time.perf_counter()
+                    chunk = await upload.read(CHUNK_SIZE)
+                    read_s += time.perf_counter() - started
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > settings.max_upload_size:
+                        raise self._too_large(upload)
+                    started = time.perf_counter()
+                    digest.update(chunk)
+                    await f.write(chunk)
+                    write_s += time.perf_counter() - started
+        except Exception as exc:
+            file_path.unlink(missing_ok=True)
+            if isinstance(exc, PayloadTooLargeError):
+                raise
+            logger.error(f"Failed to save file: {exc}")
+            raise FileProcessingError(f"Failed to save file: {str(exc)}")
+        
+        observe_stage("upload_read", read_s)
+        observe_stage("file_save", write_s)
+        return {"file_size": size, "file_hash": digest.hexdigest()}
+    
+    def store_thumbnail(self, file_info: dict[str, object], image: Image.Image) -> None:
+        """Write a thumbnail of an already decoded ``image`` and record it in ``file_info``."""
+        with stage("thumbnail"):
+            thumbnail_path = self._save_thumbnail(image, str(file_info["file_id"]))
+        file_info["thumbnail_path"] = str(thumbnail_path.relative_to(self.upload_dir))
+    
+    def defer_thumbnail(self, file_info: dict[str, object]) -> None:
+        """Record where the thumbnail of an image that was not decoded will be.
+
+        ``ensure_thumbnail`` creates it from the stored image on first request.
+        """
+        date_dir = Path(str(file_info["file_path"])).parent.relative_to(self.images_dir)
+        thumbnail_path = self.thumbnails_dir / date_dir / f"{file_info['file_id']}{THUMBNAIL_SUFFIX}"
+        file_info["thumbnail_path"] = str(thumbnail_path.relative_to(self.upload_dir))
+    
+    def ensure_thumbnail(self, thumbnail_path: Path) -> Optional[Path]:
+        """Resolve a requested thumbnail, creating it if it was deferred.
+
+        Returns ``None`` unless ``thumbnail_path`` is
+        ``thumbnails/<yyyy>/<mm>/<dd>/<uuid>_thumb.jpg`` inside the thumbnails
+        directory and, when it does not exist yet, its stored image is found.
+        """
+        thumbnails_dir = self.thumbnails_dir.resolve()
+        thumbnail_path = thumbnail_path.resolve()
+        if not thumbnail_path.is_relative_to(thumbnails_dir):
+            return None
+        relative = thumbnail_path.relative_to(thumbnails_dir)
+        if len(relative.parts) != 4 or not all(part.isdigit() for part in relative.parts[:3]):
+            return None
+        if not relative.name.endswith(THUMBNAIL_SUFFIX):
+            return None
+        file_id = relative.name[: -len(THUMBNAIL_SUFFIX)]
+        try:
+            if str(UUID(file_id)) != file_id:
+                return None
+        except ValueError:
+            return None
+        if thumbnail_path.exists():
+            return thumbnail_path
+        
+        images_dir = self.images_dir.resolve()
+        date_dir = (images_dir / relative.parent).resolve()
+        if not date_dir.is_relative_to(images_dir) or not date_dir.is_dir():
+            return None
+        # Stored names are "[a<id>_][p<id>_]<timestamp>_<file id>[_<view>]<ext>".
+        image_path = next(
+            (path for path in date_dir.iterdir() if file_id in path.stem.split("_")), None
+        )
+        if image_path is None:
+            return None
+        with stage("thumbnail"), Image.open(image_path) as img:
+            self._write_thumbnail(img, thumbnail_path)
+        return thumbnail_path
+    
     async def save_upload(
         self,
         upload: UploadFile,
@@ -43,15 +174,37 @@ class FileManager:
         analysis_id: Optional[int] = None,
         view_name: Optional[str] = None,
         create_thumbnail: bool = True,
-    ) -> dict[str, str]:
+    ) -> dict[str, object]:
         """
-        Save an uploaded file and optionally create a thumbnail.
+        Save an uploaded file and optionally create a thumbnail from the saved copy.
         
         Returns a dict with file paths and metadata.
         """
-        # Validate file
-        self._validate_upload(upload)
+        file_info = await self.ingest_upload(
+            upload, patient_id=patient_id, analysis_id=analysis_id, view_name=view_name
+        )
         
+        # Create thumbnail
+        if create_thumbnail:
+            file_path = Path(str(file_info["file_path"]))
+            try:
+                thumbnail_path = await self._create_thumbnail(file_path, str(file_info["file_id"]))
+            except Exception as exc:
+                file_path.unlink(missing_ok=True)
+                logger.error(f"Failed to save file: {exc}")
+                raise FileProcessingError(f"Failed to save file: {str(exc)}")
+            file_info["thumbnail_path"] = str(thumbnail_path.relative_to(self.upload_dir))
+        
+        return file_info
+    
+    def _new_image_path(
+        self,
+        upload: UploadFile,
+        patient_id: Optional[int],
+        analysis_id: Optional[int],
+        view_name: Optional[str],
+    ) -> tuple[Path, str, str]:
+        """Return ``(path, file_id, filename)`` for a new stored image."""
         # Generate unique filename
         file_ext = Path(upload.filename or "image.jpg").suffix.lower()
         file_id = str(uuid4())
@@ -72,70 +225,45 @@ class FileManager:
         date_dir = self.images_dir / datetime.utcnow().strftime("%Y/%m/%d")
         date_dir.mkdir(parents=True, exist_ok=True)
         
-        file_path = date_dir / filename
-        
-        # Save file
-        try:
-            content = await upload.read()
-            async with aiofiles.open(file_path, "wb") as f:
-                await f.write(content)
-            
-            logger.info(f"Saved file: {file_path}")
-            
-            # Calculate file hash
-            file_hash = hashlib.sha256(content).hexdigest()
-            
-            # Create thumbnail
-            thumbnail_path = None
-            if create_thumbnail:
-                thumbnail_path = await self._create_thumbnail(file_path, file_id)
-            
-            # Get file info
-            file_info = {
-                "file_id": file_id,
-                "filename": filename,
-                "original_filename": upload.filename or "unknown",
-                "file_path": str(file_path),
-                "relative_path": str(file_path.relative_to(self.upload_dir)),
-                "thumbnail_path": str(thumbnail_path.relative_to(self.upload_dir)) if thumbnail_path else None,
-                "file_size": len(content),
-                "file_hash": file_hash,
-                "content_type": upload.content_type,
-                "extension": file_ext,
-            }
-            
-            return file_info
-            
-        except Exception as exc:
-            logger.error(f"Failed to save file: {exc}")
-            raise FileProcessingError(f"Failed to save file: {str(exc)}")
+        return date_dir / filename, file_id, filename
+    
+    def _too_large(self, upload: UploadFile) -> PayloadTooLargeError:
+        return PayloadTooLargeError(
+            f"File {upload.filename} exceeds the {settings.max_upload_size} byte upload limit",
+            details={"max_upload_size": settings.max_upload_size},
+        )
     
     async def _create_thumbnail(self, image_path: Path, file_id: str) -> Path:
         """Create a thumbnail from an image."""
         try:
             with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode != "RGB":
-                    img = img.convert("RGB")
-                
-                # Create thumbnail
-                img.thumbnail(settings.thumbnail_size, Image.Resampling.LANCZOS)
-                
-                # Save thumbnail
-                date_dir = self.thumbnails_dir / datetime.utcnow().strftime("%Y/%m/%d")
-                date_dir.mkdir(parents=True, exist_ok=True)
-                
-                thumbnail_path = date_dir / f"{file_id}_thumb.jpg"
-                img.save(thumbnail_path, "JPEG", quality=85, optimize=True)
-                
-                logger.info(f"Created thumbnail: {thumbnail_path}")
-                
-                return thumbnail_path
-                
+                return self._save_thumbnail(img, file_id)
         except Exception as exc:
             logger.warning(f"Failed to create thumbnail: {exc}")
             raise FileProcessingError(f"Failed to create thumbnail: {str(exc)}")
     
+    def _save_thumbnail(self, img: Image.Image, file_id: str) -> Path:
+        """Shrink ``img`` to the thumbnail size and save it as JPEG."""
+        date_dir = self.thumbnails_dir / datetime.utcnow().strftime("%Y/%m/%d")
+        thumbnail_path = date_dir / f"{file_id}{THUMBNAIL_SUFFIX}"
+        self._write_thumbnail(img, thumbnail_path)
+        return thumbnail_path
+    
+    def _write_thumbnail(self, img: Image.Image, thumbnail_path: Path) -> None:
+        """Write a shrunk copy of ``img`` to ``thumbnail_path`` as JPEG."""
+        # Grayscale stays single-channel; anything else is converted to RGB
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        else:
+            img = img.copy()
+        img.thumbnail(settings.thumbnail_size, Image.Resampling.LANCZOS)
+        thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name so a concurrent request never serves half a file.
+        partial_path = thumbnail_path.with_name(f"{thumbnail_path.name}.{uuid4().hex}.part")
+        img.save(partial_path, "JPEG", quality=85, optimize=True)
+        partial_path.replace(thumbnail_path)
+        logger.info(f"Created thumbnail: {thumbnail_path}")
+    
     def _validate_upload(self, upload: UploadFile) -> None:
         """Validate uploaded file."""
         if not upload.filename:
@@ -154,6 +282,10 @@ class FileManager:
     
     async def delete_file(self, file_path: str | Path) -> None:
         """Delete a file and its thumbnail."""
+        self.remove_file(file_path)
+    
+    def remove_file(self, file_path: str | Path) -> None:
+        """Delete a file and its thumbnail; blocking counterpart of ``delete_file``."""
         try:
             file_path = Path(file_path)
             
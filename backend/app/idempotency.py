@@ -0,0 +1,92 @@
+"""Idempotency-Key support for the inference endpoints.
+
+A client that retries a submission with the same ``Idempotency-Key`` header
+gets the original analysis back instead of a second one. The key is claimed in
+the ``idempotency_keys`` table before any work starts, so a retry that arrives
+while the original is still running waits for it and then replays its result.
+Each completed key stores a hash of the request (mode, patient and the
+``file_hash`` of every upload) so a key reused for different images is
+rejected rather than answered with the wrong study.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import BinaryIO, Dict, Mapping, Optional
+
+from fastapi import UploadFile
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import async_crud, models
+from .config import get_settings
+from .exceptions import ConflictError, ValidationError
+
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL_S = 0.2
+
+
+def validate_key(key: str) -> str:
+    """Reject empty or oversized keys."""
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    return key
+
+
+def request_hash(
+    mode: str, patient_id: Optional[int], async_job: bool, file_hashes: Mapping[str, str]
+) -> str:
+    """Identify a submission by what it asks for, not by its raw bytes on the wire."""
+    payload = json.dumps(
+        {
+            "mode": mode,
+            "patient_id": patient_id,
+            "async": async_job,
+            "files": dict(sorted(file_hashes.items())),
+        },
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _hash_file(handle: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    handle.seek(0)
+    for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+        digest.update(chunk)
+    handle.seek(0)
+    return digest.hexdigest()
+
+
+async def upload_hashes(uploads: Mapping[str, UploadFile]) -> Dict[str, str]:
+    """SHA-256 of each spooled upload, the digest ingest stores as ``file_hash``."""
+    digests = await asyncio.gather(
+        *(asyncio.to_thread(_hash_file, upload.file) for upload in uploads.values())
+    )
+    return dict(zip(uploads, digests))
+
+
+async def acquire(session: AsyncSession, key: str) -> Optional[models.IdempotencyKey]:
+    """Claim ``key``, or wait for the request holding it to finish.
+
+    Returns ``None`` when the caller now owns the key and should do the work,
+    otherwise the completed record to replay. Raises ``ConflictError`` if the
+    original request is still running after ``IDEMPOTENCY_WAIT_S``.
+    """
+    settings = get_settings()
+    deadline = time.monotonic() + settings.idempotency_wait_s
+    while True:
+        holder = await async_crud.claim_idempotency_key(
+            session, key, settings.idempotency_lease_s
+        )
+        if holder is None or holder.analysis_id is not None:
+            return holder
+        if time.monotonic() >= deadline:
+            raise ConflictError(
+                "A request with this Idempotency-Key is still in progress",
+                details={"idempotency_key": key},
+            )
+        await asyncio.sleep(POLL_INTERVAL_S)
@@ -0,0 +1,217 @@
+"""Decode uploads into the single grayscale buffer the model services consume."""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# JPEG can be decoded directly at 1/2, 1/4 or 1/8 scale in the DCT domain.
+_JPEG_SCALES = (8, 4, 2)
+_SIXTEEN_BIT_MODES = ("I", "I;16", "I;16B", "I;16L", "I;16N")
+
+# Breast-region crop: pixels brighter than this count as tissue, a row/column
+# needs this fraction of tissue pixels to be kept (ignores speckle noise), the
+# crop is padded by the margin fraction and skipped when it would remove less
+# than the minimum saving of the image area.
+TISSUE_THRESHOLD = 20
+TISSUE_MIN_FRACTION = 0.02
+CROP_MARGIN = 0.02
+CROP_MIN_SAVING = 0.1
+# With auto-crop, decode at this multiple of the model size so the crop still
+# has at least model resolution (the breast spans over half of each side).
+CROP_DECODE_HEADROOM = 2
+
+
+def broadcast_channels(pixels: np.ndarray) -> np.ndarray:
+    """Zero-copy ``(H, W, 3)`` view of an ``(H, W)`` grayscale buffer."""
+    return np.broadcast_to(pixels[..., None], (*pixels.shape, 3))
+
+
+def _to_gray(image: Image.Image) -> np.ndarray:
+    """Return ``image`` as a ``(H, W)`` uint8 array, converting only when needed."""
+    if image.mode in _SIXTEEN_BIT_MODES:
+        # Scale 16-bit mammograms down like OpenCV does instead of clipping at 255.
+        return (np.asarray(image, dtype=np.uint32) >> 8).clip(0, 255).astype(np.uint8)
+    if image.mode != "L":
+        image = image.convert("L")
+    return np.asarray(image)
+
+
+@dataclass
+class DecodedImage:
+    """A decoded upload: one uint8 grayscale buffer plus its place in the original.
+
+    This buffer is the only copy of the pixels kept between the upload and the
+    model; the three channels the detectors expect are a zero-copy view of it
+    (see ``as_rgb``). ``scale`` and ``offset`` map buffer pixels to original
+    pixels (``original = pixel * scale + offset``), so the buffer can be a
+    reduced and/or cropped version of the uploaded file.
+    """
+
+    pixels: np.ndarray
+    original_size: Tuple[int, int]
+    scale: Tuple[float, float] = (1.0, 1.0)
+    offset: Tuple[float, float] = (0.0, 0.0)
+
+    @classmethod
+    def from_pil(cls, image: Image.Image) -> "DecodedImage":
+        """Wrap an already opened PIL image without resizing it."""
+        return cls(pixels=_to_gray(image), original_size=image.size)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """``(width, height)`` of the decoded buffer."""
+        height, width = self.pixels.shape
+        return width, height
+
+    def as_rgb(self) -> np.ndarray:
+        """Three-channel view of the buffer for models that expect colour input."""
+        return broadcast_channels(self.pixels)
+
+    def resized(self, size: Tuple[int, int]) -> "DecodedImage":
+        """Bilinear resize of the buffer to ``(width, height)``, keeping the mapping."""
+        width, height = self.size
+        pixels = cv2.resize(self.pixels, size, interpolation=cv2.INTER_LINEAR)
+        scale = (self.scale[0] * width / size[0], self.scale[1] * height / size[1])
+        return replace(self, pixels=pixels, scale=scale)
+
+    def crop(self, x1: int, y1: int, x2: int, y2: int) -> "DecodedImage":
+        """View of the ``[x1, x2) x [y1, y2)`` region of the buffer, keeping the mapping."""
+        offset = (self.offset[0] + x1 * self.scale[0], self.offset[1] + y1 * self.scale[1])
+        return replace(self, pixels=self.pixels[y1:y2, x1:x2], offset=offset)
+
+    def to_original(self, boxes: np.ndarray) -> np.ndarray:
+        """Map xyxy boxes from buffer pixels to original pixel coordinates."""
+        if self.scale == (1.0, 1.0) and self.offset == (0.0, 0.0):
+            return boxes
+        scale_x, scale_y = self.scale
+        offset_x, offset_y = self.offset
+        width, height = self.original_size
+        boxes = np.asarray(boxes, dtype=np.float64) * (scale_x, scale_y, scale_x, scale_y)
+        boxes += (offset_x, offset_y, offset_x, offset_y)
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return boxes
+
+
+# What the model services accept: pipeline images, or plain PIL images.
+ImageInput = Union[DecodedImage, Image.Image]
+# What ``decode_image`` reads: raw bytes, a stored file or an open (upload) file.
+ImageSource = Union[bytes, str, Path, BinaryIO]
+
+
+def as_decoded(image: ImageInput) -> DecodedImage:
+    """Normalise a model service input to a ``DecodedImage``."""
+    return image if isinstance(image, DecodedImage) else DecodedImage.from_pil(image)
+
+
+def _main_segment(profile: np.ndarray, min_count: float) -> Optional[Tuple[int, int]]:
+    """``[start, end)`` of the contiguous run above ``min_count`` holding the most mass."""
+    keep = (profile >= min_count).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], keep, [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if starts.size == 0:
+        return None
+    cumulative = np.concatenate(([0], np.cumsum(profile)))
+    best = int(np.argmax(cumulative[ends] - cumulative[starts]))
+    return int(starts[best]), int(ends[best])
+
+
+def tissue_bounds(pixels: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box ``(x1, y1, x2, y2)`` of the breast tissue, or ``None`` if empty.
+
+    Thresholds the buffer, projects the mask onto rows and columns and keeps
+    the densest contiguous band in each direction, which drops burned-in view
+    labels and markers separated from the breast by background.
+    """
+    mask = pixels > TISSUE_THRESHOLD
+    height, width = mask.shape
+    rows = _main_segment(np.count_nonzero(mask, axis=1), TISSUE_MIN_FRACTION * width)
+    cols = _main_segment(np.count_nonzero(mask, axis=0), TISSUE_MIN_FRACTION * height)
+    if rows is None or cols is None:
+        return None
+    return cols[0], rows[0], cols[1], rows[1]
+
+
+def crop_to_tissue(image: DecodedImage) -> DecodedImage:
+    """Crop ``image`` to its breast region (plus a margin) when that saves enough."""
+    bounds = tissue_bounds(image.pixels)
+    if bounds is None:
+        return image
+    width, height = image.size
+    x1, y1, x2, y2 = bounds
+    margin_x, margin_y = round(width * CROP_MARGIN), round(height * CROP_MARGIN)
+    x1, y1 = max(0, x1 - margin_x), max(0, y1 - margin_y)
+    x2, y2 = min(width, x2 + margin_x), min(height, y2 + margin_y)
+    if (x2 - x1) * (y2 - y1) > (1 - CROP_MIN_SAVING) * width * height:
+        return image
+    return image.crop(x1, y1, x2, y2)
+
+
+def fit_to_size(image: DecodedImage, target_size: Optional[int]) -> DecodedImage:
+    """Shrink ``image`` to exactly the letterbox size for ``target_size``.
+
+    Uses the same bilinear resize and rounding as the YOLO letterbox, so the
+    model side does no further resizing (and none on three channels).
+    """
+    width, height = image.size
+    if not target_size or max(width, height) <= target_size:
+        return image
+    ratio = min(target_size / height, target_size / width)
+    return image.resized((round(width * ratio), round(height * ratio)))
+
+
+def prepare_image(
+    image: ImageInput, target_size: Optional[int], auto_crop: bool = False
+) -> DecodedImage:
+    """Model-side preprocessing: to grayscale, optional breast crop, fit to input size."""
+    decoded = as_decoded(image)
+    if auto_crop:
+        decoded = crop_to_tissue(decoded)
+    return fit_to_size(decoded, target_size)
+
+
+def reduction_factor(size: Tuple[int, int], target_size: Optional[int]) -> int:
+    """Largest integer downscale that keeps the longest side at or above ``target_size``."""
+    if not target_size:
+        return 1
+    return max(1, max(size) // target_size)
+
+
+def decode_image(source: ImageSource, target_size: Optional[int] = None) -> DecodedImage:
+    """Decode ``source`` to grayscale, shrinking it on load when it exceeds ``target_size``.
+
+    The model letterboxes every input to ``target_size`` on its longest side,
+    so anything decoded beyond that is discarded. Only JPEGs are decoded at
+    reduced size: just the luma channel, at a reduced DCT scale via
+    ``Image.draft``. Pillow has no reduced decode for PNG and the other
+    formats, so they are decoded at full resolution and then box-reduced by
+    an integer factor; for them only the buffer kept for the model shrinks,
+    not the decode cost. The longest side never drops below ``target_size``,
+    leaving the exact fit (after an optional crop) to ``prepare_image``.
+    File objects are read from their current position.
+    """
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        original_size = image.size
+
+        if image.format == "JPEG":
+            factor = reduction_factor(original_size, target_size)
+            jpeg_factor = next((scale for scale in _JPEG_SCALES if scale <= factor), 1)
+            width, height = original_size
+            image.draft("L", (width // jpeg_factor, height // jpeg_factor))
+
+        pixels = _to_gray(image)
+
+    remaining = reduction_factor(pixels.shape[::-1], target_size)
+    if remaining > 1:
+        pixels = np.asarray(Image.fromarray(pixels).reduce(remaining))
+
+    height, width = pixels.shape
+    scale = (original_size[0] / width, original_size[1] / height)
+    return DecodedImage(pixels=pixels, original_size=original_size, scale=scale)
@@ -0,0 +1,201 @@
+"""Queues for asynchronous inference jobs: in-process threads or a Redis stream."""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict
+
+import redis
+
+from .exceptions import ServiceUnavailableError
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class InferenceJob:
+    """An accepted submission whose uploads are stored but not yet predicted."""
+
+    analysis_id: int
+    mode: str
+    # View name -> ``FileManager.save_upload`` result for the stored upload.
+    files: Dict[str, Dict[str, object]]
+    patient_id: int | None = None
+    submitted_at: float = field(default_factory=time.time)
+    # Wall-clock time after which the client no longer wants the result.
+    deadline: float | None = None
+    # ``app.tracing`` traceparent of the submitting request.
+    traceparent: str | None = None
+
+    def to_message(self) -> Dict[str, str]:
+        """Serialise for a Redis stream entry."""
+        return {"job": json.dumps(asdict(self))}
+
+    @classmethod
+    def from_message(cls, fields: Dict[str, str]) -> "InferenceJob":
+        """Rebuild a job from a Redis stream entry written by ``to_message``."""
+        return cls(**json.loads(fields["job"]))
+
+
+class InferenceJobQueue:
+    """Bounded queue of inference jobs drained by a pool of worker threads.
+
+    ``submit`` never blocks: when the queue is full it raises
+    ``ServiceUnavailableError`` so the API can answer 503 instead of piling up
+    work. ``handler`` runs each job and is responsible for recording the
+    outcome on the analysis; exceptions it raises are logged and counted.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[InferenceJob], None],
+        workers: int = 2,
+        max_queue: int = 64,
+    ) -> None:
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._queue: "queue.Queue[InferenceJob]" = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "running": 0}
+        self._total_wait = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"inference-job-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def full(self) -> bool:
+        """Whether a submission would currently be rejected."""
+        return self._queue.full()
+
+    def submit(self, job: InferenceJob) -> None:
+        """Queue ``job`` or raise ``ServiceUnavailableError`` if the queue is full."""
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._count("rejected")
+            raise ServiceUnavailableError(
+                "Inference queue is full, retry later",
+                details={"max_queue": self.max_queue},
+            )
+        self._count("submitted")
+
+    def join(self) -> None:
+        """Block until every queued job has been processed."""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, object]:
+        """Return queue depth and job counters."""
+        with self._lock:
+            started = self._counters["completed"] + self._counters["failed"] + self._counters["running"]
+            return {
+                **self._counters,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "backend": "thread",
+                "queued": self._queue.qsize(),
+                "mean_queue_wait_ms": self._total_wait / started * 1000 if started else 0.0,
+            }
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._counters["running"] += 1
+                self._total_wait += time.time() - job.submitted_at
+            outcome = "failed"
+            try:
+                self.handler(job)
+                outcome = "completed"
+            except Exception as exc:
+                logger.error(f"Inference job for analysis {job.analysis_id} failed: {exc}")
+            finally:
+                with self._lock:
+                    self._counters["running"] -= 1
+                    self._counters[outcome] += 1
+                self._queue.task_done()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+
+class RedisJobQueue:
+    """Producer side of the Redis stream consumed by ``app.worker``.
+
+    Jobs are appended with ``XADD`` and read by a consumer group, so each job
+    goes to exactly one worker and stays pending until acknowledged. Workers
+    delete acknowledged entries, which keeps ``XLEN`` equal to the number of
+    queued plus in-flight jobs; submissions beyond ``max_queue`` (or while
+    Redis is unreachable) raise ``ServiceUnavailableError``.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        stream: str = "inference:jobs",
+        group: str = "inference-workers",
+        max_queue: int = 64,
+    ) -> None:
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.max_queue = max(1, max_queue)
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "rejected": 0}
+
+    def ensure_group(self) -> None:
+        """Create the stream and consumer group if they do not exist yet."""
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    def full(self) -> bool:
+        """Whether a submission would currently be rejected."""
+        try:
+            return self.client.xlen(self.stream) >= self.max_queue
+        except redis.RedisError:
+            return True
+
+    def submit(self, job: InferenceJob) -> None:
+        """Append ``job`` to the stream or raise ``ServiceUnavailableError``."""
+        try:
+            if self.client.xlen(self.stream) >= self.max_queue:
+                raise ServiceUnavailableError(
+                    "Inference queue is full, retry later",
+                    details={"max_queue": self.max_queue},
+                )
+            self.client.xadd(self.stream, job.to_message())
+        except redis.RedisError as exc:
+            self._count("rejected")
+            logger.error(f"Failed to enqueue job for analysis {job.analysis_id}: {exc}")
+            raise ServiceUnavailableError("Inference queue is unavailable, retry later")
+        except ServiceUnavailableError:
+            self._count("rejected")
+            raise
+        self._count("submitted")
+
+    def stats(self) -> Dict[str, object]:
+        """Return stream depth, in-flight count and this node's counters."""
+        with self._lock:
+            stats: Dict[str, object] = {**self._counters, "max_queue": self.max_queue, "backend": "redis"}
+        try:
+            outstanding = self.client.xlen(self.stream)
+            pending = self.client.xpending(self.stream, self.group)["pending"]
+            stats.update(queued=outstanding - pending, running=pending)
+        except redis.RedisError as exc:
+            stats["error"] = str(exc)
+        return stats
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
@@ -3,24 +3,59 @@
 from __future__ import annotations
 
 import asyncio
+import hmac
 import io
+import itertools
+import json
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Callable, Dict, List, Optional, Sequence, Union
 
-from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile, status
+import anyio
+import redis
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from PIL import Image, UnidentifiedImageError
 
-from . import crud, models, schemas
+from . import async_crud, crud, idempotency, models, schemas
+from .admission import AdmissionMiddleware, get_admission_controller
+from .batch_ingest import chunked, collect_batch
+from .batching import MicroBatchingService, get_micro_batcher
 from .config import get_settings
-from .database import get_session, init_db
+from .detections import expand_summary, image_detections, pack_detections
+from .deadlines import (
+    CLIENT_DISCONNECTED,
+    Attempt,
+    Deadline,
+    bulk_request_deadline,
+    request_deadline,
+    run_until_cancelled,
+)
+from .database import async_session_scope, get_async_session, init_db, session_scope
+from .exceptions import (
+    AppException,
+    ConflictError,
+    ForbiddenError,
+    NotFoundError,
+    RequestCancelledError,
+    ServiceUnavailableError,
+)
 from .file_manager import file_manager
+from .image_decode import CROP_DECODE_HEADROOM, DecodedImage, ImageSource, decode_image
+from .jobs import InferenceJob, InferenceJobQueue, RedisJobQueue
 from .logger import get_logger, setup_logging
-from .middleware import ExceptionHandlerMiddleware, LoggingMiddleware, RequestIDMiddleware
+from . import metrics, tracing
+from .middleware import RequestMiddleware
 from .model_service import InferenceService, get_inference_service
+from .onnx_model_service import get_onnx_inference_service
+from .process_pool_service import get_process_pool_service
+from .profiling import ProfilingMiddleware, get_request_profiler
+from .replica_pool import ReplicaPool, get_replica_pool
+from .result_cache import get_result_cache, model_fingerprint
 from .torch_model_service import TorchInferenceService, get_torch_inference_service
 from .schemas import InferenceResponse, ViewPrediction
 
@@ -41,9 +76,17 @@ app = FastAPI(
 )
 
 # Add middleware
-app.add_middleware(ExceptionHandlerMiddleware)
-app.add_middleware(LoggingMiddleware)
-app.add_middleware(RequestIDMiddleware)
+app.add_middleware(
+    AdmissionMiddleware,
+    budgets={
+        "/infer/single": "interactive",
+        "/infer/multi": "interactive",
+        "/infer/multi/stream": "interactive",
+        "/infer/batch": "bulk",
+    },
+)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -55,16 +98,40 @@ app.add_middleware(
 
 
 # Model selection helper
-def get_model_service() -> Union[InferenceService, TorchInferenceService]:
-    """Get the configured model service (YOLO or PyTorch)."""
+def get_model_service() -> Union[
+    InferenceService, TorchInferenceService, ReplicaPool, MicroBatchingService
+]:
+    """Get the configured model service (YOLO, ONNX, YOLO worker processes or PyTorch)."""
     model_type = os.getenv("MODEL_TYPE", "yolo").lower()  # Default to YOLO
+    concurrency = settings.model_replicas
     
     if model_type == "yolo":
         logger.info("Using YOLO model service")
-        return get_inference_service()
+        service = get_inference_service()
+    elif model_type == "onnx":
+        logger.info("Using ONNX Runtime model service")
+        service = get_onnx_inference_service()
+    elif model_type == "process":
+        logger.info("Using YOLO process-pool model service")
+        service = get_process_pool_service(settings.model_process_workers)
+        concurrency = settings.model_process_workers
     else:
         logger.info("Using PyTorch model service")
-        return get_torch_inference_service()
+        service = get_torch_inference_service()
+    
+    if settings.model_replicas > 1 and model_type != "process":
+        service = get_replica_pool(
+            service, settings.model_replicas, settings.model_threads_per_replica
+        )
+    
+    if settings.model_batch_size > 1:
+        return get_micro_batcher(
+            service,
+            settings.model_batch_size,
+            settings.model_batch_wait_ms,
+            concurrency,
+        )
+    return service
 
 
 @app.on_event("startup")
@@ -90,6 +157,13 @@ async def on_shutdown() -> None:
     logger.info("Shutting down application...")
     # Cleanup temp files
     file_manager.cleanup_temp_files()
+    # Stop inference worker processes, if they were started
+    if get_process_pool_service.cache_info().currsize:
+        get_process_pool_service(settings.model_process_workers).close()
+    # Write out spans still queued for the trace exporter
+    exporter = tracing.get_exporter()
+    if exporter is not None:
+        await asyncio.to_thread(exporter.flush)
 
 
 @app.get("/health")
@@ -98,6 +172,83 @@ async def health() -> Dict[str, str]:
     return {"status": "ok", "version": settings.app_version}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint() -> PlainTextResponse:
+    """Request, inference stage, model lock, thread pool and DB pool metrics for Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def require_profiling_token(
+    x_profiling_token: Optional[str] = Header(None, description="Value of PROFILING_TOKEN."),
+) -> None:
+    """Dependency guarding the profiling endpoints; they do not exist without a token."""
+    expected = get_settings().profiling_token
+    if not expected:
+        raise NotFoundError("Profiling is disabled")
+    if not x_profiling_token or not hmac.compare_digest(x_profiling_token, expected):
+        raise ForbiddenError("Invalid profiling token")
+
+
+@app.post("/admin/profiling", dependencies=[Depends(require_profiling_token)])
+def arm_profiling(request: schemas.ProfilingArm) -> Dict[str, object]:
+    """Profile the next ``count`` requests matching ``route``, replacing any armed request."""
+    profiler = get_request_profiler()
+    profiler.arm(request.route, request.count, request.profiler, request.method)
+    return profiler.status()
+
+
+@app.get("/admin/profiling", dependencies=[Depends(require_profiling_token)])
+def profiling_status() -> Dict[str, object]:
+    """What is armed, and the profiles recorded so far (newest first)."""
+    return get_request_profiler().status()
+
+
+@app.delete("/admin/profiling", dependencies=[Depends(require_profiling_token)])
+def disarm_profiling() -> Dict[str, object]:
+    """Stop profiling requests that have not started yet."""
+    profiler = get_request_profiler()
+    profiler.disarm()
+    return profiler.status()
+
+
+@app.get("/admin/profiling/{request_id}", dependencies=[Depends(require_profiling_token)])
+def profiling_report(request_id: str) -> Dict[str, object]:
+    """Hot-function report of a profiled request, by its X-Request-ID."""
+    return get_request_profiler().report(request_id)
+
+
+@app.get("/admin/profiling/{request_id}/profile", dependencies=[Depends(require_profiling_token)])
+def profiling_file(request_id: str) -> FileResponse:
+    """Raw profile: a pstats dump (cprofile) or folded stacks (sampling)."""
+    profiler = get_request_profiler()
+    path = profiler.directory / str(profiler.report(request_id)["profile_file"])
+    return FileResponse(path, filename=path.name)
+
+
+@app.get("/inference/stats")
+def inference_stats(
+    service: Union[InferenceService, TorchInferenceService] = Depends(get_model_service),
+) -> Dict[str, object]:
+    """Report admission, cache, job queue, batching and replica statistics of the model service."""
+    cache = get_result_cache()
+    stats: Dict[str, object] = {
+        "model": service.model_info.name,
+        "admission": {
+            budget: get_admission_controller(budget).stats() for budget in ("interactive", "bulk")
+        },
+        "cache": cache.stats() if cache is not None else None,
+        "jobs": get_job_queue().stats(),
+        "batching": None,
+        "replicas": None,
+    }
+    if isinstance(service, MicroBatchingService):
+        stats["batching"] = service.stats()
+        service = service.service
+    if isinstance(service, ReplicaPool):
+        stats["replicas"] = service.stats()
+    return stats
+
+
 
 def _summarise_predictions(
     mode: schemas.InferenceMode, views: Dict[str, ViewPrediction]
@@ -116,10 +267,9 @@ def _summarise_predictions(
 
     for key, prediction in views.items():
         detections = prediction.detections
-        detection_dicts = [det.model_dump() for det in detections]
+        # Detections themselves live on the image rows; see expand_summary.
         view_payload[key] = {
             "size": prediction.size.model_dump(),
-            "detections": detection_dicts,
             "detection_count": len(detections),
         }
         total += len(detections)
@@ -174,9 +324,9 @@ def _analysis_to_summary(analysis: models.Analysis) -> schemas.AnalysisSummary:
     )
 
 
-def _patient_to_schema(session: Session, patient: models.Patient) -> schemas.PatientRead:
+async def _patient_to_schema(session: AsyncSession, patient: models.Patient) -> schemas.PatientRead:
     """Convert Patient model to PatientRead schema."""
-    analyses = crud.list_patient_analyses(session, patient.id)
+    analyses = await async_crud.list_patient_analyses(session, patient.id)
     return schemas.PatientRead(
         id=patient.id,
         full_name=patient.full_name,
@@ -193,16 +343,53 @@ def _patient_to_schema(session: Session, patient: models.Patient) -> schemas.Pat
         analyses=[_analysis_to_summary(a) for a in analyses],
     )
 
+def _image_to_schema(
+    image: models.AnalysisImage, detections: Optional[List[dict]] = None
+) -> schemas.AnalysisImageRead:
+    """Convert AnalysisImage model to AnalysisImageRead, unpacking its detections."""
+    if detections is None:
+        detections = image_detections(image)
+    return schemas.AnalysisImageRead(
+        **image.model_dump(exclude={"detections_data", "detections_packed"}),
+        detections_data={"detections": detections},
+    )
+
+
+def _analysis_to_read(
+    analysis: models.Analysis, images: list[models.AnalysisImage]
+) -> schemas.AnalysisRead:
+    """Full analysis: summary views and images carry their detections again."""
+    detections = {image.view_type.value: image_detections(image) for image in images}
+    summary = _analysis_to_summary(analysis)
+    summary.summary = expand_summary(analysis.summary, detections)
+    return schemas.AnalysisRead(
+        **summary.model_dump(),
+        findings_description=analysis.findings_description,
+        recommendations=analysis.recommendations,
+        error_message=analysis.error_message,
+        updated_at=analysis.updated_at,
+        images=[_image_to_schema(image, detections[image.view_type.value]) for image in images],
+    )
+
+
 def _build_analysis_json(
     analysis: models.Analysis, images: list[models.AnalysisImage]
 ) -> dict:
     """Serialise analysis and images for export."""
-    summary = _analysis_to_summary(analysis).model_dump()
+    detections = {image.view_type.value: image_detections(image) for image in images}
+    summary = _analysis_to_summary(analysis).model_dump(mode="json")
     summary.update(
         {
+            "summary": expand_summary(analysis.summary, detections),
             "findings_description": analysis.findings_description,
             "recommendations": analysis.recommendations,
-            "images": [img.model_dump() for img in images],
+            "images": [
+                {
+                    **img.model_dump(mode="json", exclude={"detections_packed"}),
+                    "detections_data": {"detections": detections[img.view_type.value]},
+                }
+                for img in images
+            ],
         }
     )
     return summary
@@ -287,288 +474,993 @@ async def infer_multi(
     lmlo: UploadFile = File(..., description="Left Mediolateral Oblique view image."),
     rmlo: UploadFile = File(..., description="Right Mediolateral Oblique view image."),
     patient_id: Optional[int] = Form(None),
+    async_job: bool = Query(
+        False, alias="async", description="Queue the study and return 202 immediately."
+    ),
+    idempotency_key: Optional[str] = Header(
+        None, description="Retries with the same key return the original analysis."
+    ),
+    deadline: Deadline = Depends(request_deadline),
     service: Union[InferenceService, TorchInferenceService] = Depends(get_model_service),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> InferenceResponse:
     """
     Run inference across four anatomical views with file storage.
     
+    With ``?async=true`` the uploads are stored, the analysis is created as
+    PENDING and 202 is returned; poll ``/analyses/{id}/status`` for the result.
+    
+    With an ``Idempotency-Key`` header a retry of the same study returns the
+    original result (or waits for the in-flight original) without storing or
+    predicting anything again.
+    
+    If the client disconnects or the deadline (``X-Request-Timeout`` seconds,
+    default ``INFERENCE_DEADLINE_S``) passes before the model is reached, the
+    work is dropped and the analysis is marked FAILED with the reason.
+    
     Steps:
     1. Validate patient (if provided)
-    2. Create analysis record (status=PROCESSING)
-    3. Read and predict all images
-    4. Save images and create AnalysisImage records
-    5. Update analysis with results (status=COMPLETED)
-    6. Return inference response
+    2. Prepare the analysis record (status=PROCESSING)
+    3. Stream the uploads to storage, then decode and predict each once
+    4. Insert the analysis, its AnalysisImage records and results (status=COMPLETED)
+       in a single transaction
+    5. Return inference response
     """
     logger.info(f"Starting multi inference (patient_id={patient_id})")
     
     # 1. Validate patient
-    patient = None
     if patient_id:
         try:
-            patient = crud.get_patient(session, patient_id)
+            await async_crud.get_patient(session, patient_id)
         except Exception as exc:
             logger.error(f"Patient validation failed: {exc}")
             raise HTTPException(status_code=404, detail="Patient not found")
     
-    # 2. Create analysis (PROCESSING)
-    try:
-        analysis = crud.create_analysis(
-            session,
-            schemas.AnalysisCreate(
-                patient_id=patient_id,
-                mode="multi",
-                status=models.AnalysisStatus.PROCESSING,
-            )
-        )
-    except Exception as exc:
-        logger.error(f"Failed to create analysis: {exc}")
-        raise HTTPException(status_code=500, detail="Failed to create analysis")
+    uploads = {"lcc": lcc, "rcc": rcc, "lmlo": lmlo, "rmlo": rmlo}
+    return await _idempotent(
+        session, service, idempotency_key, "multi", uploads, patient_id, async_job, deadline
+    )
+
+
+@app.post("/infer/multi/stream")
+async def infer_multi_stream(
+    lcc: UploadFile = File(..., description="Left Craniocaudal view image."),
+    rcc: UploadFile = File(..., description="Right Craniocaudal view image."),
+    lmlo: UploadFile = File(..., description="Left Mediolateral Oblique view image."),
+    rmlo: UploadFile = File(..., description="Right Mediolateral Oblique view image."),
+    patient_id: Optional[int] = Form(None),
+    stream_format: schemas.StreamFormat = Query(
+        "sse", alias="format", description="Server-sent events or newline-delimited JSON."
+    ),
+    deadline: Deadline = Depends(request_deadline),
+    service: Union[InferenceService, TorchInferenceService] = Depends(get_model_service),
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    """
+    Run four-view inference, streaming each view's result as soon as it is ready.
+    
+    Emits one ``view`` event (``schemas.ViewEvent``) per view in completion
+    order, then a ``summary`` event (``schemas.StudySummaryEvent``) once every
+    view is stored and the analysis is COMPLETED. A failure mid-stream, including
+    a passed deadline, emits an ``error`` event and marks the analysis FAILED;
+    if the client disconnects, the remaining views are dropped, the stored
+    files deleted and the analysis marked FAILED.
+    """
+    logger.info(f"Starting streamed multi inference (patient_id={patient_id})")
+    
+    if patient_id:
+        try:
+            await async_crud.get_patient(session, patient_id)
+        except Exception:
+            raise HTTPException(status_code=404, detail="Patient not found")
     
+    uploads = {"lcc": lcc, "rcc": rcc, "lmlo": lmlo, "rmlo": rmlo}
+    analysis = await async_crud.create_analysis(
+        session, schemas.AnalysisCreate(patient_id=patient_id, mode="multi")
+    )
     try:
-        # 3. Read images and run predictions
-        uploads = {"lcc": lcc, "rcc": rcc, "lmlo": lmlo, "rmlo": rmlo}
-        images = await _read_images(uploads)
-        predictions = await _predict_async(service, images)
-        
-        # 4. Save files and create AnalysisImage records
-        for view_name, upload_file in uploads.items():
-            try:
-                # Reset file pointer
-                await upload_file.seek(0)
-
-                # Save file
-                file_info = await file_manager.save_upload(
-                    upload_file,
-                    patient_id=patient_id,
-                    analysis_id=analysis.id,
-                    view_name=view_name,
-                )
-
-                # Get prediction data
-                prediction = predictions[view_name]
-
-                # Create AnalysisImage
-                crud.create_analysis_image(
-                    session,
-                    analysis.id,
-                    schemas.AnalysisImageCreate(
-                        view_type=models.ImageViewType(view_name.lower()),
-                        file_id=file_info["file_id"],
-                        filename=file_info["filename"],
-                        original_filename=file_info["original_filename"],
-                        file_path=file_info["file_path"],
-                        relative_path=file_info["relative_path"],
-                        thumbnail_path=file_info.get("thumbnail_path"),
-                        file_size=file_info["file_size"],
-                        file_hash=file_info["file_hash"],
-                        content_type=file_info.get("content_type"),
-                        width=prediction.size.width,
-                        height=prediction.size.height,
-                        detections_count=len(prediction.detections),
-                        detections_data={"detections": [d.model_dump() for d in prediction.detections]},
-                    )
-                )
-            except Exception as exc:
-                logger.error(f"Failed to save {view_name} image: {exc}")
-                # Continue with other images
-            finally:
-                try:
-                    await upload_file.close()
-                except Exception:
-                    pass
-        
-        # 5. Update analysis with results
-        total, dominant_label, dominant_category, summary = _summarise_predictions("multi", predictions)
-        
-        crud.update_analysis(
-            session,
-            analysis,
-            schemas.AnalysisUpdate(
-                status=models.AnalysisStatus.COMPLETED,
-                total_findings=total,
-                dominant_label=dominant_label,
-                dominant_category=dominant_category,
-                summary=summary,
-            )
-        )
-        
-        logger.info(f"Multi inference completed: analysis_id={analysis.id}")
-        
-        # 6. Return response
-        return InferenceResponse(
-            mode="multi",
-            views=predictions,
-            model=service.model_info,
-            analysis_id=analysis.id,
-        )
-        
+        files = await _ingest_uploads(uploads, "multi", patient_id, analysis.id)
+        sources = await _upload_sources(uploads)
     except Exception as exc:
-        # Mark analysis as FAILED
-        try:
-            crud.update_analysis(
-                session,
-                analysis,
-                schemas.AnalysisUpdate(status=models.AnalysisStatus.FAILED)
-            )
-        except:
-            pass
-        
-        logger.error(f"Multi inference failed: {exc}")
-        raise HTTPException(status_code=500, detail=f"Inference failed: {str(exc)}")
+        await async_crud.fail_analysis(session, analysis, _failure_reason(exc))
+        raise
+    events = _stream_study(service, analysis.id, sources, files, stream_format, deadline)
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        events,
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/infer/single", response_model=InferenceResponse)
 async def infer_single(
     image: UploadFile = File(..., description="Single-view image under review."),
     patient_id: Optional[int] = Form(None),
+    async_job: bool = Query(
+        False, alias="async", description="Queue the image and return 202 immediately."
+    ),
+    idempotency_key: Optional[str] = Header(
+        None, description="Retries with the same key return the original analysis."
+    ),
+    deadline: Deadline = Depends(request_deadline),
     service: Union[InferenceService, TorchInferenceService] = Depends(get_model_service),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> InferenceResponse:
-    """Run inference on a single suspicious image with file storage."""
+    """Run inference on a single suspicious image with file storage (``?async=true`` queues it)."""
     logger.info(f"Starting single inference (patient_id={patient_id})")
     
     # Validate patient
     if patient_id:
         try:
-            patient = crud.get_patient(session, patient_id)
+            await async_crud.get_patient(session, patient_id)
         except Exception:
             raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Create analysis
-    try:
-        analysis = crud.create_analysis(
-            session,
-            schemas.AnalysisCreate(
-                patient_id=patient_id,
-                mode="single",
-                status=models.AnalysisStatus.PROCESSING,
-            )
-        )
-    except Exception as exc:
-        logger.error(f"Failed to create analysis: {exc}")
-        raise HTTPException(status_code=500, detail="Failed to create analysis")
+    return await _idempotent(
+        session,
+        service,
+        idempotency_key,
+        "single",
+        {"image": image},
+        patient_id,
+        async_job,
+        deadline,
+    )
+
+
+async def _infer_study(
+    session: AsyncSession,
+    service: Union[InferenceService, TorchInferenceService],
+    mode: schemas.InferenceMode,
+    uploads: Dict[str, UploadFile],
+    patient_id: Optional[int],
+    deadline: Optional[Deadline] = None,
+    watch_client: bool = True,
+) -> tuple[models.Analysis, Dict[str, Dict[str, object]], InferenceResponse]:
+    """Store, predict and persist one study; the analysis is FAILED on error."""
+    # The analysis is only written once its outcome is known
+    analysis = models.Analysis(
+        patient_id=patient_id, mode=mode, status=models.AnalysisStatus.PROCESSING
+    )
     
     try:
-        # Read file content first (before closing)
-        await image.seek(0)
-        file_content = await image.read()
-        
-        # Create PIL image from bytes
-        pil_image = Image.open(io.BytesIO(file_content)).convert("RGB")
-        
-        # Run prediction
-        prediction = await asyncio.to_thread(service.predict, pil_image)
-        
-        # Save file - create new BytesIO with content and reset position
-        temp_file = io.BytesIO(file_content)
-        temp_file.seek(0)
-        temp_file.name = image.filename or "image.jpg"
-        
-        # Create new UploadFile instance with correct parameters
-        from starlette.datastructures import UploadFile as StarletteUploadFile
-        temp_upload = StarletteUploadFile(
-            filename=image.filename or "image.jpg",
-            file=temp_file,
-        )
-        
-        file_info = await file_manager.save_upload(
-            temp_upload,
-            patient_id=patient_id,
-            analysis_id=analysis.id,
-            view_name="single",
+        # Stream uploads to storage concurrently, decode each once and predict
+        files, predictions = await _ingest_and_predict(
+            service, uploads, mode, patient_id, deadline, watch_client
         )
         
-        # Create AnalysisImage
-        crud.create_analysis_image(
-            session,
-            analysis.id,
-            schemas.AnalysisImageCreate(
-                view_type=models.ImageViewType.SINGLE.value,
-                file_id=file_info["file_id"],
-                filename=file_info["filename"],
-                original_filename=file_info["original_filename"],
-                file_path=file_info["file_path"],
-                relative_path=file_info["relative_path"],
-                thumbnail_path=file_info.get("thumbnail_path"),
-                file_size=file_info["file_size"],
-                file_hash=file_info["file_hash"],
-                content_type=file_info.get("content_type"),
-                width=prediction.size.width,
-                height=prediction.size.height,
-                detections_count=len(prediction.detections),
-                detections_data={"detections": [d.model_dump() for d in prediction.detections]},
-            )
-        )
-        
-        # Update analysis
-        total, dominant_label, dominant_category, summary = _summarise_predictions("single", {"image": prediction})
-        
-        crud.update_analysis(
-            session,
-            analysis,
-            schemas.AnalysisUpdate(
-                status=models.AnalysisStatus.COMPLETED,
-                total_findings=total,
-                dominant_label=dominant_label,
-                dominant_category=dominant_category,
-                summary=summary,
-            )
-        )
+        # Insert the analysis, its images and the results in one transaction
+        await _complete_analysis(session, analysis, mode, predictions, files)
         
-        logger.info(f"Single inference completed: analysis_id={analysis.id}")
+        logger.info(f"{mode.capitalize()} inference completed: analysis_id={analysis.id}")
         
-        return InferenceResponse(
-            mode="single",
-            views={"image": prediction},
+        response = InferenceResponse(
+            mode=mode,
+            views=predictions,
             model=service.model_info,
             analysis_id=analysis.id,
         )
+        return analysis, files, response
         
     except Exception as exc:
-        # Mark as FAILED
+        # Record the analysis as FAILED
         try:
-            crud.update_analysis(
-                session,
-                analysis,
-                schemas.AnalysisUpdate(status=models.AnalysisStatus.FAILED)
-            )
+            await async_crud.fail_analysis(session, analysis, _failure_reason(exc))
         except:
             pass
         
-        logger.error(f"Single inference failed: {exc}")
+        logger.error(f"{mode.capitalize()} inference failed: {exc}")
+        if isinstance(exc, (AppException, HTTPException)):
+            raise
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(exc)}")
 
 
+async def _idempotent(
+    session: AsyncSession,
+    service: Union[InferenceService, TorchInferenceService],
+    key: Optional[str],
+    mode: schemas.InferenceMode,
+    uploads: Dict[str, UploadFile],
+    patient_id: Optional[int],
+    async_job: bool,
+    deadline: Optional[Deadline] = None,
+) -> Union[InferenceResponse, JSONResponse]:
+    """Run or queue a study, replaying the original result for a repeated key."""
+    if key is None:
+        if async_job:
+            queued = await _submit_job(session, mode, uploads, patient_id, deadline)
+            return _job_accepted(queued[0])
+        return (await _infer_study(session, service, mode, uploads, patient_id, deadline))[2]
+    
+    key = idempotency.validate_key(key)
+    while (holder := await idempotency.acquire(session, key)) is not None:
+        replayed = await _replay(session, service, holder, mode, uploads, patient_id, async_job)
+        if replayed is not None:
+            return replayed
+    
+    try:
+        if async_job:
+            analysis, files = await _submit_job(session, mode, uploads, patient_id, deadline)
+            response = _job_accepted(analysis)
+        else:
+            # A retry attaches to this analysis, so a client that hangs up
+            # does not cancel it; only the deadline does.
+            analysis, files, response = await _infer_study(
+                session, service, mode, uploads, patient_id, deadline, watch_client=False
+            )
+    except BaseException:
+        # Failed submissions are not remembered: a retry runs them again.
+        await async_crud.release_idempotency_key(session, key)
+        raise
+    
+    file_hashes = {view: info["file_hash"] for view, info in files.items()}
+    await async_crud.complete_idempotency_key(
+        session,
+        key,
+        analysis.id,
+        idempotency.request_hash(mode, patient_id, async_job, file_hashes),
+        get_settings().idempotency_ttl_s,
+    )
+    return response
+
+
+async def _replay(
+    session: AsyncSession,
+    service: Union[InferenceService, TorchInferenceService],
+    holder: models.IdempotencyKey,
+    mode: schemas.InferenceMode,
+    uploads: Dict[str, UploadFile],
+    patient_id: Optional[int],
+    async_job: bool,
+) -> Optional[JSONResponse]:
+    """Answer a repeated key from its stored analysis; ``None`` if that analysis is gone."""
+    file_hashes = await idempotency.upload_hashes(uploads)
+    if holder.request_hash != idempotency.request_hash(mode, patient_id, async_job, file_hashes):
+        raise ConflictError(
+            "Idempotency-Key was already used for a different request",
+            details={"idempotency_key": holder.key},
+        )
+    try:
+        analysis = await async_crud.get_analysis(session, holder.analysis_id)
+    except NotFoundError:
+        await async_crud.forget_idempotency_key(session, holder.key)
+        return None
+    
+    logger.info(f"Replaying analysis {analysis.id} for Idempotency-Key {holder.key}")
+    if async_job:
+        response = _job_accepted(analysis)
+    else:
+        images = await async_crud.list_analysis_images(session, analysis.id)
+        views = {
+            "image" if mode == "single" else image.view_type.value: ViewPrediction(
+                size=schemas.ImageSize(width=image.width, height=image.height),
+                detections=image_detections(image),
+            )
+            for image in images
+        }
+        replayed = InferenceResponse(
+            mode=mode, views=views, model=service.model_info, analysis_id=analysis.id
+        )
+        response = JSONResponse(replayed.model_dump(mode="json"))
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+@app.post("/infer/batch")
+async def infer_batch(
+    manifest: Optional[str] = Form(
+        None,
+        description=(
+            "JSON list of studies ({study_id, patient_id, views: {view: file name}}). "
+            "Defaults to manifest.json inside the archive."
+        ),
+    ),
+    files: Optional[List[UploadFile]] = File(None, description="Image files named in the manifest."),
+    archive: Optional[UploadFile] = File(None, description="Zip or tar archive of image files."),
+    deadline: Deadline = Depends(bulk_request_deadline),
+    service: Union[InferenceService, TorchInferenceService] = Depends(get_model_service),
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    """
+    Run inference on many studies in one request, streaming one NDJSON line per study.
+    
+    Studies are grouped ``INFERENCE_BATCH_STUDIES`` at a time and all their
+    views are predicted in one model batch, while the next group is stored.
+    Each line is a ``schemas.BatchStudyResult``; a study that fails is reported
+    (and its analysis marked FAILED) without stopping the rest of the batch.
+    Studies not yet predicted when the deadline (``X-Request-Timeout``, default
+    ``BULK_DEADLINE_S``) passes or the client disconnects are dropped and FAILED.
+    """
+    studies, members = await collect_batch(manifest, files or [], archive)
+    for patient_id in {study.patient_id for study in studies if study.patient_id}:
+        try:
+            await async_crud.get_patient(session, patient_id)
+        except Exception:
+            raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
+    
+    logger.info(f"Starting batch inference of {len(studies)} studies")
+    return StreamingResponse(
+        _stream_batch(service, studies, members, deadline),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ============ HELPER FUNCTIONS ============
 
-async def _read_image(upload: UploadFile, view: str) -> Image.Image:
-    """Read an uploaded file into a PIL image, validating the content."""
+async def _ingest_uploads(
+    uploads: Dict[str, UploadFile],
+    mode: schemas.InferenceMode,
+    patient_id: Optional[int],
+    analysis_id: Optional[int] = None,
+) -> Dict[str, Dict[str, object]]:
+    """Stream the uploads to storage concurrently, hashing and size-checking them.
+
+    If any upload fails, the ones already stored are deleted again.
+    """
+    views = list(uploads)
+    results = await asyncio.gather(
+        *(
+            file_manager.ingest_upload(
+                uploads[view],
+                patient_id=patient_id,
+                analysis_id=analysis_id,
+                view_name="single" if mode == "single" else view,
+            )
+            for view in views
+        ),
+        return_exceptions=True,
+    )
+    files = {view: result for view, result in zip(views, results) if isinstance(result, dict)}
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await _discard_files(files)
+        raise errors[0]
+    return files
+
+
+async def _discard_files(files: Dict[str, Dict[str, object]]) -> None:
+    """Delete stored uploads (and thumbnails) of a request that failed."""
+    for file_info in files.values():
+        await file_manager.delete_file(str(file_info["file_path"]))
+
+
+async def _upload_sources(uploads: Dict[str, UploadFile]) -> Dict[str, ImageSource]:
+    """Rewind the uploads so the spooled request files can be decoded directly."""
+    for upload in uploads.values():
+        await upload.seek(0)
+    return {view: upload.file for view, upload in uploads.items()}
+
+
+async def _ingest_and_predict(
+    service: InferenceService,
+    uploads: Dict[str, UploadFile],
+    mode: schemas.InferenceMode,
+    patient_id: Optional[int],
+    deadline: Optional[Deadline] = None,
+    watch_client: bool = True,
+) -> tuple[Dict[str, Dict[str, object]], Dict[str, ViewPrediction]]:
+    """Store the uploads, then decode, thumbnail and predict them in one thread hop.
+
+    With a ``deadline`` the prediction is abandoned once it passes or (with
+    ``watch_client``) the client disconnects, unless it has already reached
+    the model.
+    """
+    files = await _ingest_uploads(uploads, mode, patient_id)
     try:
-        content = await upload.read()
-        image = Image.open(io.BytesIO(content))
-        return image.convert("RGB")
+        sources = await _upload_sources(uploads)
+        attempt = deadline.attempt() if deadline is not None else None
+        predicting = asyncio.to_thread(_predict_stored_sync, service, sources, files, attempt)
+        if attempt is None:
+            predictions = await predicting
+        else:
+            predictions = await run_until_cancelled(predicting, attempt, watch_client)
+    except Exception:
+        await _discard_files(files)
+        raise
+    return files, predictions
+
+
+def _decode_target_size(service: InferenceService) -> Optional[int]:
+    """Longest side the model needs, or ``None`` to decode at full resolution."""
+    imgsz = getattr(service, "imgsz", None)
+    if not get_settings().reduced_decode or not imgsz:
+        return None
+    if getattr(service, "auto_crop", False):
+        # The service crops before fitting to imgsz; keep resolution for the crop.
+        return imgsz * CROP_DECODE_HEADROOM
+    return imgsz
+
+
+def _result_fingerprint(service: InferenceService) -> str:
+    """Cache fingerprint covering the model and the decode resolution."""
+    return model_fingerprint(service, f"decode={_decode_target_size(service)}")
+
+
+def _decode_image(source: ImageSource, view: str, target_size: Optional[int]) -> DecodedImage:
+    """Decode an uploaded image for inference, validating the content."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        with metrics.stage("decode", view=view):
+            return decode_image(source, target_size)
     except UnidentifiedImageError as exc:
         raise HTTPException(
             status_code=400, detail=f"{view} view must be a valid image file."
         ) from exc
 
 
-async def _read_images(uploads: Dict[str, UploadFile]) -> Dict[str, Image.Image]:
-    """Read multiple uploads asynchronously into PIL images."""
-    tasks = [_read_image(upload, view=key) for key, upload in uploads.items()]
-    images_list = await asyncio.gather(*tasks)
-    return dict(zip(uploads.keys(), images_list))
-
+def _predict_cached_sync(
+    service: InferenceService,
+    views: List[str],
+    digest: Callable[[str], str],
+    load: Callable[[str], DecodedImage],
+    attempt: Optional[Attempt] = None,
+) -> Dict[str, ViewPrediction]:
+    """Predict ``views``, serving repeated images from the result cache.
 
-async def _predict_async(
-    service: InferenceService, images: Dict[str, Image.Image]
+    ``digest(view)`` gives the SHA-256 of a view's bytes (only needed when
+    the cache is enabled) and ``load(view)`` its decoded image (only called on
+    a miss). Misses are sent to the model as one batch, unless ``attempt``
+    has been abandoned by then. Boxes are always returned in original pixel
+    coordinates. Blocking: call from a worker thread.
+    """
+    cache = get_result_cache()
+    predictions: Dict[str, ViewPrediction] = {}
+    cache_keys: Dict[str, str] = {}
+    if cache is not None:
+        fingerprint = _result_fingerprint(service)
+        for view in views:
+            cache_keys[view] = cache.make_key(digest(view), fingerprint)
+            cached = cache.get(cache_keys[view])
+            if cached is not None:
+                predictions[view] = cached
+
+    missing = {view: load(view) for view in views if view not in predictions}
+    if missing:
+        if attempt is not None:
+            attempt.reach_model()
+        with tracing.span("predict", views=",".join(missing)):
+            fresh = service.predict_batch(missing)
+        predictions.update(fresh)
+        if cache is not None:
+            for view, prediction in fresh.items():
+                cache.set(cache_keys[view], prediction)
+
+    return {view: predictions[view] for view in views}
+
+
+def _predict_stored_sync(
+    service: InferenceService,
+    sources: Dict[str, ImageSource],
+    files: Dict[str, Dict[str, object]],
+    attempt: Optional[Attempt] = None,
 ) -> Dict[str, ViewPrediction]:
-    """Run model predictions asynchronously for a batch of PIL images."""
-    tasks = [asyncio.to_thread(service.predict, image) for image in images.values()]
-    predictions_list = await asyncio.gather(*tasks)
-    return dict(zip(images.keys(), predictions_list))
+    """Predict stored uploads, decoding each at most once.
+
+    The result cache is checked first, keyed by the hash computed while the
+    upload was streamed to disk; hits skip decode and model, and their
+    thumbnails are created on first request (``FileManager.defer_thumbnail``).
+    On a miss the single decode (at reduced resolution when possible) feeds
+    the model, the thumbnail and the reported dimensions. Thumbnail paths are
+    recorded in ``files``. An abandoned ``attempt`` stops the work before the
+    decode and again before the model. Blocking: call from a worker thread.
+    """
+    if attempt is not None:
+        attempt.start()
+    target_size = _decode_target_size(service)
+
+    def load(view: str) -> DecodedImage:
+        image = _decode_image(sources[view], view, target_size)
+        file_manager.store_thumbnail(files[view], Image.fromarray(image.pixels))
+        return image
+
+    predictions = _predict_cached_sync(
+        service,
+        list(sources),
+        lambda view: str(files[view]["file_hash"]),
+        load,
+        attempt,
+    )
+    for view in predictions:
+        if not files[view].get("thumbnail_path"):
+            file_manager.defer_thumbnail(files[view])
+    return predictions
+
+
+def _predict_studies_sync(
+    service: InferenceService,
+    studies: List[tuple[Dict[str, ImageSource], Dict[str, Dict[str, object]]]],
+    attempt: Optional[Attempt] = None,
+) -> List[Union[Dict[str, ViewPrediction], Exception]]:
+    """Predict several stored studies with a single model call.
+
+    All views of all studies go to the model as one batch. If that batch fails
+    (e.g. one corrupt upload), each study is retried on its own so the error
+    only affects the offending study. Returns each study's predictions, or the
+    exception it raised. Blocking: call from a worker thread.
+    """
+    if len(studies) > 1:
+        try:
+            sources: Dict[str, ImageSource] = {}
+            files: Dict[str, Dict[str, object]] = {}
+            for index, (study_sources, study_files) in enumerate(studies):
+                for view, source in study_sources.items():
+                    sources[f"{index}/{view}"] = source
+                    files[f"{index}/{view}"] = study_files[view]
+            flat = _predict_stored_sync(service, sources, files, attempt)
+            results: List[Dict[str, ViewPrediction]] = [{} for _ in studies]
+            for key, prediction in flat.items():
+                index, view = key.split("/", 1)
+                results[int(index)][view] = prediction
+            return results
+        except RequestCancelledError as exc:
+            return [exc for _ in studies]
+        except Exception as exc:
+            logger.warning(f"Batched prediction of {len(studies)} studies failed, running them one by one: {exc}")
+
+    outcomes: List[Union[Dict[str, ViewPrediction], Exception]] = []
+    for study_sources, study_files in studies:
+        try:
+            outcomes.append(_predict_stored_sync(service, study_sources, study_files, attempt))
+        except Exception as exc:
+            outcomes.append(exc)
+    return outcomes
+
+
+def _view_type(mode: schemas.InferenceMode, view: str) -> models.ImageViewType:
+    """Stored view type for a prediction key."""
+    if mode == "single":
+        return models.ImageViewType.SINGLE
+    return models.ImageViewType(view.lower())
+
+
+def _image_record(
+    view_type: models.ImageViewType, file_info: Dict[str, object], prediction: ViewPrediction
+) -> schemas.AnalysisImageCreate:
+    """Build the AnalysisImage payload for a stored upload and its prediction."""
+    return schemas.AnalysisImageCreate(
+        view_type=view_type,
+        file_id=file_info["file_id"],
+        filename=file_info["filename"],
+        original_filename=file_info["original_filename"],
+        file_path=file_info["file_path"],
+        relative_path=file_info["relative_path"],
+        thumbnail_path=file_info.get("thumbnail_path"),
+        file_size=file_info["file_size"],
+        file_hash=file_info["file_hash"],
+        content_type=file_info.get("content_type"),
+        width=prediction.size.width,
+        height=prediction.size.height,
+        detections_count=len(prediction.detections),
+        detections_packed=pack_detections(prediction.detections),
+    )
+
+
+def _completion_fields(
+    mode: schemas.InferenceMode,
+    predictions: Dict[str, ViewPrediction],
+    files: Dict[str, Dict[str, object]],
+) -> Dict[str, object]:
+    """``complete_analysis`` keyword arguments: the summary and the image records."""
+    total, dominant_label, dominant_category, summary = _summarise_predictions(mode, predictions)
+    return {
+        "total_findings": total,
+        "dominant_label": dominant_label,
+        "dominant_category": dominant_category,
+        "summary": summary,
+        "images": [
+            _image_record(_view_type(mode, view), files[view], predictions[view]) for view in files
+        ],
+    }
+
+
+async def _complete_analysis(
+    session: AsyncSession,
+    analysis: models.Analysis,
+    mode: schemas.InferenceMode,
+    predictions: Dict[str, ViewPrediction],
+    files: Dict[str, Dict[str, object]],
+) -> None:
+    """Write the analysis, its images and the summarised predictions in one transaction.
+
+    ``analysis`` may not be inserted yet; it then gets its id here.
+    """
+    with tracing.span("complete_analysis", images=len(files)):
+        await async_crud.complete_analysis(
+            session, analysis, **_completion_fields(mode, predictions, files)
+        )
+
+
+def _complete_analysis_sync(
+    session: Session,
+    analysis: models.Analysis,
+    mode: schemas.InferenceMode,
+    predictions: Dict[str, ViewPrediction],
+    files: Dict[str, Dict[str, object]],
+) -> None:
+    """``_complete_analysis`` for job threads and scripts on a sync session."""
+    with tracing.span("complete_analysis", images=len(files)):
+        crud.complete_analysis(session, analysis, **_completion_fields(mode, predictions, files))
+
+
+def _failure_reason(exc: Exception) -> str:
+    """Short, user-facing reason stored on a FAILED analysis."""
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return str(exc) or exc.__class__.__name__
+
+
+def _stream_event(stream_format: schemas.StreamFormat, event: str, payload: dict) -> str:
+    """Encode one event as an SSE frame or an NDJSON line."""
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+
+async def _stream_study(
+    service: InferenceService,
+    analysis_id: int,
+    sources: Dict[str, ImageSource],
+    files: Dict[str, Dict[str, object]],
+    stream_format: schemas.StreamFormat,
+    deadline: Optional[Deadline] = None,
+):
+    """Predict each view separately and yield its event as soon as it completes."""
+    deadline = deadline or Deadline()
+
+    async def predict_view(view: str):
+        attempt = deadline.attempt()
+        predicting = asyncio.to_thread(
+            _predict_stored_sync, service, {view: sources[view]}, {view: files[view]}, attempt
+        )
+        # Starlette ends the stream itself when the client disconnects.
+        predictions = await run_until_cancelled(predicting, attempt, watch_client=False)
+        return view, predictions[view]
+
+    tasks = [asyncio.ensure_future(predict_view(view)) for view in sources]
+    predictions: Dict[str, ViewPrediction] = {}
+    async with async_session_scope() as session:
+        analysis = await async_crud.get_analysis(session, analysis_id)
+        try:
+            await async_crud.update_analysis(
+                session, analysis, schemas.AnalysisUpdate(status=models.AnalysisStatus.PROCESSING)
+            )
+            for next_view in asyncio.as_completed(tasks):
+                view, prediction = await next_view
+                predictions[view] = prediction
+                event = schemas.ViewEvent(view=view, prediction=prediction)
+                yield _stream_event(stream_format, "view", event.model_dump(mode="json"))
+            
+            ordered = {view: predictions[view] for view in sources}
+            total, dominant_label, dominant_category, summary = _summarise_predictions(
+                "multi", ordered
+            )
+            await _complete_analysis(session, analysis, "multi", ordered, files)
+            logger.info(f"Streamed multi inference completed: analysis_id={analysis_id}")
+            summary_event = schemas.StudySummaryEvent(
+                analysis_id=analysis_id,
+                mode="multi",
+                total_findings=total,
+                dominant_label=dominant_label,
+                dominant_category=dominant_category,
+                totals=summary["totals"],
+                model=service.model_info,
+            )
+            yield _stream_event(stream_format, "summary", summary_event.model_dump(mode="json"))
+        except Exception as exc:
+            reason = _failure_reason(exc)
+            logger.error(f"Streamed multi inference failed: {reason}")
+            await async_crud.fail_analysis(session, analysis, reason)
+            if isinstance(exc, RequestCancelledError):
+                # Let views still on a worker thread stop before their files go.
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await _discard_files(files)
+            yield _stream_event(
+                stream_format, "error", {"analysis_id": analysis_id, "detail": reason}
+            )
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away and Starlette cancelled or closed the stream.
+            deadline.cancel(CLIENT_DISCONNECTED)
+            logger.warning(f"Streamed multi inference abandoned: analysis_id={analysis_id}")
+            with anyio.CancelScope(shield=True):
+                await async_crud.fail_analysis(session, analysis, CLIENT_DISCONNECTED)
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await _discard_files(files)
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def _stream_batch(
+    service: InferenceService,
+    studies: List[schemas.BatchStudy],
+    members: Dict[str, UploadFile],
+    deadline: Optional[Deadline] = None,
+):
+    """Store, predict and record batch studies group by group, yielding NDJSON lines.
+
+    Storing group ``n + 1`` overlaps with the model predicting group ``n`` on
+    a worker thread, so the model is kept busy with full batches.
+    """
+    deadline = deadline or Deadline()
+    started = asyncio.get_running_loop().time()
+    completed = failed = 0
+    async with async_session_scope() as session:
+
+        async def store(group: Sequence[schemas.BatchStudy]):
+            """Stream each study's files to storage; analyses are written by ``record``."""
+            stored = []
+            for study in group:
+                analysis = models.Analysis(
+                    patient_id=study.patient_id,
+                    mode=study.mode,
+                    status=models.AnalysisStatus.PROCESSING,
+                )
+                uploads = {view: members[name] for view, name in study.views.items()}
+                try:
+                    deadline.check()
+                    files = await _ingest_uploads(uploads, study.mode, study.patient_id)
+                    sources = {view: upload.file for view, upload in uploads.items()}
+                    stored.append((study, analysis, (sources, files)))
+                except Exception as exc:
+                    stored.append((study, analysis, exc))
+            return stored
+
+        async def record(study, analysis, files, outcome) -> schemas.BatchStudyResult:
+            """Write one study's analysis, images and outcome in one transaction."""
+            result = schemas.BatchStudyResult(
+                study_id=study.study_id,
+                status=models.AnalysisStatus.FAILED,
+                mode=study.mode,
+            )
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                await _complete_analysis(session, analysis, study.mode, outcome, files)
+                result.status = models.AnalysisStatus.COMPLETED
+                result.total_findings = analysis.total_findings
+                result.dominant_label = analysis.dominant_label
+                result.dominant_category = analysis.dominant_category
+                result.views = outcome
+            except Exception as exc:
+                result.error = _failure_reason(exc)
+                try:
+                    await async_crud.fail_analysis(session, analysis, result.error)
+                except Exception:
+                    pass
+                if isinstance(exc, RequestCancelledError):
+                    await _discard_files(files)
+            result.analysis_id = analysis.id
+            return result
+
+        async def finish(stored, predicting, attempt):
+            """Wait for a group's predictions and record every study of the group."""
+            nonlocal completed, failed
+            try:
+                predicted = iter(
+                    await run_until_cancelled(predicting, attempt, watch_client=False)
+                )
+            except RequestCancelledError as exc:
+                predicted = itertools.repeat(exc)
+            lines = []
+            for study, analysis, item in stored:
+                if isinstance(item, Exception):
+                    result = await record(study, analysis, {}, item)
+                else:
+                    result = await record(study, analysis, item[1], next(predicted))
+                if result.status == models.AnalysisStatus.COMPLETED:
+                    completed += 1
+                else:
+                    failed += 1
+                lines.append(result.model_dump_json() + "\n")
+            return lines
+
+        # Groups stored but not yet recorded, oldest first.
+        pending: List[tuple] = []
+        try:
+            for group in chunked(studies, settings.inference_batch_studies):
+                stored = await store(group)
+                items = [item for _, _, item in stored if not isinstance(item, Exception)]
+                attempt = deadline.attempt()
+                predicting = asyncio.ensure_future(
+                    asyncio.to_thread(_predict_studies_sync, service, items, attempt)
+                )
+                pending.append((stored, predicting, attempt))
+                if len(pending) > 1:
+                    lines = await finish(*pending[0])
+                    pending.pop(0)
+                    for line in lines:
+                        yield line
+            while pending:
+                lines = await finish(*pending[0])
+                pending.pop(0)
+                for line in lines:
+                    yield line
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away: drop predictions that have not reached the
+            # model, record those that have, and fail the rest.
+            deadline.cancel(CLIENT_DISCONNECTED)
+            logger.warning(f"Batch inference abandoned by its client ({len(pending)} groups left)")
+            with anyio.CancelScope(shield=True):
+                for group in pending:
+                    await finish(*group)
+            raise
+
+    elapsed = asyncio.get_running_loop().time() - started
+    logger.info(
+        f"Batch inference finished: {completed} completed, {failed} failed "
+        f"in {elapsed:.1f}s ({len(studies) / max(elapsed, 1e-9):.2f} studies/s)"
+    )
+
+
+# ============ ASYNCHRONOUS JOBS ============
+
+def _job_sources(job: InferenceJob) -> Dict[str, ImageSource]:
+    """Stored upload paths of a job, decoded straight from disk."""
+    return {view: Path(str(file_info["file_path"])) for view, file_info in job.files.items()}
+
+
+def _process_job(
+    job: InferenceJob,
+    predictions: Union[Dict[str, ViewPrediction], Exception, None] = None,
+) -> None:
+    """Run a queued job: PENDING -> PROCESSING -> COMPLETED or FAILED.
+
+    ``predictions`` may be supplied (or the error raised while computing them)
+    when the job was already predicted as part of a larger batch; otherwise
+    the stored uploads are decoded and predicted here.
+    """
+    # Continues the submitting request's trace, if it had one.
+    with tracing.trace("inference_job", parent=job.traceparent, analysis_id=job.analysis_id):
+        with session_scope() as session:
+            analysis = crud.get_analysis(session, job.analysis_id)
+            crud.update_analysis(
+                session, analysis, schemas.AnalysisUpdate(status=models.AnalysisStatus.PROCESSING)
+            )
+            try:
+                if isinstance(predictions, Exception):
+                    raise predictions
+                if predictions is None:
+                    attempt = Deadline(job.deadline).attempt()
+                    predictions = _predict_stored_sync(
+                        get_model_service(), _job_sources(job), job.files, attempt
+                    )
+                _complete_analysis_sync(session, analysis, job.mode, predictions, job.files)
+                logger.info(f"Inference job completed: analysis_id={analysis.id}")
+            except Exception as exc:
+                crud.fail_analysis(session, analysis, _failure_reason(exc))
+                if isinstance(exc, RequestCancelledError):
+                    for file_info in job.files.values():
+                        file_manager.remove_file(str(file_info["file_path"]))
+                raise
+
+
+def process_job_batch(jobs: List[InferenceJob]) -> List[Optional[Exception]]:
+    """Run several queued jobs with a single model call.
+
+    See ``_predict_studies_sync``: a corrupt upload only fails its own job.
+    Jobs whose deadline passed while they were queued are failed without
+    reaching the model. Returns each job's error, ``None`` on success.
+    """
+    outcomes: Dict[int, Union[Dict[str, ViewPrediction], Exception]] = {}
+    live = []
+    for index, job in enumerate(jobs):
+        try:
+            Deadline(job.deadline).check()
+            live.append(index)
+        except RequestCancelledError as exc:
+            outcomes[index] = exc
+    if live:
+        # One model call serves every job; its spans join the first job's trace.
+        with tracing.trace(
+            "inference_job_batch",
+            parent=jobs[live[0]].traceparent,
+            analysis_ids=",".join(str(jobs[i].analysis_id) for i in live),
+        ):
+            predicted = _predict_studies_sync(
+                get_model_service(), [(_job_sources(jobs[i]), jobs[i].files) for i in live]
+            )
+        outcomes.update(zip(live, predicted))
+
+    errors: List[Optional[Exception]] = []
+    for index, job in enumerate(jobs):
+        outcome = outcomes[index]
+        try:
+            _process_job(job, outcome)
+            errors.append(None)
+        except Exception as exc:
+            logger.error(f"Inference job for analysis {job.analysis_id} failed: {exc}")
+            errors.append(exc)
+    return errors
+
+
+def fail_job(job: InferenceJob, reason: str) -> None:
+    """Mark a job's analysis FAILED without running it."""
+    with session_scope() as session:
+        crud.fail_analysis(session, crud.get_analysis(session, job.analysis_id), reason)
+
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> Union[InferenceJobQueue, RedisJobQueue]:
+    """Singleton accessor for the inference job queue.
+
+    With ``JOB_BACKEND=redis`` jobs go to the Redis stream drained by
+    ``python -m app.worker``; otherwise they run on in-process threads.
+    """
+    if settings.job_backend == "redis":
+        if not settings.redis_url:
+            raise RuntimeError("JOB_BACKEND=redis requires REDIS_URL")
+        job_queue = RedisJobQueue(
+            redis.Redis.from_url(settings.redis_url, decode_responses=True),
+            stream=settings.job_stream,
+            group=settings.job_group,
+            max_queue=settings.inference_job_queue_size,
+        )
+        job_queue.ensure_group()
+        return job_queue
+    return InferenceJobQueue(
+        _process_job,
+        workers=settings.inference_job_workers,
+        max_queue=settings.inference_job_queue_size,
+    )
+
+
+async def _submit_job(
+    session: AsyncSession,
+    mode: schemas.InferenceMode,
+    uploads: Dict[str, UploadFile],
+    patient_id: Optional[int],
+    deadline: Optional[Deadline] = None,
+) -> tuple[models.Analysis, Dict[str, Dict[str, object]]]:
+    """Stream the uploads to storage, create a PENDING analysis and queue it.
+
+    The job carries the deadline only when the client set ``X-Request-Timeout``;
+    otherwise a queued job has no one waiting on it and always runs.
+    """
+    queue = get_job_queue()
+    # RedisJobQueue talks to Redis synchronously; keep it off the event loop.
+    if await asyncio.to_thread(queue.full):
+        raise ServiceUnavailableError("Inference queue is full, retry later")
+
+    analysis = await async_crud.create_analysis(
+        session, schemas.AnalysisCreate(patient_id=patient_id, mode=mode)
+    )
+    try:
+        # The worker decodes each stored file once for the model and thumbnail.
+        files = await _ingest_uploads(uploads, mode, patient_id, analysis.id)
+        await asyncio.to_thread(
+            queue.submit,
+            InferenceJob(
+                analysis_id=analysis.id,
+                mode=mode,
+                files=files,
+                patient_id=patient_id,
+                deadline=deadline.expires_at if deadline and deadline.from_client else None,
+                traceparent=tracing.current_traceparent(),
+            ),
+        )
+    except Exception as exc:
+        await async_crud.fail_analysis(session, analysis, _failure_reason(exc))
+        raise
+
+    logger.info(f"Queued {mode} inference job: analysis_id={analysis.id}")
+    return analysis, files
+
+
+def _job_accepted(analysis: models.Analysis) -> JSONResponse:
+    """202 response pointing at the status endpoint of a queued analysis."""
+    status_url = f"/analyses/{analysis.id}/status"
+    accepted = schemas.JobAccepted(
+        analysis_id=analysis.id, status=analysis.status, status_url=status_url
+    )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=accepted.model_dump(mode="json"),
+        headers={"Location": status_url},
+    )
 
 
 # ============ FILE SERVING ENDPOINTS ============
@@ -590,8 +1482,10 @@ async def serve_image(year: str, month: str, day: str, filename: str):
 async def serve_thumbnail(year: str, month: str, day: str, filename: str):
     """Serve thumbnail images."""
     try:
-        file_path = file_manager.thumbnails_dir / year / month / day / filename
-        if not file_path.exists():
+        requested = file_manager.thumbnails_dir / year / month / day / filename
+        # Thumbnails of cached predictions are created on first request.
+        file_path = await asyncio.to_thread(file_manager.ensure_thumbnail, requested)
+        if file_path is None:
             raise HTTPException(status_code=404, detail="Thumbnail not found")
         return FileResponse(file_path)
     except Exception as exc:
@@ -602,42 +1496,42 @@ async def serve_thumbnail(year: str, month: str, day: str, filename: str):
 # ============ STATISTICS ENDPOINTS ============
 
 @app.get("/statistics", response_model=schemas.StatisticsResponse)
-def get_statistics(session: Session = Depends(get_session)):
+async def get_statistics(session: AsyncSession = Depends(get_async_session)):
     """Get overall statistics for dashboard."""
-    stats = crud.get_statistics(session)
+    stats = await async_crud.get_statistics(session)
     return schemas.StatisticsResponse(**stats)
 
 
 @app.get("/statistics/trends")
-def get_trends(
+async def get_trends(
     days: int = 30,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Get trend data for charts."""
-    trends = crud.get_analysis_trends(session, days=days)
+    trends = await async_crud.get_analysis_trends(session, days=days)
     return trends
 
 
 @app.get("/statistics/findings")
-def get_findings_breakdown(session: Session = Depends(get_session)):
+async def get_findings_breakdown(session: AsyncSession = Depends(get_async_session)):
     """Get breakdown of findings by category."""
-    breakdown = crud.get_findings_breakdown(session)
+    breakdown = await async_crud.get_findings_breakdown(session)
     return breakdown
 
 
 # ============ SEARCH ENDPOINTS ============
 
 @app.get("/search")
-def global_search(
+async def global_search(
     q: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Global search across patients and analyses."""
     if not q or len(q) < 2:
         return {"patients": [], "analyses": []}
     
-    patients = crud.search_patients(session, q, limit=10)
-    analyses = crud.search_analyses(session, q, limit=10)
+    patients = await async_crud.search_patients(session, q, limit=10)
+    analyses = await async_crud.search_analyses(session, q, limit=10)
     
     return {
         "patients": [
@@ -656,25 +1550,25 @@ def global_search(
 # ============ PATIENT CRUD ENDPOINTS ============
 
 @app.post("/patients", response_model=schemas.PatientRead, status_code=status.HTTP_201_CREATED)
-def create_patient(
-    payload: schemas.PatientCreate, session: Session = Depends(get_session)
+async def create_patient(
+    payload: schemas.PatientCreate, session: AsyncSession = Depends(get_async_session)
 ) -> schemas.PatientRead:
     """Create a new patient."""
-    patient = crud.create_patient(session, payload)
-    return _patient_to_schema(session, patient)
+    patient = await async_crud.create_patient(session, payload)
+    return await _patient_to_schema(session, patient)
 
 
 @app.get("/patients", response_model=schemas.PatientListResponse)
-def list_patients(
+async def list_patients(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     is_active: Optional[bool] = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> schemas.PatientListResponse:
     """List all patients with pagination and filters."""
-    patients = crud.list_patients(session, skip=skip, limit=limit, search=search, is_active=is_active)
-    total = crud.count_patients(session, is_active=is_active)
+    patients = await async_crud.list_patients(session, skip=skip, limit=limit, search=search, is_active=is_active)
+    total = await async_crud.count_patients(session, is_active=is_active)
     
     items = [
         schemas.PatientListItem(
@@ -699,57 +1593,57 @@ def list_patients(
 
 
 @app.get("/patients/{patient_id}", response_model=schemas.PatientRead)
-def retrieve_patient(
-    patient_id: int, session: Session = Depends(get_session)
+async def retrieve_patient(
+    patient_id: int, session: AsyncSession = Depends(get_async_session)
 ) -> schemas.PatientRead:
     """Get a single patient by ID."""
-    patient = crud.get_patient(session, patient_id)
-    return _patient_to_schema(session, patient)
+    patient = await async_crud.get_patient(session, patient_id)
+    return await _patient_to_schema(session, patient)
 
 
 @app.patch("/patients/{patient_id}", response_model=schemas.PatientRead)
-def update_patient(
+async def update_patient(
     patient_id: int,
     payload: schemas.PatientUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> schemas.PatientRead:
     """Update a patient."""
-    patient = crud.get_patient(session, patient_id)
-    updated = crud.update_patient(session, patient, payload)
-    return _patient_to_schema(session, updated)
+    patient = await async_crud.get_patient(session, patient_id)
+    updated = await async_crud.update_patient(session, patient, payload)
+    return await _patient_to_schema(session, updated)
 
 
 @app.delete("/patients/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_patient(
+async def delete_patient(
     patient_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Soft delete a patient."""
-    crud.delete_patient(session, patient_id)
+    await async_crud.delete_patient(session, patient_id)
     return None
 
 
 # ============ ANALYSIS CRUD ENDPOINTS ============
 
 @app.get("/analyses", response_model=schemas.AnalysisListResponse)
-def list_analyses(
+async def list_analyses(
     skip: int = 0,
     limit: int = 50,
     status: Optional[models.AnalysisStatus] = None,
     patient_id: Optional[int] = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """List all analyses with pagination and filters."""
     limit = max(1, limit or 0)
     skip = max(0, skip or 0)
-    analyses = crud.list_all_analyses(
+    analyses = await async_crud.list_all_analyses(
         session,
         skip=skip,
         limit=limit,
         status=status,
         patient_id=patient_id,
     )
-    total = crud.count_analyses(session, status=status, patient_id=patient_id)
+    total = await async_crud.count_analyses(session, status=status, patient_id=patient_id)
     
     return schemas.AnalysisListResponse(
         items=[_analysis_to_summary(a) for a in analyses],
@@ -760,59 +1654,59 @@ def list_analyses(
 
 
 @app.get("/analyses/{analysis_id}", response_model=schemas.AnalysisRead)
-def get_analysis(
+async def get_analysis(
     analysis_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Get a single analysis with images."""
-    analysis = crud.get_analysis(session, analysis_id)
-    images = crud.list_analysis_images(session, analysis_id)
+    analysis = await async_crud.get_analysis(session, analysis_id)
+    images = await async_crud.list_analysis_images(session, analysis_id)
     
-    return schemas.AnalysisRead(
-        **_analysis_to_summary(analysis).model_dump(),
-        findings_description=analysis.findings_description,
-        recommendations=analysis.recommendations,
-        updated_at=analysis.updated_at,
-        images=[
-            schemas.AnalysisImageRead(**img.model_dump())
-            for img in images
-        ],
+    return _analysis_to_read(analysis, images)
+
+
+@app.get("/analyses/{analysis_id}/status", response_model=schemas.AnalysisStatusRead)
+async def get_analysis_status(
+    analysis_id: int,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Lightweight status of an analysis, for polling asynchronous jobs."""
+    analysis = await async_crud.get_analysis(session, analysis_id)
+    return schemas.AnalysisStatusRead(
+        analysis_id=analysis.id,
+        status=analysis.status,
+        total_findings=analysis.total_findings,
+        dominant_category=analysis.dominant_category,
+        error_message=analysis.error_message,
+        created_at=analysis.created_at,
+        completed_at=analysis.completed_at,
     )
 
 
 @app.patch("/analyses/{analysis_id}", response_model=schemas.AnalysisRead)
-def update_analysis(
+async def update_analysis(
     analysis_id: int,
     payload: schemas.AnalysisUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Update an analysis (findings, recommendations)."""
-    analysis = crud.get_analysis(session, analysis_id)
-    updated = crud.update_analysis(session, analysis, payload)
-    images = crud.list_analysis_images(session, analysis_id)
+    analysis = await async_crud.get_analysis(session, analysis_id)
+    updated = await async_crud.update_analysis(session, analysis, payload)
+    images = await async_crud.list_analysis_images(session, analysis_id)
     
-    return schemas.AnalysisRead(
-        **_analysis_to_summary(updated).model_dump(),
-        findings_description=updated.findings_description,
-        recommendations=updated.recommendations,
-        updated_at=updated.updated_at,
-        images=[
-            schemas.AnalysisImageRead(**img.model_dump())
-            for img in images
-        ],
-    )
+    return _analysis_to_read(updated, images)
 
 
 @app.delete("/analyses/{analysis_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_analysis(
+async def delete_analysis(
     analysis_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Delete an analysis and its associated images."""
     logger.info(f"Deleting analysis {analysis_id}")
     try:
-        analysis = crud.get_analysis(session, analysis_id)
-        crud.delete_analysis(session, analysis)
+        analysis = await async_crud.get_analysis(session, analysis_id)
+        await async_crud.delete_analysis(session, analysis)
         logger.info(f"Successfully deleted analysis {analysis_id}")
     except Exception as exc:
         logger.error(f"Failed to delete analysis {analysis_id}: {exc}")
@@ -820,14 +1714,14 @@ def delete_analysis(
 
 
 @app.get("/export/analyses/{analysis_id}/json")
-def export_analysis_json(
+async def export_analysis_json(
     analysis_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Return analysis payload in JSON format for archival or integrations."""
     try:
-        analysis = crud.get_analysis(session, analysis_id)
-        images = crud.list_analysis_images(session, analysis_id)
+        analysis = await async_crud.get_analysis(session, analysis_id)
+        images = await async_crud.list_analysis_images(session, analysis_id)
     except Exception as exc:
         logger.error(f"Failed to export analysis {analysis_id}: {exc}")
         raise HTTPException(status_code=404, detail="Analysis not found")
@@ -837,14 +1731,14 @@ def export_analysis_json(
 
 
 @app.get("/export/analyses/{analysis_id}/pdf")
-def export_analysis_pdf(
+async def export_analysis_pdf(
     analysis_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Generate a lightweight PDF summary for download."""
     try:
-        analysis = crud.get_analysis(session, analysis_id)
-        images = crud.list_analysis_images(session, analysis_id)
+        analysis = await async_crud.get_analysis(session, analysis_id)
+        images = await async_crud.list_analysis_images(session, analysis_id)
     except Exception as exc:
         logger.error(f"Failed to export analysis {analysis_id}: {exc}")
         raise HTTPException(status_code=404, detail="Analysis not found")
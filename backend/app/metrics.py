@@ -0,0 +1,292 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are plain dicts behind a lock, so recording a sample
+costs a dict lookup and a bisect; nothing is exported until ``/metrics`` is
+scraped. Gauges are callbacks read at scrape time.
+
+Inference pipeline timings go to ``inference_stage_seconds`` labelled by
+stage; see ``STAGES``. Each timed stage, DB commits included, is also a
+``app.tracing`` span. Services running in ``app.process_pool_service``
+worker processes record into those processes, so their model stages are not
+visible here.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; wide enough for both a DB commit and a large-model forward pass.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+STAGES = (
+    "upload_read",
+    "file_save",
+    "decode",
+    "thumbnail",
+    "preprocess",
+    "model_forward",
+    "to_view_prediction",
+    "db_commit",
+)
+
+LabelKey = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Bucketed distribution per label set, plus its sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label key -> [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Gauge(_Metric):
+    """Value read from ``function`` at scrape time; ``None`` skips the sample."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], Optional[float]]) -> None:
+        super().__init__(name, documentation)
+        self.function = function
+
+    def samples(self) -> Iterator[str]:
+        value = self.function()
+        if value is not None:
+            yield f"{self.name} {_format_value(value)}"
+
+
+def render() -> str:
+    """All registered metrics in the text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def _thread_pool_queue_depth() -> Optional[float]:
+    """Calls waiting for a thread in the event loop's default executor."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    executor = getattr(loop, "_default_executor", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    return float(work_queue.qsize()) if work_queue is not None else 0.0
+
+
+def _thread_pool_threads() -> Optional[float]:
+    """Threads started by the event loop's default executor."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    executor = getattr(loop, "_default_executor", None)
+    return float(len(getattr(executor, "_threads", ()))) if executor is not None else 0.0
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by method, route and status.", ("method", "endpoint", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route.", ("method", "endpoint")
+)
+INFERENCE_STAGE_SECONDS = Histogram(
+    "inference_stage_seconds", "Time spent in each inference pipeline stage.", ("stage",)
+)
+MODEL_LOCK_WAIT_SECONDS = Histogram(
+    "model_lock_wait_seconds", "Time waiting for a model replica's lock before the forward pass."
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a database connection from the pool.", ("engine",)
+)
+Gauge(
+    "thread_pool_queue_depth",
+    "Calls queued for the event loop's default thread pool (asyncio.to_thread).",
+    _thread_pool_queue_depth,
+)
+Gauge("thread_pool_threads", "Threads started by the event loop's default thread pool.", _thread_pool_threads)
+
+
+@contextmanager
+def stage(name: str, **attributes: object) -> Iterator[None]:
+    """Time one ``STAGES`` entry, traced as a span with ``attributes``."""
+    started = time.perf_counter()
+    try:
+        with tracing.span(name, **attributes):
+            yield
+    finally:
+        INFERENCE_STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    INFERENCE_STAGE_SECONDS.observe(seconds, stage=name)
+
+
+@contextmanager
+def model_lock(lock: threading.Lock) -> Iterator[None]:
+    """Hold ``lock``, recording how long it took to get it."""
+    started = time.perf_counter()
+    with lock:
+        MODEL_LOCK_WAIT_SECONDS.observe(time.perf_counter() - started)
+        yield
+
+
+class TimedCheckout:
+    """Pool mixin recording how long each checkout waited for a connection."""
+
+    metrics_label = "default"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, engine=self.metrics_label)
+
+
+@event.listens_for(Session, "before_commit")
+def _commit_started(session: Session) -> None:
+    session.info["metrics_commit_started"] = time.perf_counter()
+    session.info["metrics_commit_span"] = tracing.start_span("commit")
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session: Session) -> None:
+    started = session.info.pop("metrics_commit_started", None)
+    if started is not None:
+        observe_stage("db_commit", time.perf_counter() - started)
+    span = session.info.pop("metrics_commit_span", None)
+    if span is not None:
+        span.end()
+
+
+@event.listens_for(Session, "after_rollback")
+def _commit_abandoned(session: Session) -> None:
+    session.info.pop("metrics_commit_started", None)
+    span = session.info.pop("metrics_commit_span", None)
+    if span is not None:
+        span.error = "rolled back"
+        span.end()
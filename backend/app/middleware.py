@@ -4,101 +4,118 @@ from __future__ import annotations
 
 import time
 import uuid
-from typing import Callable
 
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import URL, MutableHeaders
 
+from . import tracing
 from .exceptions import AppException
 from .logger import get_logger
+from .metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS
 
 logger = get_logger(__name__)
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Add request ID to all requests."""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        
-        return response
+class RequestMiddleware:
+    """Request ID, request logging, timing and global exception handling.
 
+    A single pure ASGI middleware: ``BaseHTTPMiddleware`` runs every request
+    in an extra task and re-wraps its body stream, which slows small requests
+    and breaks streaming and file responses. Headers are added to the
+    ``http.response.start`` message as it passes, and the body is untouched.
+    Each request is the root span of its trace (see ``app.tracing``).
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Log all requests and responses."""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
         start_time = time.time()
-        request_id = getattr(request.state, "request_id", "unknown")
-        
+        request_uuid = uuid.uuid4()
+        request_id = str(request_uuid)
+        scope.setdefault("state", {})["request_id"] = request_id
+        method = scope["method"]
+        url = str(URL(scope=scope))
+        client = scope.get("client")
+        status_code = 500
+        response_started = False
+
         logger.info(
             f"Request started",
             extra={
                 "request_id": request_id,
-                "method": request.method,
-                "url": str(request.url),
-                "client": request.client.host if request.client else "unknown",
-            }
-        )
-        
-        response = await call_next(request)
-        
-        process_time = time.time() - start_time
-        
-        logger.info(
-            f"Request completed",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "url": str(request.url),
-                "status_code": response.status_code,
-                "process_time": f"{process_time:.3f}s",
+                "method": method,
+                "url": url,
+                "client": client[0] if client else "unknown",
             }
         )
-        
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        return response
 
+        async def send_with_headers(message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = str(time.time() - start_time)
+            await send(message)
 
-class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
-    """Handle exceptions globally."""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        try:
-            return await call_next(request)
-        except AppException as exc:
-            logger.error(
-                f"Application error: {exc.message}",
-                extra={
-                    "request_id": getattr(request.state, "request_id", "unknown"),
-                    "status_code": exc.status_code,
-                    "details": exc.details,
-                }
-            )
-            return JSONResponse(
-                status_code=exc.status_code,
-                content={
-                    "detail": exc.message,
-                    "request_id": getattr(request.state, "request_id", "unknown"),
-                }
-            )
-        except Exception as exc:
-            logger.exception(
-                "Unhandled exception",
-                extra={
-                    "request_id": getattr(request.state, "request_id", "unknown"),
-                }
-            )
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "detail": "Internal server error",
-                    "request_id": getattr(request.state, "request_id", "unknown"),
-                }
-            )
+        # The trace id is the request id, so X-Request-ID finds the trace.
+        with tracing.trace(
+            "http.request", trace_id=request_uuid.hex, request_id=request_id, method=method, url=url
+        ) as root:
+            try:
+                await self.app(scope, receive, send_with_headers)
+            except AppException as exc:
+                logger.error(
+                    f"Application error: {exc.message}",
+                    extra={
+                        "request_id": request_id,
+                        "status_code": exc.status_code,
+                        "details": exc.details,
+                    }
+                )
+                if response_started:
+                    raise
+                response = JSONResponse(
+                    status_code=exc.status_code,
+                    content={"detail": exc.message, "request_id": request_id},
+                    headers=exc.headers,
+                )
+                await response(scope, receive, send_with_headers)
+            except Exception:
+                logger.exception(
+                    "Unhandled exception",
+                    extra={"request_id": request_id},
+                )
+                if response_started:
+                    raise
+                response = JSONResponse(
+                    status_code=500,
+                    content={"detail": "Internal server error", "request_id": request_id},
+                )
+                await response(scope, receive, send_with_headers)
+            finally:
+                process_time = time.time() - start_time
+                # The route template keeps IDs out of the label values.
+                route = scope.get("route")
+                endpoint = getattr(route, "path", "unmatched")
+                HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=str(status_code))
+                HTTP_REQUEST_SECONDS.observe(process_time, method=method, endpoint=endpoint)
+                if root is not None:
+                    root.name = f"{method} {endpoint}"
+                    root.set(status_code=status_code)
+                logger.info(
+                    f"Request completed",
+                    extra={
+                        "request_id": request_id,
+                        "method": method,
+                        "url": url,
+                        "status_code": status_code,
+                        "process_time": f"{process_time:.3f}s",
+                    }
+                )
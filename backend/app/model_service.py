@@ -2,16 +2,18 @@
 
 from __future__ import annotations
 
+import copy
 import os
 from functools import lru_cache
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List
+from typing import Dict, List, Sequence
 
 import numpy as np
-from PIL import Image
 from ultralytics import YOLO
 
+from .image_decode import DecodedImage, ImageInput, prepare_image
+from .metrics import model_lock, stage
 from .schemas import BoundingBox, Detection, ImageSize, ModelInfo, ViewPrediction
 
 
@@ -26,6 +28,7 @@ class InferenceService:
         imgsz: int | None = None,
         iou: float | None = None,
         augment: bool = False,
+        auto_crop: bool = False,
     ) -> None:
         self.weights_path = weights_path
         self.device = device or "cpu"
@@ -33,7 +36,12 @@ class InferenceService:
         self.imgsz = imgsz
         self.iou = iou
         self.augment = augment
+        self.auto_crop = auto_crop
         self._lock = Lock()
+        self._load_model()
+
+    def _load_model(self) -> None:
+        """Load the weights and describe them in ``class_metadata`` and ``model_info``."""
         self.model = YOLO(str(self.weights_path))
         model_core = getattr(self.model, "model", None)
         model_name = Path(self.weights_path).stem
@@ -49,15 +57,60 @@ class InferenceService:
             confidence_threshold=self.confidence_threshold,
             iou_threshold=self.iou,
             augmentation=self.augment,
+            auto_crop=self.auto_crop,
             classes={idx: meta["label"] for idx, meta in self.class_metadata.items()},
             categories={idx: meta["category"] for idx, meta in self.class_metadata.items()},
         )
 
-    def predict(self, image: Image.Image) -> ViewPrediction:
-        """Run inference on a PIL image and return structured predictions."""
-        # YOLO expects numpy array in RGB order.
-        np_image = np.array(image.convert("RGB"))
-        predict_kwargs = {
+    def predict(self, image: ImageInput) -> ViewPrediction:
+        """Run inference on a decoded or PIL image and return structured predictions."""
+        return self.predict_many([image])[0]
+
+    def predict_batch(self, images: Dict[str, ImageInput]) -> Dict[str, ViewPrediction]:
+        """Predict several named views (e.g. LCC/RCC/LMLO/RMLO) in one forward pass."""
+        views = list(images)
+        predictions = self.predict_many([images[view] for view in views])
+        return dict(zip(views, predictions))
+
+    def predict_many(self, images: Sequence[ImageInput]) -> List[ViewPrediction]:
+        """Run a single batched model call over several images.
+
+        Ultralytics letterboxes every image of the list into one batch tensor, so
+        the model runs a single forward pass for the whole list.
+        """
+        with stage("preprocess"):
+            decoded = self._prepare(images)
+            # Grayscale broadcast to three channels without copying; with identical
+            # channels the BGR/RGB order YOLO assumes for arrays does not matter.
+            np_images = [item.as_rgb() for item in decoded]
+        # Ultralytics letterboxes and runs NMS inside predict: both count as forward.
+        with model_lock(self._lock), stage("model_forward"):
+            results = self.model.predict(np_images, **self._predict_kwargs())
+        with stage("to_view_prediction"):
+            return [
+                self._to_view_prediction(item, result)
+                for item, result in zip(decoded, results)
+            ]
+
+    def clone(self) -> "InferenceService":
+        """Return a replica that shares this service's read-only model weights.
+
+        The replica gets its own lock and its own ultralytics predictor (which is
+        stateful and not thread-safe) but reuses the loaded ``nn.Module``.
+        """
+        replica = copy.copy(self)
+        replica._lock = Lock()
+        replica.model = copy.copy(self.model)
+        replica.model.predictor = None
+        return replica
+
+    def _prepare(self, images: Sequence[ImageInput]) -> List[DecodedImage]:
+        """Grayscale, optionally crop to the breast region, and fit to ``imgsz``."""
+        return [prepare_image(image, self.imgsz, self.auto_crop) for image in images]
+
+    def _predict_kwargs(self) -> Dict[str, object]:
+        """Collect keyword arguments forwarded to ``YOLO.predict``."""
+        predict_kwargs: Dict[str, object] = {
             "device": self.device,
             "conf": self.confidence_threshold,
             "verbose": False,
@@ -68,67 +121,64 @@ class InferenceService:
             predict_kwargs["iou"] = self.iou
         if self.augment:
             predict_kwargs["augment"] = True
+        return predict_kwargs
 
-        with self._lock:
-            results = self.model.predict(np_image, **predict_kwargs)
-        view_prediction = self._to_view_prediction(image.size, results[0])
-        return view_prediction
-
-    def _to_view_prediction(self, size: tuple[int, int], result) -> ViewPrediction:
+    def _to_view_prediction(self, image: DecodedImage, result) -> ViewPrediction:
         """Convert raw YOLO results into a typed view payload."""
-        width, height = size
+        if result.boxes is None or len(result.boxes) == 0:
+            return self._arrays_to_view_prediction(image, np.empty((0, 4)), np.empty(0), np.empty(0))
+        return self._arrays_to_view_prediction(
+            image,
+            result.boxes.xyxy.cpu().numpy(),
+            result.boxes.conf.cpu().numpy(),
+            result.boxes.cls.cpu().numpy(),
+        )
+
+    def _arrays_to_view_prediction(
+        self,
+        image: DecodedImage,
+        bboxes: np.ndarray,
+        confidences: np.ndarray,
+        classes: np.ndarray,
+    ) -> ViewPrediction:
+        """Build a typed view payload from xyxy boxes, scores and class indices.
+
+        Boxes are given in ``image`` pixels and reported in original pixels.
+        """
+        width, height = image.original_size
+        bboxes = image.to_original(bboxes)
         detections: List[Detection] = []
-        if result.boxes is not None and len(result.boxes) > 0:
-            bboxes = result.boxes.xyxy.cpu().numpy()
-            confidences = result.boxes.conf.cpu().numpy()
-            classes = result.boxes.cls.cpu().numpy()
-            for bbox, conf, cls_idx in zip(bboxes, confidences, classes):
-                metadata = self.class_metadata.get(
-                    int(cls_idx),
-                    {
-                        "label": str(int(cls_idx)),
-                        "category": "normal",
-                        "traffic_light": "green",
-                    },
-                )
-                traffic_light = self._resolve_traffic_light(
-                    metadata["category"], float(conf), metadata["traffic_light"]
-                )
-                detections.append(
-                    Detection(
-                        bbox=BoundingBox(
-                            x1=float(bbox[0]),
-                            y1=float(bbox[1]),
-                            x2=float(bbox[2]),
-                            y2=float(bbox[3]),
-                        ),
-                        confidence=float(conf),
-                        label=metadata["label"],
-                        category=metadata["category"],
-                        traffic_light=traffic_light,
-                    )
+        for bbox, conf, cls_idx in zip(bboxes, confidences, classes):
+            metadata = self.class_metadata.get(
+                int(cls_idx),
+                {
+                    "label": str(int(cls_idx)),
+                    "category": "normal",
+                    "traffic_light": "green",
+                },
+            )
+            traffic_light = self._resolve_traffic_light(
+                metadata["category"], float(conf), metadata["traffic_light"]
+            )
+            detections.append(
+                Detection(
+                    bbox=BoundingBox(
+                        x1=float(bbox[0]),
+                        y1=float(bbox[1]),
+                        x2=float(bbox[2]),
+                        y2=float(bbox[3]),
+                    ),
+                    confidence=float(conf),
+                    label=metadata["label"],
+                    category=metadata["category"],
+                    traffic_light=traffic_light,
                 )
+            )
         return ViewPrediction(size=ImageSize(width=width, height=height), detections=detections)
 
     def _build_class_metadata(self) -> Dict[int, Dict[str, str]]:
         """Derive class metadata combining YOLO labels with clinical categories."""
-        default_map = {
-            0: {"label": "BI-RADS 2", "category": "benign", "traffic_light": "amber"},
-            1: {"label": "BI-RADS 4", "category": "malignant", "traffic_light": "red"},
-            2: {"label": "BI-RADS 5", "category": "malignant", "traffic_light": "red"},
-        }
-        metadata: Dict[int, Dict[str, str]] = {}
-        for idx, default_label in self.model.names.items():
-            base = default_map.get(int(idx), {})
-            label = base.get("label", default_label)
-            category = base.get("category", "normal")
-            traffic = base.get("traffic_light", "green" if category == "normal" else "amber")
-            metadata[int(idx)] = {
-                "label": label,
-                "category": category,
-                "traffic_light": traffic,
-            }
-        return metadata
+        return build_class_metadata(self.model.names)
 
     @staticmethod
     def _resolve_traffic_light(category: str, confidence: float, base: str) -> str:
@@ -150,9 +200,29 @@ def _default_weights_path() -> Path:
     return default_path
 
 
-@lru_cache(maxsize=1)
-def get_inference_service() -> InferenceService:
-    """Singleton accessor that constructs the inference service once."""
+def build_class_metadata(names: Dict[int, str]) -> Dict[int, Dict[str, str]]:
+    """Map YOLO class names to clinical labels, categories and traffic lights."""
+    default_map = {
+        0: {"label": "BI-RADS 2", "category": "benign", "traffic_light": "amber"},
+        1: {"label": "BI-RADS 4", "category": "malignant", "traffic_light": "red"},
+        2: {"label": "BI-RADS 5", "category": "malignant", "traffic_light": "red"},
+    }
+    metadata: Dict[int, Dict[str, str]] = {}
+    for idx, default_label in names.items():
+        base = default_map.get(int(idx), {})
+        label = base.get("label", default_label)
+        category = base.get("category", "normal")
+        traffic = base.get("traffic_light", "green" if category == "normal" else "amber")
+        metadata[int(idx)] = {
+            "label": label,
+            "category": category,
+            "traffic_light": traffic,
+        }
+    return metadata
+
+
+def service_kwargs_from_env() -> Dict[str, object]:
+    """Read the YOLO service configuration from ``MODEL_*`` environment variables."""
     weights_env = os.getenv("MODEL_WEIGHTS_PATH")
     weights_path = Path(weights_env) if weights_env else _default_weights_path()
     if not weights_path.exists():
@@ -173,11 +243,21 @@ def get_inference_service() -> InferenceService:
     augment_env = os.getenv("MODEL_AUGMENT", "0")
     augment = augment_env.strip().lower() in {"1", "true", "yes", "on"}
 
-    return InferenceService(
-        weights_path=weights_path,
-        device=device,
-        confidence_threshold=conf_threshold,
-        imgsz=imgsz,
-        iou=iou,
-        augment=augment,
-    )
+    auto_crop_env = os.getenv("MODEL_AUTO_CROP", "0")
+    auto_crop = auto_crop_env.strip().lower() in {"1", "true", "yes", "on"}
+
+    return {
+        "weights_path": weights_path,
+        "device": device,
+        "confidence_threshold": conf_threshold,
+        "imgsz": imgsz,
+        "iou": iou,
+        "augment": augment,
+        "auto_crop": auto_crop,
+    }
+
+
+@lru_cache(maxsize=1)
+def get_inference_service() -> InferenceService:
+    """Singleton accessor that constructs the inference service once."""
+    return InferenceService(**service_kwargs_from_env())
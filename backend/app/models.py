@@ -6,7 +6,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import Column, JSON, String, Text, func
+from sqlalchemy import Column, JSON, LargeBinary, String, Text, func
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -93,6 +93,7 @@ class Analysis(AnalysisBase, table=True):
         sa_column_kwargs={"onupdate": func.now()}
     )
     completed_at: Optional[datetime] = None
+    error_message: Optional[str] = Field(default=None, sa_column=Column(Text))
 
 
 
@@ -106,12 +107,14 @@ class AnalysisImageBase(SQLModel):
     relative_path: str = Field(max_length=500)
     thumbnail_path: Optional[str] = Field(default=None, max_length=500)
     file_size: int = Field(default=0)
-    file_hash: str = Field(max_length=64)
+    file_hash: str = Field(max_length=64, index=True)
     content_type: Optional[str] = Field(default=None, max_length=100)
     width: Optional[int] = None
     height: Optional[int] = None
     detections_count: int = Field(default=0)
+    # Legacy verbose JSON; new rows use the packed form (see app.detections).
     detections_data: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    detections_packed: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
 
 
 
@@ -145,3 +148,15 @@ class AuditLog(SQLModel, table=True):
     )
 
 
+
+
+# Idempotency Key Model (Idempotency-Key header of the inference endpoints)
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+    
+    key: str = Field(primary_key=True, max_length=255)
+    # NULL while the first request is in flight
+    analysis_id: Optional[int] = Field(default=None, index=True)
+    request_hash: Optional[str] = Field(default=None, max_length=64)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
@@ -0,0 +1,225 @@
+"""ONNX Runtime inference service for the exported YOLO weights."""
+
+from __future__ import annotations
+
+import ast
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from .image_decode import ImageInput
+from .logger import get_logger
+from .metrics import stage
+from .model_service import InferenceService, build_class_metadata, service_kwargs_from_env
+from .schemas import ModelInfo, ViewPrediction
+
+logger = get_logger(__name__)
+
+# Same constants as ultralytics' NMS so results line up with the PyTorch path.
+_DEFAULT_IOU = 0.7
+_MAX_NMS_CANDIDATES = 30000
+_MAX_DETECTIONS = 300
+_CLASS_OFFSET = 7680.0
+_PAD_VALUE = 114
+
+# (scale_x, scale_y, pad_left, pad_top) used to map boxes back to the source image.
+LetterboxParams = Tuple[float, float, int, int]
+
+
+def export_onnx(weights_path: Path, imgsz: int) -> Path:
+    """Export ``weights_path`` to ONNX once and cache the file next to the weights."""
+    onnx_path = weights_path.with_suffix(".onnx")
+    if onnx_path.exists() and onnx_path.stat().st_mtime >= weights_path.stat().st_mtime:
+        return onnx_path
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {weights_path} to ONNX (imgsz={imgsz})")
+    exported = YOLO(str(weights_path)).export(
+        format="onnx", imgsz=imgsz, dynamic=True, simplify=False, verbose=False
+    )
+    exported_path = Path(exported)
+    if exported_path != onnx_path:
+        exported_path.replace(onnx_path)
+    return onnx_path
+
+
+def letterbox(
+    image: np.ndarray, imgsz: int, stride: int, auto: bool
+) -> Tuple[np.ndarray, LetterboxParams]:
+    """Resize keeping aspect ratio and pad to ``imgsz`` (or the minimal stride multiple).
+
+    Works on ``(H, W)`` grayscale as well as ``(H, W, C)`` arrays.
+    """
+    height, width = image.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_w, new_h = round(width * ratio), round(height * ratio)
+    pad_w, pad_h = imgsz - new_w, imgsz - new_h
+    if auto:
+        pad_w, pad_h = pad_w % stride, pad_h % stride
+    pad_w, pad_h = pad_w / 2, pad_h / 2
+
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(pad_h - 0.1), round(pad_h + 0.1)
+    left, right = round(pad_w - 0.1), round(pad_w + 0.1)
+    image = cv2.copyMakeBorder(
+        image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(_PAD_VALUE,) * 3
+    )
+    return image, (new_w / width, new_h / height, left, top)
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy NMS over xyxy boxes; returns kept indices in descending score order."""
+    order = np.argsort(-scores, kind="stable")
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    keep: List[int] = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(int(best))
+        inter_w = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def decode_predictions(
+    output: np.ndarray, conf_threshold: float, iou_threshold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Turn one raw YOLO head output ``(4 + nc, anchors)`` into filtered detections."""
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    mask = scores > conf_threshold
+    if not mask.any():
+        return np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int64)
+
+    xywh, scores, classes = predictions[mask, :4], scores[mask], classes[mask]
+    if len(scores) > _MAX_NMS_CANDIDATES:
+        top = np.argsort(-scores, kind="stable")[:_MAX_NMS_CANDIDATES]
+        xywh, scores, classes = xywh[top], scores[top], classes[top]
+
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    # Offsetting by class keeps NMS class-aware in a single pass.
+    keep = non_max_suppression(boxes + classes[:, None] * _CLASS_OFFSET, scores, iou_threshold)
+    keep = keep[:_MAX_DETECTIONS]
+    return boxes[keep], scores[keep], classes[keep]
+
+
+class OnnxInferenceService(InferenceService):
+    """Run the exported YOLO11 weights through ONNX Runtime on CPU.
+
+    Letterboxing, box decoding and NMS are done here in NumPy, mirroring the
+    ultralytics pipeline, so the output matches ``InferenceService``.
+    """
+
+    def __init__(
+        self,
+        weights_path: Path,
+        device: str | None = None,
+        confidence_threshold: float = 0.25,
+        imgsz: int | None = None,
+        iou: float | None = None,
+        augment: bool = False,
+        auto_crop: bool = False,
+    ) -> None:
+        if augment:
+            logger.warning("Test-time augmentation is not supported by the ONNX backend")
+        super().__init__(
+            weights_path,
+            device="cpu",
+            confidence_threshold=confidence_threshold,
+            imgsz=imgsz,
+            iou=iou,
+            augment=False,
+            auto_crop=auto_crop,
+        )
+
+    def _load_model(self) -> None:
+        """Export the weights to ONNX if needed and open a CPU session on them."""
+        onnx_path = export_onnx(self.weights_path, self.imgsz or 640)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.stride = int(metadata.get("stride", 32))
+        self.imgsz = self.imgsz or ast.literal_eval(metadata.get("imgsz", "[640, 640]"))[0]
+        names = ast.literal_eval(metadata["names"]) if "names" in metadata else {0: "0"}
+
+        self.class_metadata = build_class_metadata(names)
+        self.model_info = ModelInfo(
+            name=f"{Path(self.weights_path).stem} (onnxruntime)",
+            weights=onnx_path.name,
+            device=self.device,
+            confidence_threshold=self.confidence_threshold,
+            iou_threshold=self.iou,
+            augmentation=False,
+            auto_crop=self.auto_crop,
+            classes={idx: meta["label"] for idx, meta in self.class_metadata.items()},
+            categories={idx: meta["category"] for idx, meta in self.class_metadata.items()},
+        )
+
+    def predict_many(self, images: Sequence[ImageInput]) -> List[ViewPrediction]:
+        """Letterbox the images into one batch tensor and run a single session call."""
+        with stage("preprocess"):
+            decoded = self._prepare(images)
+            same_shapes = len({item.pixels.shape for item in decoded}) == 1
+            letterboxed = [
+                letterbox(item.pixels, self.imgsz, self.stride, auto=same_shapes) for item in decoded
+            ]
+
+            # Letterbox in grayscale; the channel axis is only materialised by the
+            # float32 conversion that builds the input tensor anyway.
+            gray = np.stack([padded for padded, _ in letterboxed])[:, None]
+            batch = np.broadcast_to(gray, (gray.shape[0], 3, *gray.shape[2:])).astype(np.float32, order="C")
+            batch /= 255.0
+        with stage("model_forward"):
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+
+        iou = self.iou if self.iou is not None else _DEFAULT_IOU
+        predictions: List[ViewPrediction] = []
+        with stage("to_view_prediction"):
+            for item, output, (_, params) in zip(decoded, outputs, letterboxed):
+                boxes, scores, classes = decode_predictions(output, self.confidence_threshold, iou)
+                predictions.append(
+                    self._arrays_to_view_prediction(
+                        item, self._scale_boxes(boxes, params, item.size), scores, classes
+                    )
+                )
+        return predictions
+
+    @staticmethod
+    def _scale_boxes(
+        boxes: np.ndarray, params: LetterboxParams, size: Tuple[int, int]
+    ) -> np.ndarray:
+        """Map letterboxed xyxy boxes back onto the source image and clip them."""
+        scale_x, scale_y, pad_left, pad_top = params
+        width, height = size
+        boxes = boxes.copy()
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_left) / scale_x).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_top) / scale_y).clip(0, height)
+        return boxes
+
+    def clone(self) -> "OnnxInferenceService":
+        # ONNX Runtime sessions are thread-safe; replicas can share one session.
+        return self
+
+
+@lru_cache(maxsize=1)
+def get_onnx_inference_service() -> OnnxInferenceService:
+    """Singleton accessor that exports (if needed) and loads the ONNX model once."""
+    return OnnxInferenceService(**service_kwargs_from_env())
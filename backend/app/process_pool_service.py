@@ -0,0 +1,196 @@
+"""YOLO inference in worker processes with shared-memory image hand-off."""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .image_decode import ImageInput, broadcast_channels
+from .logger import get_logger
+from .model_service import InferenceService, build_class_metadata, service_kwargs_from_env
+from .schemas import ModelInfo, ViewPrediction
+
+logger = get_logger(__name__)
+
+# (shared memory block name, array shape) describing one decoded grayscale image.
+ImageHandle = Tuple[str, Tuple[int, ...]]
+# (xyxy boxes float32 [N, 4], confidences float32 [N], class indices int16 [N]).
+DetectionArrays = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# Per-worker state, populated once by ``_init_worker``.
+_worker_model = None
+_worker_predict_kwargs: Dict[str, object] = {}
+
+
+def _init_worker(weights_path: str, predict_kwargs: Dict[str, object], torch_threads: int) -> None:
+    """Load the YOLO model once per worker process."""
+    global _worker_model, _worker_predict_kwargs
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = YOLO(weights_path)
+    _worker_predict_kwargs = predict_kwargs
+
+
+def _worker_describe() -> Dict[str, object]:
+    """Return model metadata needed by the parent to build ``ModelInfo``."""
+    yaml_config = getattr(getattr(_worker_model, "model", None), "yaml", None)
+    name = yaml_config.get("name") if isinstance(yaml_config, dict) else None
+    return {"names": dict(_worker_model.names), "name": name}
+
+
+def _worker_predict(handles: Sequence[ImageHandle]) -> List[DetectionArrays]:
+    """Predict images read from shared memory and return compact detection arrays."""
+    # Workers are spawned by the API process and share its resource tracker, so
+    # attaching here does not take over cleanup: the parent unlinks each block.
+    blocks = [SharedMemory(name=name) for name, _ in handles]
+    try:
+        images = [
+            broadcast_channels(np.ndarray(shape, dtype=np.uint8, buffer=block.buf))
+            for block, (_, shape) in zip(blocks, handles)
+        ]
+        results = _worker_model.predict(images, **_worker_predict_kwargs)
+        del images
+        outputs: List[DetectionArrays] = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                outputs.append(
+                    (np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int16))
+                )
+                continue
+            outputs.append(
+                (
+                    boxes.xyxy.cpu().numpy().astype(np.float32),
+                    boxes.conf.cpu().numpy().astype(np.float32),
+                    boxes.cls.cpu().numpy().astype(np.int16),
+                )
+            )
+        return outputs
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def share_image(array: np.ndarray) -> Tuple[SharedMemory, ImageHandle]:
+    """Copy a uint8 image array into a new shared memory block."""
+    block = SharedMemory(create=True, size=max(1, array.nbytes))
+    view = np.ndarray(array.shape, dtype=np.uint8, buffer=block.buf)
+    view[...] = array
+    del view
+    return block, (block.name, tuple(array.shape))
+
+
+class ProcessPoolInferenceService(InferenceService):
+    """Run YOLO predictions in a pool of worker processes.
+
+    Each worker loads the model once. Decoded grayscale buffers are handed over
+    through ``multiprocessing.shared_memory`` instead of being pickled, and workers send
+    back only float32/int16 detection arrays; the ``ViewPrediction`` models are
+    built in the API process.
+    """
+
+    def __init__(
+        self,
+        weights_path: Path,
+        device: str | None = None,
+        confidence_threshold: float = 0.25,
+        imgsz: int | None = None,
+        iou: float | None = None,
+        augment: bool = False,
+        auto_crop: bool = False,
+        workers: int = 2,
+        torch_threads: Optional[int] = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        # Shared memory blocks of batches in flight, so ``close`` can free them.
+        self._blocks: Set[SharedMemory] = set()
+        self._blocks_lock = threading.Lock()
+        super().__init__(
+            weights_path,
+            device=device,
+            confidence_threshold=confidence_threshold,
+            imgsz=imgsz,
+            iou=iou,
+            augment=augment,
+            auto_crop=auto_crop,
+        )
+
+    def _load_model(self) -> None:
+        """Start the workers; the model itself lives in them, not in this process."""
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self.weights_path), self._predict_kwargs(), self.torch_threads),
+        )
+        description = self._executor.submit(_worker_describe).result()
+        self.class_metadata = build_class_metadata(description["names"])
+        self.model_info = ModelInfo(
+            name=description["name"] or Path(self.weights_path).stem,
+            weights=self.weights_path.name,
+            device=self.device,
+            confidence_threshold=self.confidence_threshold,
+            iou_threshold=self.iou,
+            augmentation=self.augment,
+            auto_crop=self.auto_crop,
+            classes={idx: meta["label"] for idx, meta in self.class_metadata.items()},
+            categories={idx: meta["category"] for idx, meta in self.class_metadata.items()},
+        )
+
+    def predict_many(self, images: Sequence[ImageInput]) -> List[ViewPrediction]:
+        """Send a batch of images to one worker process and wait for the result."""
+        decoded = self._prepare(images)
+        blocks: List[SharedMemory] = []
+        try:
+            handles: List[ImageHandle] = []
+            for item in decoded:
+                block, handle = share_image(item.pixels)
+                with self._blocks_lock:
+                    self._blocks.add(block)
+                blocks.append(block)
+                handles.append(handle)
+            outputs = self._executor.submit(_worker_predict, handles).result()
+        finally:
+            self._release(blocks)
+        return [
+            self._arrays_to_view_prediction(item, boxes, confidences, classes)
+            for item, (boxes, confidences, classes) in zip(decoded, outputs)
+        ]
+
+    def clone(self) -> "ProcessPoolInferenceService":
+        # The worker processes are the replicas; every caller can share the pool.
+        return self
+
+    def _release(self, blocks: Sequence[SharedMemory]) -> None:
+        """Unlink the blocks ``close`` has not already freed."""
+        with self._blocks_lock:
+            owned = [block for block in blocks if block in self._blocks]
+            self._blocks.difference_update(owned)
+        for block in owned:
+            block.close()
+            block.unlink()
+
+    def close(self) -> None:
+        """Stop the worker processes and free the shared memory of unfinished batches."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._blocks_lock:
+            leftover = list(self._blocks)
+        self._release(leftover)
+
+
+@lru_cache(maxsize=1)
+def get_process_pool_service(workers: int = 2) -> ProcessPoolInferenceService:
+    """Singleton accessor that starts the inference worker processes once."""
+    logger.info(f"Starting {workers} inference worker process(es)")
+    return ProcessPoolInferenceService(**service_kwargs_from_env(), workers=workers)
@@ -0,0 +1,280 @@
+"""On-demand profiling of the next requests to a route.
+
+An operator arms the profiler through ``POST /admin/profiling`` (guarded by
+``PROFILING_TOKEN``) with a route, a request count and a profiler:
+
+* ``cprofile`` traces every call on the event loop thread. Work handed to
+  ``asyncio.to_thread`` is not seen, and coroutines of other requests that
+  interleave on the loop are.
+* ``sampling`` records the stacks of every thread each ``SAMPLE_INTERVAL_S``,
+  so worker-thread decode and inference show up, with the same caveat about
+  concurrent requests.
+
+Each profiled request writes ``<request id>.prof`` (``pstats``/snakeviz) or
+``<request id>.folded`` (flame graph stacks) plus a ``<request id>.json``
+hot-function report into ``PROFILING_DIR``. Only one request is profiled at a
+time; while nothing is armed the middleware costs one attribute check.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern
+
+from starlette.routing import compile_path
+
+from .config import get_settings
+from .exceptions import NotFoundError, ValidationError
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILERS = ("cprofile", "sampling")
+SAMPLE_INTERVAL_S = 0.005
+REPORT_FUNCTIONS = 30
+
+
+@dataclass
+class _Arming:
+    route: str
+    pattern: Pattern[str]
+    method: Optional[str]
+    profiler: str
+    remaining: int
+
+
+class _SamplingProfiler:
+    """Count the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval_s: float = SAMPLE_INTERVAL_S) -> None:
+        self.interval_s = interval_s
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def hot_functions(self, limit: int) -> List[Dict[str, object]]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        stack_samples = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": function,
+                "self_samples": own[function],
+                "total_samples": total[function],
+                "self_pct": round(100 * own[function] / stack_samples, 2),
+            }
+            for function, _ in own.most_common(limit)
+        ]
+
+
+def _cprofile_hot_functions(profile: cProfile.Profile, limit: int) -> List[Dict[str, object]]:
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{name} ({Path(filename).name}:{line})",
+                "calls": ncalls,
+                "self_s": round(tottime, 6),
+                "cumulative_s": round(cumtime, 6),
+            }
+        )
+    rows.sort(key=lambda row: row["self_s"], reverse=True)
+    return rows[:limit]
+
+
+class RequestProfiler:
+    """Arms profiling for the next N matching requests and stores their reports."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.armed: Optional[_Arming] = None
+        self._busy = False
+
+    def arm(self, route: str, count: int, profiler: str = "cprofile", method: Optional[str] = None) -> None:
+        if profiler not in PROFILERS:
+            raise ValidationError(f"profiler must be one of {', '.join(PROFILERS)}")
+        if count < 1:
+            raise ValidationError("count must be at least 1")
+        self.armed = _Arming(
+            route=route,
+            pattern=compile_path(route)[0],
+            method=method.upper() if method else None,
+            profiler=profiler,
+            remaining=count,
+        )
+        logger.warning(f"Profiling armed: next {count} request(s) to {route} with {profiler}")
+
+    def disarm(self) -> None:
+        self.armed = None
+
+    def status(self) -> Dict[str, object]:
+        armed = self.armed
+        return {
+            "armed": None
+            if armed is None
+            else {
+                "route": armed.route,
+                "method": armed.method,
+                "profiler": armed.profiler,
+                "remaining": armed.remaining,
+            },
+            "profiling": self._busy,
+            "profiles": self.list_reports(),
+        }
+
+    def claim(self, scope) -> Optional[str]:
+        """Profiler to run for this request, consuming one armed slot; ``None`` to skip."""
+        armed = self.armed
+        if armed is None or self._busy:
+            return None
+        if armed.method is not None and scope["method"] != armed.method:
+            return None
+        if not armed.pattern.match(scope["path"]):
+            return None
+        armed.remaining -= 1
+        if armed.remaining <= 0:
+            self.armed = None
+        self._busy = True
+        return armed.profiler
+
+    async def run(self, profiler: str, scope, call) -> None:
+        """Await ``call()`` under ``profiler`` and write the profile and its report."""
+        request_id = scope.get("state", {}).get("request_id") or f"request-{time.time_ns()}"
+        status: Dict[str, int] = {}
+        started = time.perf_counter()
+        sampler = profile = None
+        try:
+            if profiler == "sampling":
+                sampler = _SamplingProfiler()
+                sampler.start()
+            else:
+                profile = cProfile.Profile()
+                profile.enable()
+            try:
+                await call(status)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                if sampler is not None:
+                    sampler.stop()
+            duration_s = time.perf_counter() - started
+            self._write(request_id, scope, status.get("code"), profiler, duration_s, profile, sampler)
+        finally:
+            self._busy = False
+
+    def _write(self, request_id, scope, status_code, profiler, duration_s, profile, sampler) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        report: Dict[str, object] = {
+            "request_id": request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status_code": status_code,
+            "profiler": profiler,
+            "duration_ms": round(duration_s * 1000, 3),
+            "created_at": time.time(),
+        }
+        if profile is not None:
+            profile_path = self.directory / f"{request_id}.prof"
+            profile.dump_stats(str(profile_path))
+            report["functions"] = _cprofile_hot_functions(profile, REPORT_FUNCTIONS)
+        else:
+            profile_path = self.directory / f"{request_id}.folded"
+            profile_path.write_text(sampler.folded(), encoding="utf-8")
+            report["samples"] = sampler.samples
+            report["functions"] = sampler.hot_functions(REPORT_FUNCTIONS)
+        report["profile_file"] = profile_path.name
+        (self.directory / f"{request_id}.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.warning(f"Profiled {scope['method']} {scope['path']}: {profile_path}")
+
+    def list_reports(self) -> List[Dict[str, object]]:
+        if not self.directory.exists():
+            return []
+        reports = []
+        for path in sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+            report = json.loads(path.read_text(encoding="utf-8"))
+            report.pop("functions", None)
+            reports.append(report)
+        return reports
+
+    def report(self, request_id: str) -> Dict[str, object]:
+        """Hot-function report of a profiled request."""
+        path = self.directory / f"{Path(request_id).name}.json"
+        if not path.exists():
+            raise NotFoundError(f"No profile for request {request_id}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+
+@lru_cache(maxsize=1)
+def get_request_profiler() -> RequestProfiler:
+    """Shared profiler writing into ``PROFILING_DIR``."""
+    return RequestProfiler(get_settings().profiling_dir)
+
+
+class ProfilingMiddleware:
+    """Profile the requests the ``RequestProfiler`` has been armed for.
+
+    Must run inside ``RequestMiddleware`` so the request id is known.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        profiler = get_request_profiler()
+        if profiler.armed is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        kind = profiler.claim(scope)
+        if kind is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def call(status: Dict[str, int]) -> None:
+            async def send_with_status(message) -> None:
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+        await profiler.run(kind, scope, call)
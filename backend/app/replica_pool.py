@@ -0,0 +1,129 @@
+"""Pool of model replicas that spreads inference across CPU cores."""
+
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import torch
+from PIL import Image
+
+from .image_decode import ImageInput
+from .logger import get_logger
+from .schemas import ViewPrediction
+
+logger = get_logger(__name__)
+
+
+class ReplicaPool:
+    """Dispatch predictions to the least-loaded idle replica of a model service.
+
+    Each replica keeps its own lock, so up to ``len(replicas)`` predictions run
+    concurrently. When every replica is busy, callers wait for the next one to
+    become idle instead of queueing on a specific replica's lock.
+    """
+
+    def __init__(self, replicas: Sequence, threads_per_replica: Optional[int] = None) -> None:
+        if not replicas:
+            raise ValueError("ReplicaPool needs at least one replica")
+        self.replicas = list(replicas)
+        self.threads_per_replica = threads_per_replica
+        self._busy = [False] * len(self.replicas)
+        self._served = [0] * len(self.replicas)
+        self._waiting = 0
+        self._condition = threading.Condition()
+
+    def __getattr__(self, name: str):
+        # All replicas are configured identically; expose the first one's attributes.
+        return getattr(self.replicas[0], name)
+
+    def predict(self, image: ImageInput) -> ViewPrediction:
+        """Run a single prediction on an idle replica."""
+        with self._replica() as replica:
+            return replica.predict(image)
+
+    def predict_batch(self, images: Dict[str, ImageInput]) -> Dict[str, ViewPrediction]:
+        """Run a batch of named views on one idle replica."""
+        with self._replica() as replica:
+            return replica.predict_batch(images)
+
+    def predict_many(self, images: Sequence[ImageInput]) -> List[ViewPrediction]:
+        """Run a list of images on one idle replica."""
+        with self._replica() as replica:
+            return replica.predict_many(images)
+
+    def stats(self) -> Dict[str, object]:
+        """Return per-replica load statistics."""
+        with self._condition:
+            return {
+                "replicas": len(self.replicas),
+                "threads_per_replica": self.threads_per_replica,
+                "busy": sum(self._busy),
+                "waiting": self._waiting,
+                "served": list(self._served),
+            }
+
+    @contextmanager
+    def _replica(self) -> Iterator[object]:
+        """Check out the least-loaded idle replica for the duration of a call."""
+        index = self._acquire()
+        try:
+            yield self.replicas[index]
+        finally:
+            self._release(index)
+
+    def _acquire(self) -> int:
+        with self._condition:
+            self._waiting += 1
+            try:
+                while all(self._busy):
+                    self._condition.wait()
+            finally:
+                self._waiting -= 1
+            index = min(
+                (i for i, busy in enumerate(self._busy) if not busy),
+                key=lambda i: self._served[i],
+            )
+            self._busy[index] = True
+            return index
+
+    def _release(self, index: int) -> None:
+        with self._condition:
+            self._busy[index] = False
+            self._served[index] += 1
+            self._condition.notify()
+
+
+def _thread_budget(replicas: int, threads_per_replica: Optional[int]) -> int:
+    """Split the available cores between replicas unless set explicitly."""
+    if threads_per_replica:
+        return threads_per_replica
+    return max(1, (os.cpu_count() or 1) // replicas)
+
+
+@lru_cache(maxsize=None)
+def get_replica_pool(
+    service, replicas: int, threads_per_replica: Optional[int] = None
+) -> ReplicaPool:
+    """Build the shared replica pool around an already loaded model service.
+
+    Replicas are created with ``service.clone()`` so the weights are loaded once
+    and shared read-only. Each replica is warmed up sequentially before the pool
+    serves traffic, so one-time model setup (layer fusion, predictor creation)
+    never runs concurrently on the shared weights.
+    """
+    budget = _thread_budget(replicas, threads_per_replica)
+    # torch's intra-op pool is process-wide, so the per-replica budget is applied
+    # by sizing that pool to cores / replicas while replicas run side by side.
+    torch.set_num_threads(budget)
+
+    members = [service] + [service.clone() for _ in range(replicas - 1)]
+    warm_up = Image.new("RGB", (64, 64))
+    for replica in members:
+        replica.predict(warm_up)
+
+    logger.info(f"Replica pool ready: {replicas} replicas x {budget} torch threads")
+    return ReplicaPool(members, threads_per_replica=budget)
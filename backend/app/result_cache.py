@@ -0,0 +1,196 @@
+"""Content-addressed cache of inference results."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+import redis
+
+from .config import get_settings
+from .logger import get_logger
+from .schemas import ViewPrediction
+
+logger = get_logger(__name__)
+
+
+@lru_cache(maxsize=16)
+def _file_digest(path: str, mtime: float, size: int) -> str:
+    """SHA-256 of a file; memoised on (path, mtime, size) so weights are hashed once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_fingerprint(service, *extras: str) -> str:
+    """Identify everything about a model service that can change its output.
+
+    Covers the weights file content plus confidence, IoU, image size,
+    augmentation and auto-crop settings, so a cached result is never served
+    for a different model configuration. ``extras`` add pipeline options that
+    affect the output.
+    """
+    info = service.model_info
+    weights_path = getattr(service, "weights_path", None)
+    weights_digest = info.weights
+    if weights_path is not None and Path(weights_path).exists():
+        stat = Path(weights_path).stat()
+        weights_digest = _file_digest(str(weights_path), stat.st_mtime, stat.st_size)
+    parts = (
+        info.name,
+        weights_digest,
+        f"conf={info.confidence_threshold}",
+        f"iou={info.iou_threshold}",
+        f"imgsz={getattr(service, 'imgsz', None)}",
+        f"augment={info.augmentation}",
+        f"auto_crop={info.auto_crop}",
+        *extras,
+    )
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class InferenceResultCache:
+    """Two-tier cache of ``ViewPrediction`` results keyed by image hash.
+
+    The first tier is an in-process LRU bounded by the size of the serialized
+    predictions; the optional second tier is Redis with a TTL, shared between
+    API processes. Redis failures are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        redis_client: Optional[redis.Redis] = None,
+        ttl: int = 3600,
+        namespace: str = "inference",
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.redis = redis_client
+        self.ttl = ttl
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "redis_errors": 0,
+        }
+
+    def make_key(self, image_hash: str, fingerprint: str) -> str:
+        """Build the cache key for an image under a given model fingerprint."""
+        return f"{self.namespace}:{fingerprint}:{image_hash}"
+
+    def get(self, key: str) -> Optional[ViewPrediction]:
+        """Return a cached prediction or ``None``."""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return ViewPrediction.model_validate_json(payload)
+
+        payload = self._redis_get(key)
+        if payload is not None:
+            self._remember(key, payload)
+            self._count("redis_hits")
+            return ViewPrediction.model_validate_json(payload)
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, prediction: ViewPrediction) -> None:
+        """Store a prediction in both tiers."""
+        payload = prediction.model_dump_json().encode("utf-8")
+        self._remember(key, payload)
+        self._count("stores")
+        if self.redis is not None:
+            try:
+                self.redis.set(key, payload, ex=self.ttl)
+            except redis.RedisError as exc:
+                logger.warning(f"Result cache write to Redis failed: {exc}")
+                self._count("redis_errors")
+
+    def stats(self) -> Dict[str, object]:
+        """Return hit/miss counters and memory-tier usage."""
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["redis_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "redis": self.redis is not None,
+            }
+
+    def clear(self) -> None:
+        """Drop the in-process tier."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key: str, payload: bytes) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = payload
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._counters["evictions"] += 1
+
+    def _redis_get(self, key: str) -> Optional[bytes]:
+        if self.redis is None:
+            return None
+        try:
+            return self.redis.get(key)
+        except redis.RedisError as exc:
+            logger.warning(f"Result cache read from Redis failed: {exc}")
+            self._count("redis_errors")
+            return None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+
+def hash_image_bytes(content: bytes) -> str:
+    """SHA-256 of raw upload bytes (same digest ``FileManager`` stores as ``file_hash``)."""
+    return hashlib.sha256(content).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> Optional[InferenceResultCache]:
+    """Build the shared result cache, or ``None`` when caching is disabled."""
+    settings = get_settings()
+    if settings.inference_cache_max_bytes <= 0:
+        return None
+    redis_client = None
+    if settings.redis_url:
+        redis_client = redis.Redis.from_url(
+            settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+    logger.info(
+        f"Inference result cache enabled ({settings.inference_cache_max_bytes} bytes in memory, "
+        f"redis={'on' if redis_client is not None else 'off'})"
+    )
+    return InferenceResultCache(
+        max_bytes=settings.inference_cache_max_bytes,
+        redis_client=redis_client,
+        ttl=settings.cache_ttl,
+    )
@@ -12,6 +12,7 @@ from .models import AnalysisStatus, Gender, ImageViewType
 RiskCategory = Literal["normal", "benign", "malignant"]
 TrafficLight = Literal["green", "amber", "red"]
 InferenceMode = Literal["multi", "single"]
+StreamFormat = Literal["sse", "ndjson"]
 
 
 class BoundingBox(BaseModel):
@@ -56,6 +57,7 @@ class ModelInfo(BaseModel):
     confidence_threshold: float
     iou_threshold: float | None = None
     augmentation: bool = False
+    auto_crop: bool = False
     classes: Dict[int, str]
     categories: Dict[int, RiskCategory]
 
@@ -69,6 +71,54 @@ class InferenceResponse(BaseModel):
     analysis_id: Optional[int] = None
 
 
+class ViewEvent(BaseModel):
+    """Streamed as soon as one view of a study has been predicted."""
+
+    view: str
+    prediction: ViewPrediction
+
+
+class StudySummaryEvent(BaseModel):
+    """Final streamed event: study totals once every view is stored."""
+
+    analysis_id: int
+    mode: InferenceMode
+    total_findings: int
+    dominant_label: Optional[str] = None
+    dominant_category: Optional[RiskCategory] = None
+    totals: Dict[str, object]
+    model: ModelInfo
+
+
+class BatchStudy(BaseModel):
+    """One study of a batch manifest: which uploaded files hold which views."""
+
+    study_id: Optional[str] = Field(None, description="Caller's reference, echoed in the result.")
+    patient_id: Optional[int] = None
+    views: Dict[str, str] = Field(
+        ...,
+        description="View name to file name: lcc/rcc/lmlo/rmlo for a study, or image for one view.",
+    )
+
+    @property
+    def mode(self) -> InferenceMode:
+        return "single" if set(self.views) == {"image"} else "multi"
+
+
+class BatchStudyResult(BaseModel):
+    """One NDJSON line of ``/infer/batch``, emitted as each study finishes."""
+
+    study_id: Optional[str] = None
+    analysis_id: Optional[int] = None
+    status: AnalysisStatus
+    mode: InferenceMode
+    total_findings: int = 0
+    dominant_label: Optional[str] = None
+    dominant_category: Optional[RiskCategory] = None
+    views: Dict[str, ViewPrediction] = Field(default_factory=dict)
+    error: Optional[str] = None
+
+
 # ============ Patient Schemas ============
 
 class PatientBase(BaseModel):
@@ -170,9 +220,30 @@ class AnalysisRead(AnalysisSummary):
     findings_description: Optional[str]
     recommendations: Optional[str]
     updated_at: Optional[datetime]
+    error_message: Optional[str] = None
     images: List["AnalysisImageRead"] = Field(default_factory=list)
 
 
+class AnalysisStatusRead(BaseModel):
+    """Lightweight view of an analysis for polling asynchronous jobs."""
+
+    analysis_id: int
+    status: AnalysisStatus
+    total_findings: int
+    dominant_category: Optional[RiskCategory]
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime]
+
+
+class JobAccepted(BaseModel):
+    """Response for an inference submission accepted for background processing."""
+
+    analysis_id: int
+    status: AnalysisStatus
+    status_url: str
+
+
 class AnalysisListResponse(BaseModel):
     items: List[AnalysisSummary]
     total: int
@@ -197,6 +268,7 @@ class AnalysisImageCreate(BaseModel):
     height: Optional[int] = None
     detections_count: int = 0
     detections_data: Optional[dict] = None
+    detections_packed: Optional[bytes] = None
 
 
 class AnalysisImageRead(BaseModel):
@@ -216,6 +288,17 @@ class AnalysisImageRead(BaseModel):
     created_at: datetime
 
 
+# ============ Profiling Schemas ============
+
+class ProfilingArm(BaseModel):
+    """Profile the next ``count`` requests whose path matches ``route``."""
+
+    route: str = Field(..., description="Path or route template, e.g. /infer/multi or /analyses/{analysis_id}")
+    count: int = Field(1, ge=1, le=100)
+    profiler: Literal["cprofile", "sampling"] = "cprofile"
+    method: Optional[str] = None
+
+
 # ============ Statistics Schemas ============
 
 class StatisticsResponse(BaseModel):
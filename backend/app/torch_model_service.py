@@ -5,20 +5,22 @@ This replaces YOLO with a Faster R-CNN model for binary classification.
 
 from __future__ import annotations
 
+import copy
 import os
 from functools import lru_cache
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence
 
 import numpy as np
 import torch
 import torchvision
-from PIL import Image
 from torchvision.models.detection import FasterRCNN
 from torchvision.models.detection.backbone_utils import resnet_fpn_backbone
 from torchvision.ops import nms
 
+from .image_decode import DecodedImage, ImageInput, prepare_image
+from .metrics import model_lock, stage
 from .schemas import BoundingBox, Detection, ImageSize, ModelInfo, ViewPrediction
 
 
@@ -32,12 +34,14 @@ class TorchInferenceService:
         confidence_threshold: float = 0.8,  # High threshold for medical imaging to reduce false positives
         nms_threshold: float = 0.3,  # Stricter NMS for better overlap filtering
         num_classes: int = 2,  # 0: benign, 1: malignant
+        auto_crop: bool = False,  # Crop to the breast region before inference
     ) -> None:
         self.weights_path = weights_path
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.confidence_threshold = confidence_threshold
         self.nms_threshold = nms_threshold
         self.num_classes = num_classes
+        self.auto_crop = auto_crop
         self._lock = Lock()
         
         # Load model
@@ -54,6 +58,7 @@ class TorchInferenceService:
             confidence_threshold=self.confidence_threshold,
             iou_threshold=self.nms_threshold,
             augmentation=False,
+            auto_crop=self.auto_crop,
             classes={idx: meta["label"] for idx, meta in self.class_metadata.items()},
             categories={idx: meta["category"] for idx, meta in self.class_metadata.items()},
         )
@@ -104,41 +109,61 @@ class TorchInferenceService:
         
         return model
 
-    def predict(self, image: Image.Image) -> ViewPrediction:
-        """Run inference on a PIL image and return structured predictions."""
-        # Convert PIL image to tensor
-        img_tensor = self._preprocess_image(image)
-        img_tensor = img_tensor.to(self.device)
+    def predict(self, image: ImageInput) -> ViewPrediction:
+        """Run inference on a decoded or PIL image and return structured predictions."""
+        return self.predict_many([image])[0]
+
+    def predict_batch(self, images: Dict[str, ImageInput]) -> Dict[str, ViewPrediction]:
+        """Predict several named views (e.g. LCC/RCC/LMLO/RMLO) in one forward pass."""
+        views = list(images)
+        predictions = self.predict_many([images[view] for view in views])
+        return dict(zip(views, predictions))
+
+    def predict_many(self, images: Sequence[ImageInput]) -> List[ViewPrediction]:
+        """Run one forward pass over several images.
+
+        Faster R-CNN's transform resizes the inputs and pads them into a single
+        batch tensor, so the list is processed by one model call.
+        """
+        # Convert grayscale buffers to tensors (Faster R-CNN resizes internally,
+        # so only the optional breast-region crop is applied here)
+        with stage("preprocess"):
+            decoded = [prepare_image(image, None, self.auto_crop) for image in images]
+            img_tensors = [self._preprocess_image(item).to(self.device) for item in decoded]
         
         # Run inference
-        with self._lock:
+        with model_lock(self._lock), stage("model_forward"):
             with torch.no_grad():
-                predictions = self.model([img_tensor])[0]
+                predictions = self.model(img_tensors)
         
         # Convert predictions to ViewPrediction format
-        view_prediction = self._to_view_prediction(image.size, predictions)
-        return view_prediction
+        with stage("to_view_prediction"):
+            return [
+                self._to_view_prediction(item, prediction)
+                for item, prediction in zip(decoded, predictions)
+            ]
 
-    def _preprocess_image(self, image: Image.Image) -> torch.Tensor:
-        """Convert PIL image to tensor and normalize."""
-        # Convert to RGB
-        image = image.convert('RGB')
-        
-        # Convert to tensor and normalize to [0, 1]
-        img_array = np.array(image, dtype=np.float32) / 255.0
-        
-        # Convert to CHW format (channels, height, width)
-        img_tensor = torch.from_numpy(img_array).permute(2, 0, 1)
+    def clone(self) -> "TorchInferenceService":
+        """Return a replica that shares this service's read-only model weights."""
+        replica = copy.copy(self)
+        replica._lock = Lock()
+        return replica
+
+    def _preprocess_image(self, image: DecodedImage) -> torch.Tensor:
+        """Convert a grayscale buffer to a normalized CHW tensor."""
+        # Normalize to [0, 1] in place on a single float32 channel
+        img_tensor = torch.from_numpy(image.pixels.astype(np.float32)).div_(255.0)
         
-        return img_tensor
+        # Broadcast to CHW format (3, height, width) without copying
+        return img_tensor.expand(3, -1, -1)
 
     def _to_view_prediction(
         self, 
-        size: Tuple[int, int], 
+        image: DecodedImage, 
         predictions: Dict[str, torch.Tensor]
     ) -> ViewPrediction:
         """Convert raw model predictions to ViewPrediction format."""
-        width, height = size
+        width, height = image.original_size
         detections: List[Detection] = []
         
         # Extract predictions
@@ -163,6 +188,9 @@ class TorchInferenceService:
             scores = scores[keep]
             labels = labels[keep]
         
+        # Map boxes from decoded pixels back to the original image
+        boxes = image.to_original(boxes)
+        
         # Convert to Detection objects
         for bbox, conf, cls_idx in zip(boxes, scores, labels):
             # Adjust class index (model outputs 1-indexed, we want 0-indexed)
@@ -253,10 +281,12 @@ def get_torch_inference_service() -> TorchInferenceService:
     device = os.getenv("MODEL_DEVICE")
     conf_threshold = float(os.getenv("MODEL_CONFIDENCE", "0.25"))
     nms_threshold = float(os.getenv("MODEL_NMS", "0.4"))
+    auto_crop = os.getenv("MODEL_AUTO_CROP", "0").strip().lower() in {"1", "true", "yes", "on"}
 
     return TorchInferenceService(
         weights_path=weights_path,
         device=device,
         confidence_threshold=conf_threshold,
         nms_threshold=nms_threshold,
+        auto_crop=auto_crop,
     )
@@ -0,0 +1,281 @@
+"""Lightweight request tracing: nested, timed spans exported as JSON lines or OTLP.
+
+``RequestMiddleware`` opens a root span per request whose trace id is the
+request's ``X-Request-ID``. Spans opened below it with ``span`` nest through a
+context variable, so they follow the request into ``asyncio.to_thread`` and
+other code run with a copied context (micro-batcher workers run each batch
+in the context of its first caller). Queued inference jobs carry
+``traceparent`` and continue the trace in the job thread or ``app.worker``.
+
+``span`` is a no-op outside a trace, and everything is a no-op unless
+``TRACE_EXPORTER`` is ``jsonl`` (one span per line in ``TRACE_FILE``) or
+``otlp`` (OTLP/HTTP JSON to ``OTLP_ENDPOINT``). Finished spans are handed to
+a background thread, so requests never wait for the exporter.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .config import get_settings
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+EXPORT_BATCH_SIZE = 256
+EXPORT_QUEUE_SIZE = 10_000
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "attributes",
+        "start_ns", "end_ns", "error", "thread",
+    )
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, object]
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def traceparent(self) -> str:
+        """``<trace id>-<span id>``, to continue this trace elsewhere."""
+        return f"{self.trace_id}-{self.span_id}"
+
+    def set(self, **attributes: object) -> None:
+        self.attributes.update(attributes)
+
+    def end(self) -> None:
+        """Finish the span and hand it to the exporter."""
+        self.end_ns = time.time_ns()
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(self)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": ((self.end_ns or self.start_ns) - self.start_ns) / 1e6,
+            "thread": self.thread,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """Traceparent of the current span, or ``None`` outside a trace."""
+    span_ = _current.get()
+    return span_.traceparent if span_ is not None else None
+
+
+def start_span(name: str, **attributes: object) -> Optional[Span]:
+    """Child of the current span that the caller must ``end``; not made current."""
+    parent = _current.get()
+    if parent is None or get_exporter() is None:
+        return None
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+@contextmanager
+def _activate(span_: Span) -> Iterator[Span]:
+    token = _current.set(span_)
+    try:
+        yield span_
+    except BaseException as exc:
+        span_.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current.reset(token)
+        span_.end()
+
+
+@contextmanager
+def span(name: str, **attributes: object) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span; no-op outside a trace."""
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    with _activate(child):
+        yield child
+
+
+@contextmanager
+def trace(
+    name: str,
+    trace_id: Optional[str] = None,
+    parent: Optional[str] = None,
+    **attributes: object,
+) -> Iterator[Optional[Span]]:
+    """Start a trace, or continue the one ``parent`` (a traceparent) belongs to."""
+    if get_exporter() is None:
+        yield None
+        return
+    parent_id = None
+    if parent:
+        trace_id, _, parent_id = parent.partition("-")
+    root = Span(name, trace_id or os.urandom(16).hex(), parent_id or None, attributes)
+    with _activate(root):
+        yield root
+
+
+class _BatchExporter:
+    """Drain finished spans on a daemon thread and write them in batches."""
+
+    def __init__(self) -> None:
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span_: Span) -> None:
+        try:
+            self._queue.put_nowait(span_)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Block until every span exported so far has been written."""
+        self._queue.join()
+
+    def write(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as exc:
+                logger.warning(f"Failed to export {len(batch)} spans: {exc}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+class JsonlExporter(_BatchExporter):
+    """Append one JSON object per span to a local file."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__()
+
+    def write(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span_.to_dict(), default=str) + "\n" for span_ in spans)
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(lines)
+
+
+def _otlp_value(value: object) -> Dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter(_BatchExporter):
+    """POST spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str) -> None:
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        super().__init__()
+
+    def payload(self, spans: List[Span]) -> Dict[str, object]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": _otlp_value(self.service_name)}
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [self._span(span_) for span_ in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def write(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(self.payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+    @staticmethod
+    def _span(span_: Span) -> Dict[str, object]:
+        attributes = {**span_.attributes, "thread.name": span_.thread}
+        encoded: Dict[str, object] = {
+            "traceId": span_.trace_id,
+            "spanId": span_.span_id,
+            "name": span_.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span_.start_ns),
+            "endTimeUnixNano": str(span_.end_ns or span_.start_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+            "status": {"code": 2, "message": span_.error} if span_.error else {"code": 1},
+        }
+        if span_.parent_id:
+            encoded["parentSpanId"] = span_.parent_id
+        return encoded
+
+
+@lru_cache(maxsize=1)
+def get_exporter() -> Optional[_BatchExporter]:
+    """The exporter selected by ``TRACE_EXPORTER``, or ``None`` when tracing is off."""
+    settings = get_settings()
+    if settings.trace_exporter == "jsonl":
+        return JsonlExporter(settings.trace_file)
+    if settings.trace_exporter == "otlp":
+        return OtlpExporter(settings.otlp_endpoint, settings.app_name)
+    if settings.trace_exporter not in ("", "none"):
+        logger.warning(f"Unknown TRACE_EXPORTER {settings.trace_exporter!r}; tracing disabled")
+    return None
@@ -0,0 +1,191 @@
+"""Standalone inference worker draining the Redis job stream.
+
+Run any number of these next to (or on other hosts than) the API, sharing its
+database, upload storage and ``REDIS_URL``, with ``JOB_BACKEND=redis`` set on
+the API so that it only enqueues::
+
+    python -m app.worker
+
+Each worker loads the model once, reads up to ``WORKER_BATCH_SIZE`` jobs per
+round through the consumer group, predicts them together and acknowledges
+them once their outcome is written. Jobs left unacknowledged by a crashed
+worker for ``WORKER_VISIBILITY_TIMEOUT_S`` are claimed by another worker;
+after ``WORKER_MAX_DELIVERIES`` attempts the analysis is marked FAILED.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import socket
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis
+
+from .config import get_settings
+from .exceptions import DatabaseError
+from .jobs import InferenceJob, RedisJobQueue
+from .logger import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+StreamEntry = Tuple[str, Dict[str, str]]
+
+
+class RedisInferenceWorker:
+    """Consumer-group worker that runs queued inference jobs in batches.
+
+    ``handler`` receives a list of jobs and returns one error (or ``None``)
+    per job; it is expected to record the outcome on each analysis. Jobs are
+    acknowledged once their outcome is recorded, so a worker that dies
+    mid-batch leaves its jobs pending for redelivery. ``on_dead_letter`` marks
+    a job FAILED when it keeps being redelivered.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        handler: Callable[[List[InferenceJob]], List[Optional[Exception]]],
+        on_dead_letter: Callable[[InferenceJob, str], None],
+        stream: str = "inference:jobs",
+        group: str = "inference-workers",
+        consumer: Optional[str] = None,
+        batch_size: int = 4,
+        block_ms: int = 5000,
+        visibility_timeout_ms: int = 300_000,
+        max_deliveries: int = 3,
+    ) -> None:
+        self.client = client
+        self.handler = handler
+        self.on_dead_letter = on_dead_letter
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = max(1, batch_size)
+        self.block_ms = block_ms
+        self.visibility_timeout_ms = visibility_timeout_ms
+        self.max_deliveries = max(1, max_deliveries)
+        RedisJobQueue(client, stream=stream, group=group).ensure_group()
+
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        """Process jobs until ``stop`` is set."""
+        stop = stop or threading.Event()
+        logger.info(f"Worker {self.consumer} consuming {self.stream} as {self.group}")
+        while not stop.is_set():
+            try:
+                self.run_once()
+            except redis.RedisError as exc:
+                logger.error(f"Redis error in worker {self.consumer}: {exc}")
+                stop.wait(1.0)
+        logger.info(f"Worker {self.consumer} stopped")
+
+    def run_once(self) -> int:
+        """Claim stale jobs or read new ones, process one batch; return its size."""
+        entries = self._claim_stale() or self._read_new()
+        if entries:
+            self._process(entries)
+        return len(entries)
+
+    def _claim_stale(self) -> List[StreamEntry]:
+        """Take over jobs another consumer left unacknowledged past the timeout."""
+        _, claimed, *_ = self.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.visibility_timeout_ms,
+            start_id="0-0",
+            count=self.batch_size,
+        )
+        if claimed:
+            logger.warning(f"Worker {self.consumer} reclaimed {len(claimed)} stale job(s)")
+        return [(entry_id, fields) for entry_id, fields in claimed if fields]
+
+    def _read_new(self) -> List[StreamEntry]:
+        response = self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=self.batch_size,
+            block=self.block_ms,
+        )
+        return [entry for _, entries in response or [] for entry in entries]
+
+    def _deliveries(self, entry_id: str) -> int:
+        pending = self.client.xpending_range(
+            self.stream, self.group, min=entry_id, max=entry_id, count=1
+        )
+        return pending[0]["times_delivered"] if pending else 1
+
+    def _process(self, entries: List[StreamEntry]) -> None:
+        jobs: List[InferenceJob] = []
+        job_ids: List[str] = []
+        done: List[str] = []
+        for entry_id, fields in entries:
+            try:
+                job = InferenceJob.from_message(fields)
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.error(f"Dropping malformed job {entry_id}: {exc}")
+                done.append(entry_id)
+                continue
+            deliveries = self._deliveries(entry_id)
+            if deliveries > self.max_deliveries:
+                reason = f"Inference abandoned after {deliveries - 1} interrupted attempts"
+                logger.error(f"{reason}: analysis_id={job.analysis_id}")
+                self.on_dead_letter(job, reason)
+                done.append(entry_id)
+                continue
+            jobs.append(job)
+            job_ids.append(entry_id)
+
+        if jobs:
+            errors = self.handler(jobs)
+            for entry_id, job, error in zip(job_ids, jobs, errors):
+                # A job whose outcome could not be written stays pending and
+                # is retried after the visibility timeout.
+                if isinstance(error, DatabaseError):
+                    logger.error(f"Leaving job for analysis {job.analysis_id} pending: {error}")
+                    continue
+                done.append(entry_id)
+        self._ack(done)
+
+    def _ack(self, entry_ids: List[str]) -> None:
+        if not entry_ids:
+            return
+        pipeline = self.client.pipeline()
+        pipeline.xack(self.stream, self.group, *entry_ids)
+        pipeline.xdel(self.stream, *entry_ids)
+        pipeline.execute()
+
+
+def main() -> None:
+    """Entry point for ``python -m app.worker``."""
+    setup_logging()
+    settings = get_settings()
+    if not settings.redis_url:
+        raise SystemExit("REDIS_URL must be set to run an inference worker")
+
+    # Imported here so the module stays importable without loading the API.
+    from .main import fail_job, get_model_service, process_job_batch
+
+    get_model_service()  # load the model once, before taking jobs
+    worker = RedisInferenceWorker(
+        redis.Redis.from_url(settings.redis_url, decode_responses=True),
+        handler=process_job_batch,
+        on_dead_letter=fail_job,
+        stream=settings.job_stream,
+        group=settings.job_group,
+        batch_size=settings.worker_batch_size,
+        block_ms=settings.worker_block_ms,
+        visibility_timeout_ms=settings.worker_visibility_timeout_s * 1000,
+        max_deliveries=settings.worker_max_deliveries,
+    )
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    worker.run(stop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark breast-region auto-crop: four-view latency with and without cropping.
+
+Usage (from backend/):
+    python -m benchmarks.bench_auto_crop --images path/to/study_dir --imgsz 1280 960 640 --runs 10
+
+Each configuration decodes the images the way the API does (reduced-resolution
+decode, 2x headroom when cropping) and times predict_batch on the YOLO service
+built from MODEL_WEIGHTS_PATH / MODEL_* settings (--onnx uses ONNX Runtime).
+Without --images, four synthetic mammograms (tissue against one edge on a black
+background) are used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.image_decode import CROP_DECODE_HEADROOM, decode_image, prepare_image  # noqa: E402
+from app.model_service import InferenceService, service_kwargs_from_env  # noqa: E402
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def synthetic_mammogram(height: int, rng: np.random.Generator, flip: bool) -> bytes:
+    """Half-ellipse of noisy tissue against the chest-wall edge, encoded as PNG."""
+    width = int(height * 0.8)
+    yy, xx = np.mgrid[0:height, 0:width]
+    inside = ((xx / (0.45 * width)) ** 2 + ((yy - height / 2) / (0.42 * height)) ** 2) <= 1
+    pixels = np.where(inside, rng.normal(140, 35, (height, width)), 0).clip(0, 255).astype(np.uint8)
+    if flip:
+        pixels = pixels[:, ::-1]
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_contents(images_dir: Path | None, size: int) -> Dict[str, bytes]:
+    """Raw bytes of one image per view, from a directory or synthesised."""
+    if images_dir is not None:
+        files = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in {".png", ".jpg", ".jpeg"})
+        if len(files) < len(VIEWS):
+            raise SystemExit(f"Need at least {len(VIEWS)} images in {images_dir}")
+        return {view: path.read_bytes() for view, path in zip(VIEWS, files)}
+
+    rng = np.random.default_rng(0)
+    return {view: synthetic_mammogram(size, rng, flip=view.startswith("r")) for view in VIEWS}
+
+
+def build_service(imgsz: int, auto_crop: bool, onnx: bool) -> InferenceService:
+    kwargs = {**service_kwargs_from_env(), "imgsz": imgsz, "auto_crop": auto_crop}
+    if onnx:
+        from app.onnx_model_service import OnnxInferenceService
+
+        return OnnxInferenceService(**kwargs)
+    return InferenceService(**kwargs)
+
+
+def run(service: InferenceService, contents: Dict[str, bytes], runs: int) -> float:
+    """Median seconds for decode + predict_batch after one warm-up."""
+    target = service.imgsz * (CROP_DECODE_HEADROOM if service.auto_crop else 1)
+
+    def once() -> None:
+        images = {view: decode_image(content, target) for view, content in contents.items()}
+        service.predict_batch(images)
+
+    once()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        once()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, default=None, help="Directory with at least four images.")
+    parser.add_argument("--size", type=int, default=3000, help="Synthetic image height in pixels.")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[1280, 960, 640])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--onnx", action="store_true", help="Benchmark the ONNX Runtime backend.")
+    args = parser.parse_args()
+
+    contents = load_contents(args.images, args.size)
+    for imgsz in args.imgsz:
+        sample = decode_image(next(iter(contents.values())), imgsz * CROP_DECODE_HEADROOM)
+        cropped = prepare_image(sample, imgsz, auto_crop=True)
+        kept = cropped.size[0] * cropped.size[1] * np.prod(cropped.scale) / np.prod(sample.original_size)
+        print(f"imgsz={imgsz}: crop keeps {kept:.0%} of the first view")
+        for auto_crop in (False, True):
+            service = build_service(imgsz, auto_crop, args.onnx)
+            median = run(service, contents, args.runs)
+            label = "auto-crop" if auto_crop else "full view"
+            print(f"  {label:<10} median {median * 1000:8.1f} ms per 4-view study")
+
+
+if __name__ == "__main__":
+    main()
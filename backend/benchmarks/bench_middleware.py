@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark request middleware overhead: three BaseHTTPMiddleware layers vs. one pure ASGI layer.
+
+Usage (from backend/):
+    python -m benchmarks.bench_middleware --requests 2000 --concurrency 16
+
+The API routes are mounted twice, once behind the previous RequestID/Logging/
+ExceptionHandler ``BaseHTTPMiddleware`` stack (reproduced below) and once
+behind ``RequestMiddleware``, and ``/health`` and ``/analyses`` are driven
+in-process through httpx's ASGI transport, so only the application stack is
+measured. ``/analyses`` reads an empty SQLite database in a temporary
+directory. Log output is discarded so the console does not dominate timings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import main as api  # noqa: E402
+from app.database import get_async_session  # noqa: E402
+from app.exceptions import AppException  # noqa: E402
+from app.middleware import RequestMiddleware  # noqa: E402
+
+
+# The previous stack, in the order main.py used to add it.
+class LegacyRequestID(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request.state.request_id = str(uuid.uuid4())
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request.state.request_id
+        return response
+
+
+class LegacyLogging(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        logger.info("Request started", extra={"url": str(request.url)})
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logger.info("Request completed", extra={"status_code": response.status_code})
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+
+class LegacyExceptionHandler(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except AppException as exc:
+            return JSONResponse(status_code=exc.status_code, content={"detail": exc.message})
+
+
+def build_app(legacy: bool) -> FastAPI:
+    """The API's routes behind either middleware stack."""
+    app = FastAPI()
+    app.router.routes.extend(api.app.router.routes)
+    if legacy:
+        app.add_middleware(LegacyExceptionHandler)
+        app.add_middleware(LegacyLogging)
+        app.add_middleware(LegacyRequestID)
+    else:
+        app.add_middleware(RequestMiddleware)
+    return app
+
+
+async def drive(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    """Send ``requests`` GETs with ``concurrency`` in flight; return requests per second."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        await http.get(path)  # warm-up
+        remaining = iter(range(requests))
+
+        async def client() -> None:
+            for _ in remaining:
+                response = await http.get(path)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def run(requests: int, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def session_override():
+            async with factory() as session:
+                yield session
+
+        # Routes resolve overrides through the app they were declared on.
+        api.app.dependency_overrides[get_async_session] = session_override
+        before_app, after_app = build_app(True), build_app(False)
+
+        for path in ("/health", "/analyses"):
+            before = await drive(before_app, path, requests, concurrency)
+            after = await drive(after_app, path, requests, concurrency)
+            print(
+                f"{path:<10} BaseHTTPMiddleware x3 {before:8.0f} req/s   "
+                f"RequestMiddleware {after:8.0f} req/s   speedup {after / before:.2f}x"
+            )
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{args.requests} requests per run, {args.concurrency} concurrent")
+    asyncio.run(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark four-view inference: per-view thread hops vs. a single predict_batch call.
+
+Usage (from backend/):
+    python -m benchmarks.bench_multi_view --images path/to/study_dir --runs 10
+
+The model service is selected exactly like the API does (MODEL_TYPE, MODEL_WEIGHTS_PATH, ...).
+Without --images, four synthetic grayscale mammogram-sized images are used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.main import get_model_service  # noqa: E402
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def load_images(images_dir: Path | None, size: int) -> Dict[str, Image.Image]:
+    """Load one image per view from a directory, or synthesise them."""
+    if images_dir is not None:
+        files = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in {".png", ".jpg", ".jpeg"})
+        if len(files) < len(VIEWS):
+            raise SystemExit(f"Need at least {len(VIEWS)} images in {images_dir}")
+        return {view: Image.open(path).convert("RGB") for view, path in zip(VIEWS, files)}
+
+    rng = np.random.default_rng(0)
+    return {
+        view: Image.fromarray(rng.integers(0, 255, (size, int(size * 0.8)), dtype=np.uint8)).convert("RGB")
+        for view in VIEWS
+    }
+
+
+async def per_view_threads(service, images: Dict[str, Image.Image]) -> None:
+    """Previous path: one asyncio.to_thread(service.predict) per view."""
+    tasks = [asyncio.to_thread(service.predict, image) for image in images.values()]
+    await asyncio.gather(*tasks)
+
+
+async def single_batch(service, images: Dict[str, Image.Image]) -> None:
+    """New path: one thread hop running predict_batch."""
+    await asyncio.to_thread(service.predict_batch, images)
+
+
+def run(label: str, fn, service, images, runs: int) -> float:
+    """Time ``runs`` invocations after one warm-up and print a summary."""
+    asyncio.run(fn(service, images))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        asyncio.run(fn(service, images))
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    print(f"{label:<22} median {median * 1000:8.1f} ms   min {min(timings) * 1000:8.1f} ms")
+    return median
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, default=None, help="Directory with at least four images.")
+    parser.add_argument("--size", type=int, default=2048, help="Synthetic image height in pixels.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    service = get_model_service()
+    images = load_images(args.images, args.size)
+    print(f"Model: {service.model_info.name} on {service.model_info.device}, {args.runs} runs")
+
+    before = run("4x to_thread(predict)", per_view_threads, service, images, args.runs)
+    after = run("predict_batch", single_batch, service, images, args.runs)
+    print(f"Speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 """Pytest configuration and fixtures."""
 import asyncio
+import io
 import os
 import sys
 from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
 from typing import Generator
 from datetime import date
 
 import pytest
+from fastapi import UploadFile
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, create_engine, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
 # Add backend directory to path
@@ -17,19 +23,25 @@ sys.path.insert(0, str(backend_dir))
 
 from app import models, crud, schemas
 from app.main import app
-from app.database import get_session
+from app.database import get_async_session, get_session
 from app.config import get_settings
+from app import main
+from app.file_manager import FileManager
+from app.jobs import InferenceJobQueue
+from app.schemas import BoundingBox, Detection, ImageSize, ModelInfo, ViewPrediction
 
 
-# Test database URL
-TEST_DATABASE_URL = "sqlite:///:memory:"
+@pytest.fixture(name="database_path")
+def database_path_fixture(tmp_path) -> Path:
+    """SQLite file shared by the sync and async test engines."""
+    return tmp_path / "test.db"
 
 
 @pytest.fixture(name="engine")
-def engine_fixture():
+def engine_fixture(database_path):
     """Create a test database engine."""
     engine = create_engine(
-        TEST_DATABASE_URL,
+        f"sqlite:///{database_path}",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
@@ -38,6 +50,21 @@ def engine_fixture():
     SQLModel.metadata.drop_all(engine)
 
 
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(engine, database_path):
+    """Async engine on the same database, as the API uses it.
+
+    ``NullPool`` because every ``TestClient`` runs the app on its own event loop.
+    """
+    return create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+
+
+@pytest.fixture(name="async_session_factory")
+def async_session_factory_fixture(async_engine):
+    """Session factory configured like ``app.database.async_session_factory``."""
+    return async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
 @pytest.fixture(name="session")
 def session_fixture(engine) -> Generator[Session, None, None]:
     """Create a test database session."""
@@ -46,12 +73,17 @@ def session_fixture(engine) -> Generator[Session, None, None]:
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session) -> Generator[TestClient, None, None]:
+def client_fixture(session: Session, async_session_factory) -> Generator[TestClient, None, None]:
     """Create a test client with database session override."""
     def get_session_override():
         return session
 
+    async def get_async_session_override():
+        async with async_session_factory() as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -145,3 +177,87 @@ def reset_settings():
     get_settings.cache_clear()
     yield
     get_settings.cache_clear()
+
+
+class FakeInferenceService:
+    """Model service stand-in returning one detection per view."""
+
+    model_info = ModelInfo(
+        name="fake",
+        weights="fake.pt",
+        device="cpu",
+        confidence_threshold=0.25,
+        iou_threshold=None,
+        augmentation=False,
+        classes={0: "mass"},
+        categories={0: "malignant"},
+    )
+
+    def __init__(self, error: Exception | None = None):
+        self.error = error
+
+    def predict_batch(self, images):
+        if self.error is not None:
+            raise self.error
+        return {
+            view: ViewPrediction(
+                size=ImageSize(width=image.size[0], height=image.size[1]),
+                detections=[
+                    Detection(
+                        bbox=BoundingBox(x1=1, y1=1, x2=2, y2=2),
+                        confidence=0.9,
+                        label="mass",
+                        category="malignant",
+                        traffic_light="red",
+                    )
+                ],
+            )
+            for view, image in images.items()
+        }
+
+
+@pytest.fixture(name="inference_env")
+def inference_env_fixture(monkeypatch, engine, async_session_factory, tmp_path):
+    """Route inference to the test database, a temp upload dir and a fake model."""
+
+    @contextmanager
+    def scope():
+        with Session(engine) as session:
+            yield session
+
+    @asynccontextmanager
+    async def async_scope():
+        async with async_session_factory() as session:
+            yield session
+
+    queue = InferenceJobQueue(main._process_job, workers=1, max_queue=4)
+    service = FakeInferenceService()
+    monkeypatch.setattr(main, "session_scope", scope)
+    monkeypatch.setattr(main, "async_session_scope", async_scope)
+    monkeypatch.setattr(main, "file_manager", FileManager(tmp_path))
+    monkeypatch.setattr(main, "get_job_queue", lambda: queue)
+    original_dependency = main.get_model_service
+    monkeypatch.setattr(main, "get_model_service", lambda: service)
+    monkeypatch.setattr(main, "get_result_cache", lambda: None)
+    main.app.dependency_overrides[original_dependency] = lambda: service
+    yield queue
+    main.app.dependency_overrides.pop(original_dependency, None)
+
+
+@pytest.fixture(name="predict_stored")
+def predict_stored_fixture(monkeypatch, tmp_path):
+    """Store image bytes and predict them the way the inference endpoints do.
+
+    Returns ``predict(service, contents) -> (predictions, files)``.
+    """
+    monkeypatch.setattr(main, "file_manager", FileManager(tmp_path))
+
+    def predict(service, contents):
+        uploads = {
+            view: UploadFile(io.BytesIO(data), filename=f"{view}.png") for view, data in contents.items()
+        }
+        files = asyncio.run(main._ingest_uploads(uploads, "multi", None))
+        sources = {view: io.BytesIO(data) for view, data in contents.items()}
+        return main._predict_stored_sync(service, sources, files), files
+
+    return predict
@@ -0,0 +1,104 @@
+"""Tests for admission control and load shedding."""
+import asyncio
+import io
+import time
+
+import httpx
+import pytest
+from PIL import Image
+
+from app import admission, main
+from app.admission import AdmissionController
+from app.exceptions import ServiceUnavailableError
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_requests_beyond_the_limit_wait_then_overflow_is_shed():
+    async def scenario():
+        controller = AdmissionController("interactive", max_in_flight=1, max_queue=1, max_wait_s=5)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceUnavailableError) as shed:
+            await controller.acquire()
+        assert not waiter.done()
+
+        controller.release(0.5)
+        await waiter
+        return controller.stats(), shed.value
+
+    stats, shed = asyncio.run(scenario())
+
+    assert shed.status_code == 503 and shed.headers == {"Retry-After": "1"}
+    assert (stats["admitted"], stats["queued"], stats["rejected_queue_full"]) == (2, 1, 1)
+    assert (stats["in_flight"], stats["waiting"]) == (1, 0)
+
+
+def test_estimated_wait_beyond_deadline_is_shed_immediately():
+    async def scenario():
+        controller = AdmissionController("bulk", max_in_flight=1, max_queue=10, max_wait_s=2)
+        controller.service_time_s = 4.0
+        await controller.acquire()
+        started = time.monotonic()
+        with pytest.raises(ServiceUnavailableError) as shed:
+            await controller.acquire()
+        return time.monotonic() - started, shed.value, controller.stats()
+
+    elapsed, shed, stats = asyncio.run(scenario())
+
+    assert elapsed < 0.1
+    assert shed.headers["Retry-After"] == "4"
+    assert stats["rejected_estimated_wait"] == 1 and stats["waiting"] == 0
+
+
+def test_waiter_is_shed_at_the_deadline():
+    async def scenario():
+        controller = AdmissionController("interactive", max_in_flight=1, max_queue=1, max_wait_s=0.05)
+        await controller.acquire()
+        with pytest.raises(ServiceUnavailableError):
+            await controller.acquire()
+        controller.release(0.01)
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["rejected_timed_out"] == 1
+    assert (stats["in_flight"], stats["waiting"]) == (0, 0)
+
+
+def test_overloaded_endpoint_answers_503_with_retry_after(client, inference_env, monkeypatch):
+    service = main.get_model_service()
+    predict_batch = service.predict_batch
+    monkeypatch.setattr(service, "predict_batch", lambda images: time.sleep(0.3) or predict_batch(images))
+    controllers = {
+        "interactive": AdmissionController("interactive", max_in_flight=1, max_queue=0, max_wait_s=5),
+        "bulk": AdmissionController("bulk", max_in_flight=1, max_queue=0, max_wait_s=5),
+    }
+    monkeypatch.setattr(admission, "get_admission_controller", controllers.__getitem__)
+    monkeypatch.setattr(main, "get_admission_controller", controllers.__getitem__)
+    content = _png()
+
+    async def burst():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(
+                *(
+                    http.post("/infer/single", files={"image": ("view.png", content, "image/png")})
+                    for _ in range(3)
+                )
+            )
+
+    responses = asyncio.run(burst())
+
+    assert sorted(response.status_code for response in responses) == [200, 503, 503]
+    shed = [response for response in responses if response.status_code == 503]
+    assert all(int(response.headers["Retry-After"]) >= 1 for response in shed)
+    stats = client.get("/inference/stats").json()["admission"]
+    assert stats["interactive"]["rejected_queue_full"] == 2
+    assert stats["interactive"]["in_flight"] == 0
+    assert stats["bulk"]["admitted"] == 0
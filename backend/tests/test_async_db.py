@@ -0,0 +1,112 @@
+"""Event-loop responsiveness of the async database layer."""
+import asyncio
+import gc
+import io
+import time
+
+import httpx
+from PIL import Image
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app import crud, main, models
+from app.schemas import AnalysisCreate
+
+# Simulated network round trip per statement, as with a remote PostgreSQL.
+# Well above the fixed per-request work every endpoint does on the loop
+# (routing, validation, serialisation), so only blocking DB calls exceed it.
+DB_LATENCY_S = 0.2
+HEARTBEAT_S = 0.005
+CONCURRENCY = 4
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _add_latency(*engines) -> None:
+    """Delay every statement with a SQLite function that sleeps.
+
+    The function runs where the driver runs the statement: in the calling
+    thread on the sync engine, on aiosqlite's own thread on the async one.
+    """
+
+    def delay(conn, cursor, *_):
+        conn.connection.dbapi_connection.create_function(
+            "simulated_latency", 0, lambda: time.sleep(DB_LATENCY_S)
+        )
+        cursor.execute("SELECT simulated_latency()")
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", delay)
+
+
+async def _max_stall(workload) -> float:
+    """Longest delay of a periodic heartbeat task while ``workload`` runs."""
+    loop = asyncio.get_running_loop()
+    stalls = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            started = loop.time()
+            await asyncio.sleep(HEARTBEAT_S)
+            stalls.append(loop.time() - started - HEARTBEAT_S)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    try:
+        await workload()
+    finally:
+        done.set()
+        await beat
+    return max(stalls)
+
+
+def test_async_endpoints_do_not_stall_the_event_loop(client, engine, async_engine, inference_env):
+    _add_latency(engine, async_engine.sync_engine)
+    content = _png()
+
+    async def sync_crud_request():
+        # What the inference endpoints did before: sync crud inside a coroutine.
+        with Session(engine) as session:
+            analysis = crud.create_analysis(session, AnalysisCreate(mode="single"))
+            crud.complete_analysis(session, analysis)
+            crud.list_all_analyses(session)
+        await asyncio.sleep(0)
+
+    async def before():
+        await asyncio.gather(*(sync_crud_request() for _ in range(CONCURRENCY)))
+
+    async def after():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            responses = await asyncio.gather(
+                *(
+                    http.post("/infer/single", files={"image": ("view.png", content, "image/png")})
+                    for _ in range(CONCURRENCY)
+                ),
+                *(http.get("/analyses") for _ in range(CONCURRENCY)),
+                *(http.get("/patients") for _ in range(CONCURRENCY)),
+            )
+        assert {response.status_code for response in responses} == {200}
+
+    async def measure():
+        await after()  # warm up: first-request imports and lazy initialisation
+        return await _max_stall(before), await _max_stall(after)
+
+    # A full collection over the whole test session's heap is itself a stall
+    # of several DB round trips; keep it out of the measurement.
+    gc.collect()
+    gc.freeze()
+    try:
+        stall_before, stall_after = asyncio.run(measure())
+    finally:
+        gc.unfreeze()
+
+    assert stall_before >= DB_LATENCY_S
+    assert stall_after < DB_LATENCY_S
+    with Session(engine) as session:
+        assert crud.count_analyses(session, status=models.AnalysisStatus.COMPLETED) == 3 * CONCURRENCY
@@ -0,0 +1,165 @@
+"""Tests for batch study inference (/infer/batch)."""
+import hashlib
+import io
+import json
+import tarfile
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+from sqlmodel import select
+
+from app import main, models
+from app.batch_ingest import parse_manifest
+from app.exceptions import ValidationError
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png(width: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _study(study_id: str, patient_id=None):
+    return {
+        "study_id": study_id,
+        "patient_id": patient_id,
+        "views": {view: f"{study_id}/{view}.png" for view in VIEWS},
+    }
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _counting():
+    service = main.get_model_service()
+    calls = []
+    predict_batch = service.predict_batch
+    service.predict_batch = lambda images: calls.append(len(images)) or predict_batch(images)
+    return calls
+
+
+def test_manifest_validation():
+    assert parse_manifest(json.dumps({"studies": [{"views": {"image": "a.png"}}]}))[0].mode == "single"
+    with pytest.raises(ValidationError):
+        parse_manifest(json.dumps([{"views": {"lcc": "a.png"}}]))
+    with pytest.raises(ValidationError):
+        parse_manifest("[]")
+    with pytest.raises(ValidationError):
+        parse_manifest("not json")
+
+
+def test_multipart_batch_streams_one_line_per_study(client, inference_env, monkeypatch, sample_patient):
+    calls = _counting()
+    manifest = [
+        _study("s1", sample_patient.id),
+        _study("s2"),
+        {"study_id": "s3", "views": {"image": "s3.png"}},
+    ]
+    files = [("files", (f"{s}/{v}.png", _png(10), "image/png")) for s in ("s1", "s2") for v in VIEWS]
+    files.append(("files", ("s3.png", _png(12), "image/png")))
+
+    response = client.post("/infer/batch", data={"manifest": json.dumps(manifest)}, files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert [line["study_id"] for line in lines] == ["s1", "s2", "s3"]
+    assert {line["status"] for line in lines} == {"completed"}
+    assert lines[0]["total_findings"] == 4
+    assert lines[2]["mode"] == "single"
+    assert calls == [9]  # every view of the group in one model batch
+
+    analysis = client.get(f"/analyses/{lines[0]['analysis_id']}").json()
+    assert analysis["status"] == "completed"
+    assert analysis["patient_id"] == sample_patient.id
+    assert len(analysis["images"]) == 4
+
+
+@pytest.mark.parametrize("kind", ["zip", "tar"])
+def test_archive_batch_with_embedded_manifest(client, inference_env, monkeypatch, kind):
+    monkeypatch.setattr(main.settings, "inference_batch_studies", 1)
+    calls = _counting()
+    entries = {"manifest.json": json.dumps([_study("a"), _study("b")]).encode()}
+    entries.update({f"{s}/{v}.png": _png(10) for s in ("a", "b") for v in VIEWS})
+    buffer = io.BytesIO()
+    if kind == "zip":
+        with zipfile.ZipFile(buffer, "w") as bundle:
+            for name, content in entries.items():
+                bundle.writestr(name, content)
+    else:
+        with tarfile.open(fileobj=buffer, mode="w") as bundle:
+            for name, content in entries.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                bundle.addfile(info, io.BytesIO(content))
+
+    response = client.post(
+        "/infer/batch", files={"archive": (f"studies.{kind}", buffer.getvalue(), "application/octet-stream")}
+    )
+
+    lines = _lines(response)
+    assert [(line["study_id"], line["status"]) for line in lines] == [
+        ("a", "completed"),
+        ("b", "completed"),
+    ]
+    assert calls == [4, 4]
+
+
+def test_corrupt_file_fails_only_its_study(client, session, inference_env):
+    manifest = [{"study_id": "good", "views": {"image": "good.png"}}, {"study_id": "bad", "views": {"image": "bad.png"}}]
+    files = [
+        ("files", ("good.png", _png(10), "image/png")),
+        ("files", ("bad.png", b"not an image", "image/png")),
+    ]
+
+    lines = _lines(client.post("/infer/batch", data={"manifest": json.dumps(manifest)}, files=files))
+
+    assert [line["status"] for line in lines] == ["completed", "failed"]
+    assert "valid image" in lines[1]["error"]
+    session.expire_all()
+    assert client.get(f"/analyses/{lines[1]['analysis_id']}/status").json()["status"] == "failed"
+
+
+def test_missing_files_are_rejected_up_front(client, inference_env):
+    response = client.post(
+        "/infer/batch",
+        data={"manifest": json.dumps([{"views": {"image": "absent.png"}}])},
+        files=[("files", ("other.png", _png(10), "image/png"))],
+    )
+
+    assert response.status_code == 400
+    assert client.get("/analyses").json()["total"] == 0
+
+
+def test_tar_members_are_stored_intact(client, session, inference_env, monkeypatch):
+    """Members of one tar are read concurrently; each must keep its own bytes."""
+    monkeypatch.setattr(main.settings, "inference_batch_studies", 2)
+    rng = np.random.default_rng(0)
+    entries = {}
+    for study in ("a", "b", "c", "d"):
+        for view in VIEWS:
+            buffer = io.BytesIO()
+            Image.fromarray(rng.integers(0, 256, (768, 2048), dtype=np.uint8)).save(buffer, format="PNG")
+            entries[f"{study}/{view}.png"] = buffer.getvalue()
+    entries["manifest.json"] = json.dumps([_study(s) for s in ("a", "b", "c", "d")]).encode()
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as bundle:
+        for name, content in entries.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            bundle.addfile(info, io.BytesIO(content))
+
+    response = client.post(
+        "/infer/batch", files={"archive": ("studies.tar", buffer.getvalue(), "application/x-tar")}
+    )
+
+    lines = _lines(response)
+    assert {line["status"] for line in lines} == {"completed"}
+    stored = set(session.exec(select(models.AnalysisImage.file_hash)).all())
+    expected = {hashlib.sha256(content).hexdigest() for name, content in entries.items() if name.endswith(".png")}
+    assert stored == expected
@@ -0,0 +1,88 @@
+"""Tests for the micro-batching scheduler."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from app.batching import MicroBatchingService
+from app.schemas import ImageSize, ViewPrediction
+
+
+class FakeBatchService:
+    """Model stand-in that records the size of every batch it receives."""
+
+    model_info = None
+
+    def __init__(self, delay: float = 0.02, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.batch_sizes: list[int] = []
+        self._lock = threading.Lock()
+
+    def predict_many(self, images):
+        with self._lock:
+            self.batch_sizes.append(len(images))
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("model exploded")
+            return [
+                ViewPrediction(size=ImageSize(width=img.width, height=img.height), detections=[])
+                for img in images
+            ]
+
+
+def _image(width: int) -> Image.Image:
+    return Image.new("L", (width, 10))
+
+
+def test_concurrent_requests_are_coalesced():
+    """Concurrent callers share batches and each get their own prediction."""
+    fake = FakeBatchService()
+    batcher = MicroBatchingService(fake, max_batch_size=8, max_wait_ms=50)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda w: batcher.predict(_image(w)), range(1, 9)))
+
+    assert [r.size.width for r in results] == list(range(1, 9))
+    assert sum(fake.batch_sizes) == 8
+    assert len(fake.batch_sizes) < 8
+    assert max(fake.batch_sizes) <= 8
+
+    stats = batcher.stats()
+    assert stats["images"] == 8
+    assert stats["batches"] == len(fake.batch_sizes)
+    assert stats["queue_depth"] == 0
+
+
+def test_batch_size_is_capped():
+    """No batch exceeds the configured maximum."""
+    fake = FakeBatchService(delay=0.0)
+    batcher = MicroBatchingService(fake, max_batch_size=2, max_wait_ms=20)
+
+    predictions = batcher.predict_many([_image(w) for w in range(1, 6)])
+
+    assert [p.size.width for p in predictions] == [1, 2, 3, 4, 5]
+    assert max(fake.batch_sizes) <= 2
+
+
+def test_batch_failure_is_raised_to_every_caller():
+    """A failing batch propagates the exception to all waiting callers."""
+    batcher = MicroBatchingService(FakeBatchService(fail=True), max_batch_size=4, max_wait_ms=5)
+
+    with pytest.raises(RuntimeError, match="model exploded"):
+        batcher.predict(_image(3))
+
+
+def test_predict_batch_keeps_view_names():
+    """Named views are returned under their own keys."""
+    fake = FakeBatchService(delay=0.0)
+    batcher = MicroBatchingService(fake, max_batch_size=4, max_wait_ms=20)
+
+    views = {"lcc": _image(1), "rcc": _image(2), "lmlo": _image(3), "rmlo": _image(4)}
+    predictions = batcher.predict_batch(views)
+
+    assert {view: p.size.width for view, p in predictions.items()} == {
+        "lcc": 1, "rcc": 2, "lmlo": 3, "rmlo": 4,
+    }
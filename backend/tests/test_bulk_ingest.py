@@ -0,0 +1,115 @@
+"""Tests for the resumable bulk-ingest CLI."""
+import json
+
+from PIL import Image
+from sqlmodel import select
+
+from app import crud, main, models
+from app.bulk_ingest import BulkIngest, Checkpoint, discover_studies, normalise_view
+
+VIEWS = ("L_CC", "R_CC", "L_MLO", "R_MLO")
+
+
+def _image(path, width: int = 8) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("L", (width, 6), color=100).save(path)
+
+
+def _archive(root):
+    for index, view in enumerate(VIEWS):
+        _image(root / "MRN1" / "2019" / f"{view}.png", width=8 + index)
+    _image(root / "MRN2" / "scan.png", width=20)
+    (root / "MRN2" / "notes.txt").write_text("not an image")
+    return root
+
+
+def _run(tmp_path, checkpoint_path, **kwargs):
+    checkpoint = Checkpoint(checkpoint_path)
+    try:
+        ingest = BulkIngest(checkpoint, create_patients=True, service=main.get_model_service(), **kwargs)
+        return ingest.run(discover_studies(tmp_path / "archive"))
+    finally:
+        checkpoint.close()
+
+
+def test_filename_rule_groups_views_into_studies(tmp_path):
+    root = _archive(tmp_path / "archive")
+    _image(root / "MRN3" / "2020" / "l-cc.png")  # incomplete study
+
+    studies = {study.key: study for study in discover_studies(root)}
+
+    assert set(studies) == {"MRN1/2019", "MRN2/scan.png", "MRN3/2020/l-cc.png"}
+    assert studies["MRN1/2019"].mode == "multi"
+    assert set(studies["MRN1/2019"].files) == {"lcc", "rcc", "lmlo", "rmlo"}
+    assert studies["MRN3/2020/l-cc.png"].mode == "single"
+    assert studies["MRN2/scan.png"].patient == "MRN2"
+    assert normalise_view("R-MLO") == "rmlo" and normalise_view("AP") is None
+
+
+def test_custom_pattern(tmp_path):
+    root = tmp_path / "archive"
+    _image(root / "flat" / "MRN9_RCC.png")
+
+    studies = discover_studies(root, r"(?P<patient>MRN\d+)_(?P<view>\w+)\.png$")
+
+    assert [(study.patient, study.mode) for study in studies] == [("MRN9", "single")]
+
+
+def test_ingest_stores_studies_and_resumes(tmp_path, session, inference_env):
+    _archive(tmp_path / "archive")
+    checkpoint_path = tmp_path / "checkpoint.jsonl"
+
+    report = _run(tmp_path, checkpoint_path)
+
+    assert (report.completed, report.failed, report.images) == (2, 0, 5)
+    patient = crud.get_patient_by_mrn(session, "MRN1")
+    analyses = crud.list_patient_analyses(session, patient.id)
+    assert [analysis.status for analysis in analyses] == [models.AnalysisStatus.COMPLETED]
+    images = crud.list_analysis_images(session, analyses[0].id)
+    assert {image.view_type.value for image in images} == {"lcc", "rcc", "lmlo", "rmlo"}
+    assert all(image.thumbnail_path for image in images)
+    entries = [json.loads(line) for line in checkpoint_path.read_text().splitlines()]
+    assert {entry["status"] for entry in entries} == {"completed"}
+
+    resumed = _run(tmp_path, checkpoint_path)
+
+    assert (resumed.completed, resumed.resumed) == (0, 2)
+    assert len(session.exec(select(models.Analysis)).all()) == 2
+
+
+def test_images_already_stored_are_skipped(tmp_path, session, inference_env):
+    _archive(tmp_path / "archive")
+    _run(tmp_path, tmp_path / "first.jsonl")
+
+    # A fresh checkpoint still finds every image by its hash.
+    report = _run(tmp_path, tmp_path / "second.jsonl")
+
+    assert (report.completed, report.duplicates) == (0, 2)
+    assert len(session.exec(select(models.Analysis)).all()) == 2
+
+
+def test_corrupt_image_fails_only_its_study(tmp_path, session, inference_env):
+    root = _archive(tmp_path / "archive")
+    (root / "MRN2" / "scan.png").write_bytes(b"not an image")
+
+    report = _run(tmp_path, tmp_path / "checkpoint.jsonl", batch_size=4)
+
+    assert (report.completed, report.failed) == (1, 1)
+    failed = crud.list_patient_analyses(session, crud.get_patient_by_mrn(session, "MRN2").id)
+    assert failed[0].status == models.AnalysisStatus.FAILED
+    assert "not a valid image" in failed[0].error_message
+
+
+def test_failed_study_leaves_no_stored_files(tmp_path, session, inference_env, monkeypatch):
+    _archive(tmp_path / "archive")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(main, "_complete_analysis_sync", fail)
+
+    report = _run(tmp_path, tmp_path / "checkpoint.jsonl")
+
+    assert (report.completed, report.failed) == (0, 2)
+    stored = [main.file_manager.images_dir, main.file_manager.thumbnails_dir]
+    assert [path for root in stored for path in root.rglob("*") if path.is_file()] == []
@@ -0,0 +1,162 @@
+"""Tests for request deadlines and client-disconnect cancellation."""
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+from sqlmodel import select
+
+from app import crud, main, models
+from app.deadlines import CLIENT_DISCONNECTED, DEADLINE_EXCEEDED, Deadline, run_until_cancelled
+from app.exceptions import RequestCancelledError
+from app.jobs import InferenceJob
+from app.schemas import AnalysisCreate
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _count_predictions(monkeypatch) -> list:
+    service = main.get_model_service()
+    calls = []
+    predict_batch = service.predict_batch
+    monkeypatch.setattr(
+        service, "predict_batch", lambda images: calls.append(set(images)) or predict_batch(images)
+    )
+    return calls
+
+
+def _stored_files() -> list:
+    return [path for path in main.file_manager.images_dir.rglob("*") if path.is_file()]
+
+
+def _stored_upload(tmp_path, name: str) -> dict:
+    """An upload already on disk, as ``FileManager.save_upload`` describes it."""
+    path = tmp_path / f"{name}.png"
+    path.write_bytes(_png())
+    return {
+        "file_id": name,
+        "filename": path.name,
+        "original_filename": path.name,
+        "file_path": str(path),
+        "relative_path": path.name,
+        "thumbnail_path": None,
+        "file_size": path.stat().st_size,
+        "file_hash": name,
+        "content_type": "image/png",
+    }
+
+
+class _GoneRequest:
+    """Stands in for a request whose client has hung up."""
+
+    async def is_disconnected(self) -> bool:
+        return True
+
+
+def test_request_past_its_deadline_never_reaches_the_model(client, session, inference_env, monkeypatch):
+    calls = _count_predictions(monkeypatch)
+    ingest = main._ingest_uploads
+
+    async def slow_ingest(*args, **kwargs):
+        files = await ingest(*args, **kwargs)
+        await asyncio.sleep(0.1)
+        return files
+
+    monkeypatch.setattr(main, "_ingest_uploads", slow_ingest)
+
+    response = client.post(
+        "/infer/single",
+        files={"image": ("view.png", _png(), "image/png")},
+        headers={"X-Request-Timeout": "0.05"},
+    )
+
+    assert response.status_code == 504
+    time.sleep(0.1)
+    assert calls == []
+    analysis = session.exec(select(models.Analysis)).one()
+    assert analysis.status == models.AnalysisStatus.FAILED
+    assert analysis.error_message == DEADLINE_EXCEEDED
+    assert _stored_files() == []
+
+
+def test_disconnected_client_cancels_waiting_work():
+    async def scenario():
+        deadline = Deadline.after(5, request=_GoneRequest())
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(5)
+
+        with pytest.raises(RequestCancelledError) as cancelled:
+            await run_until_cancelled(work(), deadline.attempt())
+        return cancelled.value, started.is_set()
+
+    error, started = asyncio.run(scenario())
+
+    assert (error.status_code, error.message) == (499, CLIENT_DISCONNECTED)
+    assert started
+
+
+def test_work_that_reached_the_model_is_awaited_past_the_deadline():
+    async def scenario():
+        attempt = Deadline.after(0.05).attempt()
+
+        def work():
+            attempt.start()
+            attempt.reach_model()
+            time.sleep(0.2)
+            return "predicted"
+
+        return await run_until_cancelled(asyncio.to_thread(work), attempt)
+
+    assert asyncio.run(scenario()) == "predicted"
+
+
+def test_closed_stream_fails_the_analysis_and_drops_its_files(session, tmp_path, inference_env):
+    analysis = crud.create_analysis(session, AnalysisCreate(mode="multi"))
+    files = {view: _stored_upload(tmp_path, view) for view in VIEWS}
+    sources = {view: str(info["file_path"]) for view, info in files.items()}
+
+    async def read_one_event():
+        events = main._stream_study(
+            main.get_model_service(), analysis.id, sources, files, "ndjson"
+        )
+        first = await events.__anext__()
+        await events.aclose()
+        return first
+
+    assert '"view"' in asyncio.run(read_one_event())
+
+    session.expire_all()
+    failed = crud.get_analysis(session, analysis.id)
+    assert failed.status == models.AnalysisStatus.FAILED
+    assert failed.error_message == CLIENT_DISCONNECTED
+    assert not any((tmp_path / f"{view}.png").exists() for view in VIEWS)
+
+
+def test_queued_job_past_its_deadline_is_dropped(session, tmp_path, inference_env, monkeypatch):
+    calls = _count_predictions(monkeypatch)
+    analysis = crud.create_analysis(session, AnalysisCreate(mode="single"))
+    upload = _stored_upload(tmp_path, "view")
+    job = InferenceJob(
+        analysis_id=analysis.id, mode="single", files={"image": upload}, deadline=time.time() - 1
+    )
+
+    errors = main.process_job_batch([job])
+
+    assert isinstance(errors[0], RequestCancelledError)
+    assert calls == []
+    session.expire_all()
+    dropped = crud.get_analysis(session, analysis.id)
+    assert dropped.status == models.AnalysisStatus.FAILED
+    assert dropped.error_message == DEADLINE_EXCEEDED
+    assert not os.path.exists(upload["file_path"])
@@ -0,0 +1,98 @@
+"""Tests for the packed detection storage and its API serializer."""
+import io
+import json
+
+from PIL import Image
+
+from app import crud, models
+from app.detections import expand_summary, pack_detections, unpack_detections
+from app.schemas import AnalysisImageCreate, BoundingBox, Detection
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _detection(index: int, label: str = "mass", category: str = "malignant") -> Detection:
+    return Detection(
+        bbox=BoundingBox(x1=10.5 + index, y1=20.25, x2=310.75, y2=400.0 + index),
+        confidence=0.87,
+        label=label,
+        category=category,
+        traffic_light="red" if category == "malignant" else "amber",
+    )
+
+
+def _image_create(**fields) -> AnalysisImageCreate:
+    return AnalysisImageCreate(
+        view_type=models.ImageViewType.SINGLE,
+        file_id="legacy",
+        filename="legacy.png",
+        original_filename="legacy.png",
+        file_path="/tmp/legacy.png",
+        relative_path="legacy.png",
+        file_size=1,
+        file_hash="0" * 64,
+        detections_count=1,
+        **fields,
+    )
+
+
+def test_pack_round_trips_the_api_shape():
+    detections = [_detection(i) for i in range(20)] + [_detection(0, "calcification", "benign")]
+
+    blob = pack_detections(detections)
+
+    assert unpack_detections(blob) == [d.model_dump() for d in detections]
+    assert unpack_detections(pack_detections([])) == []
+    verbose = json.dumps({"detections": [d.model_dump() for d in detections]})
+    assert len(blob) * 4 < len(verbose)
+
+
+def test_expand_summary_restores_view_detections():
+    summary = {"mode": "single", "views": {"image": {"detection_count": 1}}}
+
+    expanded = expand_summary(summary, {"single": [{"label": "mass"}]})
+
+    assert expanded["views"]["image"]["detections"] == [{"label": "mass"}]
+    assert "detections" not in summary["views"]["image"]
+
+
+def test_detections_are_stored_once_and_served_in_full(client, session, inference_env):
+    response = client.post(
+        "/infer/multi", files={view: (f"{view}.png", _png(), "image/png") for view in VIEWS}
+    )
+    analysis_id = response.json()["analysis_id"]
+
+    analysis = crud.get_analysis(session, analysis_id)
+    assert all("detections" not in view for view in analysis.summary["views"].values())
+    images = crud.list_analysis_images(session, analysis_id)
+    assert all(image.detections_data is None and image.detections_packed for image in images)
+
+    detail = client.get(f"/analyses/{analysis_id}").json()
+    expected = response.json()["views"]
+    for view in VIEWS:
+        assert detail["summary"]["views"][view]["detections"] == expected[view]["detections"]
+    for image in detail["images"]:
+        assert image["detections_data"]["detections"] == expected[image["view_type"]]["detections"]
+
+    listed = client.get("/analyses").json()["items"][0]
+    assert listed["summary"]["views"]["lcc"] == {"size": {"width": 8, "height": 6}, "detection_count": 1}
+
+
+def test_legacy_json_rows_are_still_served(client, session, sample_analysis):
+    legacy = {"detections": [_detection(0).model_dump()]}
+    crud.create_analysis_image(
+        session,
+        sample_analysis.id,
+        _image_create(detections_data=legacy),
+    )
+
+    detail = client.get(f"/analyses/{sample_analysis.id}").json()
+
+    assert detail["images"][0]["detections_data"] == legacy
+
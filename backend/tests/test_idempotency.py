@@ -0,0 +1,150 @@
+"""Tests for Idempotency-Key handling on the inference endpoints."""
+import asyncio
+import io
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from PIL import Image
+from sqlmodel import select
+from starlette.requests import Request
+
+from app import idempotency, main, models
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png(color: int = 100) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _count_predictions(monkeypatch, delay_s: float = 0.0) -> list:
+    """Record every model call, optionally making each one slow."""
+    service = main.get_model_service()
+    calls = []
+    predict_batch = service.predict_batch
+
+    def counted(images):
+        calls.append(set(images))
+        time.sleep(delay_s)
+        return predict_batch(images)
+
+    monkeypatch.setattr(service, "predict_batch", counted)
+    return calls
+
+
+def _stored_files() -> list:
+    return [path for path in main.file_manager.images_dir.rglob("*") if path.is_file()]
+
+
+def _post_multi(client, key, color: int = 100, **kwargs):
+    return client.post(
+        "/infer/multi",
+        files={view: (f"{view}.png", _png(color), "image/png") for view in VIEWS},
+        headers={"Idempotency-Key": key},
+        **kwargs,
+    )
+
+
+def test_retry_replays_the_original_result(client, session, inference_env, monkeypatch):
+    calls = _count_predictions(monkeypatch)
+
+    first = _post_multi(client, "study-1")
+    stored = _stored_files()
+    retry = _post_multi(client, "study-1")
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(calls) == 1
+    assert len(session.exec(select(models.Analysis)).all()) == 1
+    assert _stored_files() == stored
+
+
+def test_key_reused_for_other_images_is_rejected(client, inference_env):
+    _post_multi(client, "study-1")
+
+    response = _post_multi(client, "study-1", color=200)
+
+    assert response.status_code == 409
+
+
+def test_failed_request_can_be_retried(client, session, inference_env):
+    main.get_model_service().error = RuntimeError("CUDA out of memory")
+    assert _post_multi(client, "study-1").status_code == 500
+
+    main.get_model_service().error = None
+    retry = _post_multi(client, "study-1")
+
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+    statuses = [a.status for a in session.exec(select(models.Analysis).order_by(models.Analysis.id))]
+    assert statuses == [models.AnalysisStatus.FAILED, models.AnalysisStatus.COMPLETED]
+
+
+def test_retry_attaches_to_the_in_flight_request(client, inference_env, monkeypatch):
+    calls = _count_predictions(monkeypatch, delay_s=0.3)
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL_S", 0.01)
+    content = _png()
+
+    async def submit_twice():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(
+                *(
+                    http.post(
+                        "/infer/single",
+                        files={"image": ("view.png", content, "image/png")},
+                        headers={"Idempotency-Key": "scan-7"},
+                    )
+                    for _ in range(2)
+                )
+            )
+
+    responses = asyncio.run(submit_twice())
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].json()["analysis_id"] == responses[1].json()["analysis_id"]
+    assert len(calls) == 1
+
+
+def test_async_submission_replays_the_queued_analysis(client, session, inference_env):
+    first = _post_multi(client, "study-1", params={"async": "true"})
+    retry = _post_multi(client, "study-1", params={"async": "true"})
+
+    assert first.status_code == retry.status_code == 202
+    assert retry.json()["analysis_id"] == first.json()["analysis_id"]
+    assert len(session.exec(select(models.Analysis)).all()) == 1
+
+
+def test_expired_key_starts_a_new_analysis(client, session, inference_env):
+    first = _post_multi(client, "study-1")
+    record = session.get(models.IdempotencyKey, "study-1")
+    record.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(record)
+    session.commit()
+
+    retry = _post_multi(client, "study-1")
+
+    assert retry.json()["analysis_id"] != first.json()["analysis_id"]
+
+
+def test_disconnect_does_not_cancel_a_keyed_request(client, session, inference_env, monkeypatch):
+    calls = _count_predictions(monkeypatch, delay_s=0.2)
+
+    async def gone(self) -> bool:
+        return True
+
+    monkeypatch.setattr(Request, "is_disconnected", gone)
+
+    first = _post_multi(client, "study-1")
+    retry = _post_multi(client, "study-1")
+
+    assert first.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["analysis_id"] == first.json()["analysis_id"]
+    assert len(calls) == 1
+    analysis = session.exec(select(models.Analysis)).one()
+    assert analysis.status == models.AnalysisStatus.COMPLETED
@@ -0,0 +1,173 @@
+"""Tests for reduced-resolution, grayscale-native decoding of uploads."""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import main
+from app.image_decode import (
+    CROP_DECODE_HEADROOM,
+    DecodedImage,
+    as_decoded,
+    crop_to_tissue,
+    decode_image,
+    fit_to_size,
+    prepare_image,
+    reduction_factor,
+    tissue_bounds,
+)
+from app.model_service import InferenceService
+
+# Bright region drawn into the synthetic mammogram, in original pixels (x1, y1, x2, y2).
+REGION = (1200, 800, 2000, 1400)
+
+
+def _encode(size, fmt: str, mode: str = "L") -> bytes:
+    canvas = np.zeros((size[1], size[0]), dtype=np.uint8)
+    x1, y1, x2, y2 = REGION
+    canvas[y1:y2, x1:x2] = 255
+    buffer = io.BytesIO()
+    Image.fromarray(canvas).convert(mode).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _bright_box(pixels: np.ndarray) -> np.ndarray:
+    """Detector stand-in: one xyxy box around the bright pixels."""
+    mask = pixels > 127
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    return np.array([[cols[0], rows[0], cols[-1] + 1, rows[-1] + 1]], dtype=np.float32)
+
+
+class RegionService(InferenceService):
+    """Model service stand-in that reuses the real detection mapping."""
+
+    imgsz = 1024
+
+    def __init__(self, auto_crop: bool = False):
+        self.class_metadata = {0: {"label": "mass", "category": "malignant", "traffic_light": "red"}}
+        self.auto_crop = auto_crop
+        self.seen = []
+
+    def predict_batch(self, images):
+        views = list(images)
+        prepared = self._prepare([images[view] for view in views])
+        self.seen.extend(prepared)
+        return {
+            view: self._arrays_to_view_prediction(
+                image, _bright_box(image.pixels), np.array([0.9]), np.array([0])
+            )
+            for view, image in zip(views, prepared)
+        }
+
+
+def test_reduction_factor_keeps_target_resolution():
+    assert reduction_factor((4000, 3000), 1280) == 3
+    assert reduction_factor((1000, 800), 1280) == 1
+    assert reduction_factor((4000, 3000), None) == 1
+
+
+def test_jpeg_is_decoded_at_reduced_dct_scale():
+    decoded = decode_image(_encode((4096, 3072), "JPEG", mode="RGB"), target_size=1024)
+
+    assert decoded.original_size == (4096, 3072)
+    assert decoded.size == (1024, 768)
+    assert decoded.pixels.shape == (768, 1024)
+    assert decoded.pixels.dtype == np.uint8
+
+
+def test_png_is_reduced_then_fitted_to_the_letterbox_size():
+    decoded = decode_image(_encode((3000, 2000), "PNG"), target_size=1280)
+
+    assert decoded.original_size == (3000, 2000)
+    assert decoded.size == (1500, 1000)
+    assert fit_to_size(decoded, 1280).size == (1280, 853)
+
+
+def test_small_images_and_disabled_target_decode_at_full_size():
+    content = _encode((3000, 2000), "PNG")
+    assert decode_image(content, target_size=None).size == (3000, 2000)
+    assert decode_image(content, target_size=4000).size == (3000, 2000)
+
+
+def test_sixteen_bit_images_are_scaled_not_clipped():
+    buffer = io.BytesIO()
+    Image.fromarray(np.full((4, 4), 40000, dtype=np.uint16)).save(buffer, format="PNG")
+    decoded = decode_image(buffer.getvalue())
+    assert decoded.pixels.max() == 40000 >> 8
+
+
+def test_channels_are_a_zero_copy_view():
+    decoded = as_decoded(Image.new("RGB", (6, 4), color=(10, 10, 10)))
+
+    rgb = decoded.as_rgb()
+    assert rgb.shape == (4, 6, 3)
+    assert np.shares_memory(rgb, decoded.pixels)
+    assert as_decoded(decoded) is decoded
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG"])
+def test_boxes_map_back_to_original_pixels(fmt):
+    decoded = decode_image(_encode((4000, 3000), fmt), target_size=1000)
+    assert decoded.size != decoded.original_size
+
+    x1, y1, x2, y2 = decoded.to_original(_bright_box(decoded.pixels))[0]
+
+    tolerance = 2 * max(decoded.scale)
+    for value, expected in zip((x1, y1, x2, y2), REGION):
+        assert value == pytest.approx(expected, abs=tolerance)
+
+
+def test_prediction_helper_reports_original_coordinates(monkeypatch, predict_stored):
+    monkeypatch.setattr(main, "get_result_cache", lambda: None)
+    service = RegionService()
+
+    predictions, _ = predict_stored(service, {"image": _encode((4096, 3072), "JPEG")})
+
+    assert [item.size for item in service.seen] == [(1024, 768)]
+    prediction = predictions["image"]
+    assert (prediction.size.width, prediction.size.height) == (4096, 3072)
+    assert prediction.detections[0].bbox.x1 == pytest.approx(REGION[0], abs=8)
+    assert prediction.detections[0].bbox.y2 == pytest.approx(REGION[3], abs=8)
+
+
+def test_tissue_bounds_ignore_background_noise_and_labels():
+    pixels = np.zeros((400, 300), dtype=np.uint8)
+    pixels[50:350, 0:120] = 180  # breast tissue against the left edge
+    pixels[20:24, 250:270] = 255  # burned-in view label
+    pixels[np.random.default_rng(0).random(pixels.shape) < 0.001] = 255  # speckle
+
+    assert tissue_bounds(pixels) == (0, 50, 120, 350)
+    assert tissue_bounds(np.zeros((10, 10), dtype=np.uint8)) is None
+
+
+def test_crop_is_skipped_when_it_saves_little():
+    full = DecodedImage(pixels=np.full((100, 100), 200, dtype=np.uint8), original_size=(100, 100))
+    assert crop_to_tissue(full) is full
+
+
+def test_cropped_and_fitted_boxes_map_back_to_original_pixels():
+    decoded = decode_image(_encode((4000, 3000), "PNG"), target_size=640 * CROP_DECODE_HEADROOM)
+    prepared = prepare_image(decoded, 640, auto_crop=True)
+
+    assert prepared.offset != (0.0, 0.0)
+    assert max(prepared.size) <= 640
+    # The crop keeps more pixels per original pixel than fitting the full view would.
+    assert max(prepared.scale) < max(fit_to_size(decoded, 640).scale)
+    x1, y1, x2, y2 = prepared.to_original(_bright_box(prepared.pixels))[0]
+    tolerance = 2 * max(prepared.scale)
+    for value, expected in zip((x1, y1, x2, y2), REGION):
+        assert value == pytest.approx(expected, abs=tolerance)
+
+
+def test_auto_crop_detections_are_reported_in_full_image_coordinates(monkeypatch, predict_stored):
+    monkeypatch.setattr(main, "get_result_cache", lambda: None)
+    service = RegionService(auto_crop=True)
+
+    predictions, _ = predict_stored(service, {"image": _encode((4096, 3072), "PNG")})
+    prediction = predictions["image"]
+
+    assert (prediction.size.width, prediction.size.height) == (4096, 3072)
+    bbox = prediction.detections[0].bbox
+    for value, expected in zip((bbox.x1, bbox.y1, bbox.x2, bbox.y2), REGION):
+        assert value == pytest.approx(expected, abs=4)
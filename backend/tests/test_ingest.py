@@ -0,0 +1,100 @@
+"""Tests for single-pass upload ingest: stream, hash, size limit, decode once."""
+import asyncio
+import hashlib
+import io
+import uuid
+
+import pytest
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from app import file_manager as file_manager_module
+from app import main
+from app.exceptions import PayloadTooLargeError
+from app.file_manager import FileManager
+
+
+def _png(width: int = 64, height: int = 48) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, height), color=90).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _upload(content: bytes, filename: str = "view.png") -> UploadFile:
+    return UploadFile(
+        io.BytesIO(content), filename=filename, headers=Headers({"content-type": "image/png"})
+    )
+
+
+def test_ingest_streams_in_chunks_and_hashes(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_manager_module, "CHUNK_SIZE", 7)
+    content = _png()
+
+    file_info = asyncio.run(FileManager(tmp_path).ingest_upload(_upload(content), analysis_id=3))
+
+    assert file_info["file_hash"] == hashlib.sha256(content).hexdigest()
+    assert file_info["file_size"] == len(content)
+    assert file_info["thumbnail_path"] is None
+    assert (tmp_path / str(file_info["relative_path"])).read_bytes() == content
+
+
+def test_oversized_upload_is_rejected_while_streaming(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_manager_module.settings, "max_upload_size", 100)
+    monkeypatch.setattr(file_manager_module, "CHUNK_SIZE", 32)
+    manager = FileManager(tmp_path)
+
+    with pytest.raises(PayloadTooLargeError) as exc_info:
+        asyncio.run(manager.ingest_upload(_upload(b"x" * 500)))
+
+    assert exc_info.value.status_code == 413
+    assert not any(path.is_file() for path in manager.images_dir.rglob("*"))
+
+
+def test_single_inference_decodes_each_upload_once(client, inference_env, monkeypatch):
+    calls = []
+    decode = main.decode_image
+    monkeypatch.setattr(main, "decode_image", lambda *args: calls.append(args) or decode(*args))
+
+    response = client.post("/infer/single", files={"image": ("view.png", _png(), "image/png")})
+
+    assert response.status_code == 200
+    assert len(calls) == 1
+    assert response.json()["views"]["image"]["size"] == {"width": 64, "height": 48}
+    analysis = client.get(f"/analyses/{response.json()['analysis_id']}").json()
+    image = analysis["images"][0]
+    assert (main.file_manager.upload_dir / image["thumbnail_path"]).is_file()
+
+
+def test_oversized_inference_upload_returns_413(client, session, inference_env, monkeypatch):
+    monkeypatch.setattr(file_manager_module.settings, "max_upload_size", len(_png()) - 1)
+
+    response = client.post("/infer/single", files={"image": ("view.png", _png(), "image/png")})
+
+    assert response.status_code == 413
+    session.expire_all()
+    analyses = client.get("/analyses").json()["items"]
+    assert [item["status"] for item in analyses] == ["failed"]
+
+
+def test_thumbnail_requests_cannot_leave_the_thumbnails_dir(tmp_path, monkeypatch):
+    manager = FileManager(tmp_path / "uploads")
+    monkeypatch.setattr(main, "file_manager", manager)
+    file_id = str(uuid.uuid4())
+    # An image outside the uploads root that a traversal would thumbnail.
+    private = tmp_path / "private"
+    private.mkdir()
+    Image.new("L", (8, 6)).save(private / f"x_{file_id}_lcc.png")
+    day = manager.images_dir / "2024" / "01" / "02"
+    day.mkdir(parents=True)
+    Image.new("L", (8, 6)).save(day / f"20240102_000000_{uuid.uuid4()}_lcc.png")
+
+    for parts in (
+        ("..", "..", "private", f"{file_id}_thumb.jpg"),
+        ("2024", "01", "02", "*_thumb.jpg"),
+        ("2024", "01", "02", "not-a-uuid_thumb.jpg"),
+    ):
+        with pytest.raises(main.HTTPException) as exc_info:
+            asyncio.run(main.serve_thumbnail(*parts))
+        assert exc_info.value.status_code == 404
+
+    assert not any(tmp_path.rglob("*_thumb.jpg"))
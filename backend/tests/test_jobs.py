@@ -0,0 +1,179 @@
+"""Tests for asynchronous inference jobs."""
+import asyncio
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from app import crud, main
+from app.exceptions import ServiceUnavailableError
+from app.jobs import InferenceJob, InferenceJobQueue, RedisJobQueue
+from app.models import AnalysisStatus
+from app.schemas import AnalysisCreate
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _job(analysis_id: int = 1) -> InferenceJob:
+    return InferenceJob(analysis_id=analysis_id, mode="single", files={})
+
+
+def test_queue_runs_jobs_and_counts_outcomes():
+    def handler(job):
+        if job.analysis_id == 2:
+            raise RuntimeError("boom")
+
+    queue = InferenceJobQueue(handler, workers=2, max_queue=4)
+    for analysis_id in (1, 2, 3):
+        queue.submit(_job(analysis_id))
+    queue.join()
+
+    stats = queue.stats()
+    assert (stats["submitted"], stats["completed"], stats["failed"]) == (3, 2, 1)
+    assert stats["running"] == 0
+    assert stats["queued"] == 0
+
+
+def test_full_queue_rejects_with_service_unavailable():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(job):
+        started.set()
+        release.wait(5)
+
+    queue = InferenceJobQueue(handler, workers=1, max_queue=1)
+    queue.submit(_job(1))
+    started.wait(5)
+    queue.submit(_job(2))
+
+    assert queue.full()
+    with pytest.raises(ServiceUnavailableError) as exc_info:
+        queue.submit(_job(3))
+    assert exc_info.value.status_code == 503
+    assert queue.stats()["rejected"] == 1
+
+    release.set()
+    queue.join()
+
+
+def test_async_single_returns_202_and_completes(client, session, inference_env):
+    response = client.post(
+        "/infer/single?async=true",
+        files={"image": ("view.png", _png(), "image/png")},
+    )
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "pending"
+    assert response.headers["location"] == body["status_url"]
+
+    inference_env.join()
+    session.expire_all()
+    status_body = client.get(body["status_url"]).json()
+    assert status_body["status"] == "completed"
+    assert status_body["total_findings"] == 1
+    assert status_body["completed_at"] is not None
+
+    analysis = client.get(f"/analyses/{body['analysis_id']}").json()
+    assert len(analysis["images"]) == 1
+    assert analysis["images"][0]["thumbnail_path"] is not None
+    assert analysis["summary"]["totals"]["total_findings"] == 1
+
+
+def test_redis_submission_runs_off_the_event_loop(client, inference_env, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    on_event_loop = []
+
+    class RecordingRedis(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_event_loop.append(True)
+            except RuntimeError:
+                on_event_loop.append(False)
+            return super().execute_command(*args, **kwargs)
+
+    queue = RedisJobQueue(RecordingRedis(decode_responses=True), max_queue=10)
+    queue.ensure_group()
+    on_event_loop.clear()
+    monkeypatch.setattr(main, "get_job_queue", lambda: queue)
+
+    response = client.post(
+        "/infer/single?async=true", files={"image": ("view.png", _png(), "image/png")}
+    )
+
+    assert response.status_code == 202
+    assert queue.client.xlen(queue.stream) == 1
+    assert on_event_loop and not any(on_event_loop)
+
+
+def test_async_job_failure_is_recorded(client, session, inference_env):
+    main.get_model_service().error = RuntimeError("CUDA out of memory")
+    response = client.post(
+        "/infer/single?async=true",
+        files={"image": ("view.png", _png(), "image/png")},
+    )
+    assert response.status_code == 202
+
+    inference_env.join()
+    session.expire_all()
+    status_body = client.get(response.json()["status_url"]).json()
+    assert status_body["status"] == "failed"
+    assert status_body["error_message"] == "CUDA out of memory"
+    assert inference_env.stats()["failed"] == 1
+
+
+def _stored_job(session, tmp_path, name: str, content: bytes) -> InferenceJob:
+    """A PENDING analysis with one upload already on disk, as the API leaves it."""
+    analysis = crud.create_analysis(session, AnalysisCreate(mode="single"))
+    path = tmp_path / f"{name}.png"
+    path.write_bytes(content)
+    file_info = {
+        "file_id": name,
+        "filename": path.name,
+        "original_filename": path.name,
+        "file_path": str(path),
+        "relative_path": path.name,
+        "thumbnail_path": None,
+        "file_size": len(content),
+        "file_hash": name,
+        "content_type": "image/png",
+    }
+    return InferenceJob(analysis_id=analysis.id, mode="single", files={"image": file_info})
+
+
+def test_job_batch_is_predicted_in_one_model_call(session, tmp_path, inference_env):
+    service = main.get_model_service()
+    calls = []
+    predict_batch = service.predict_batch
+    service.predict_batch = lambda images: calls.append(len(images)) or predict_batch(images)
+    jobs = [_stored_job(session, tmp_path, name, _png()) for name in ("a", "b", "c")]
+
+    assert main.process_job_batch(jobs) == [None, None, None]
+    assert calls == [3]
+    session.expire_all()
+    assert {crud.get_analysis(session, job.analysis_id).status for job in jobs} == {
+        AnalysisStatus.COMPLETED
+    }
+
+
+def test_bad_job_in_batch_fails_alone(session, tmp_path, inference_env):
+    jobs = [
+        _stored_job(session, tmp_path, "good", _png()),
+        _stored_job(session, tmp_path, "bad", b"not an image"),
+    ]
+
+    errors = main.process_job_batch(jobs)
+
+    assert errors[0] is None and errors[1] is not None
+    session.expire_all()
+    assert crud.get_analysis(session, jobs[0].analysis_id).status == AnalysisStatus.COMPLETED
+    bad = crud.get_analysis(session, jobs[1].analysis_id)
+    assert bad.status == AnalysisStatus.FAILED
+    assert "valid image" in bad.error_message
@@ -0,0 +1,87 @@
+"""Tests for the in-process Prometheus metrics."""
+import io
+import threading
+from types import SimpleNamespace
+
+from PIL import Image
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app import metrics
+from app.metrics import DB_POOL_CHECKOUT_SECONDS, INFERENCE_STAGE_SECONDS, MODEL_LOCK_WAIT_SECONDS
+from app.model_service import InferenceService
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _stage_counts() -> dict:
+    return {stage: INFERENCE_STAGE_SECONDS.count(stage=stage) for stage in metrics.STAGES}
+
+
+def test_histogram_exposition_is_cumulative():
+    histogram = metrics.Histogram("test_latency_seconds", "Test.", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, kind='a "quoted" value')
+
+    lines = histogram.render().splitlines()
+
+    assert lines[:2] == ["# HELP test_latency_seconds Test.", "# TYPE test_latency_seconds histogram"]
+    assert lines[2:] == [
+        'test_latency_seconds_bucket{kind="a \\"quoted\\" value",le="0.1"} 1',
+        'test_latency_seconds_bucket{kind="a \\"quoted\\" value",le="1.0"} 3',
+        'test_latency_seconds_bucket{kind="a \\"quoted\\" value",le="+Inf"} 4',
+        'test_latency_seconds_sum{kind="a \\"quoted\\" value"} 4.25',
+        'test_latency_seconds_count{kind="a \\"quoted\\" value"} 4',
+    ]
+
+
+def test_inference_request_records_stages_and_request_counts(client, inference_env):
+    before = _stage_counts()
+
+    response = client.post("/infer/single", files={"image": ("view.png", _png(), "image/png")})
+    body = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert body.headers["content-type"] == metrics.CONTENT_TYPE
+    after = _stage_counts()
+    for stage in ("upload_read", "file_save", "decode", "thumbnail", "db_commit"):
+        assert after[stage] > before[stage], stage
+    assert 'http_requests_total{method="POST",endpoint="/infer/single",status="200"}' in body.text
+    assert "thread_pool_queue_depth " in body.text
+
+
+def test_model_stages_and_lock_wait_are_timed():
+    service = object.__new__(InferenceService)
+    service.__dict__.update(
+        imgsz=None,
+        auto_crop=False,
+        device="cpu",
+        confidence_threshold=0.25,
+        iou=None,
+        augment=False,
+        class_metadata={},
+        _lock=threading.Lock(),
+        model=SimpleNamespace(predict=lambda images, **_: [SimpleNamespace(boxes=None) for _ in images]),
+    )
+    before, lock_waits = _stage_counts(), MODEL_LOCK_WAIT_SECONDS.count()
+
+    service.predict_many([Image.new("L", (8, 6))])
+
+    after = _stage_counts()
+    for stage in ("preprocess", "model_forward", "to_view_prediction"):
+        assert after[stage] == before[stage] + 1, stage
+    assert MODEL_LOCK_WAIT_SECONDS.count() == lock_waits + 1
+
+
+def test_pool_checkout_wait_is_recorded(tmp_path):
+    pool = type("Pool", (metrics.TimedCheckout, QueuePool), {"metrics_label": "test"})
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=pool)
+
+    with engine.connect() as connection:
+        connection.execute(text("select 1"))
+
+    assert DB_POOL_CHECKOUT_SECONDS.count(engine="test") == 1
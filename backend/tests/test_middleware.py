@@ -0,0 +1,66 @@
+"""Tests for the request middleware."""
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.exceptions import ServiceUnavailableError
+from app.middleware import RequestMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestMiddleware)
+
+    @app.get("/echo")
+    async def echo(request: Request):
+        return {"request_id": request.state.request_id}
+
+    @app.get("/busy")
+    async def busy():
+        raise ServiceUnavailableError("Busy", retry_after=3)
+
+    @app.get("/broken")
+    async def broken():
+        raise RuntimeError("boom")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                yield f"{index}\n"
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+def test_request_id_and_process_time_headers(client):
+    response = TestClient(_app()).get("/echo")
+
+    assert response.headers["X-Request-ID"] == response.json()["request_id"]
+    uuid.UUID(response.headers["X-Request-ID"])
+    assert float(response.headers["X-Process-Time"]) >= 0
+    assert "X-Request-ID" in client.get("/health").headers
+
+
+def test_exceptions_are_rendered_as_json():
+    http = TestClient(_app())
+
+    busy = http.get("/busy")
+    broken = http.get("/broken")
+
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "3"
+    assert busy.json() == {"detail": "Busy", "request_id": busy.headers["X-Request-ID"]}
+    assert broken.status_code == 500
+    assert broken.json()["detail"] == "Internal server error"
+    assert "X-Process-Time" in broken.headers
+
+
+def test_streamed_body_passes_through():
+    response = TestClient(_app()).get("/stream")
+
+    assert response.text == "0\n1\n2\n"
+    assert "X-Request-ID" in response.headers
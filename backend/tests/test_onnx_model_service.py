@@ -0,0 +1,106 @@
+"""Tests for the ONNX Runtime inference backend."""
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.onnx_model_service import (
+    OnnxInferenceService,
+    decode_predictions,
+    letterbox,
+    non_max_suppression,
+)
+
+def test_nms_suppresses_overlapping_boxes():
+    """Overlapping lower-score boxes are removed, distant ones kept."""
+    boxes = np.array(
+        [[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 60, 60]], dtype=np.float32
+    )
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    assert non_max_suppression(boxes, scores, 0.5).tolist() == [0, 2]
+
+
+def test_decode_predictions_is_class_aware():
+    """Identical boxes of different classes survive NMS."""
+    # Two anchors, same xywh box, three classes.
+    output = np.array(
+        [
+            [5.0, 5.0],  # cx
+            [5.0, 5.0],  # cy
+            [4.0, 4.0],  # w
+            [4.0, 4.0],  # h
+            [0.9, 0.0],  # class 0
+            [0.0, 0.8],  # class 1
+            [0.0, 0.0],  # class 2
+        ],
+        dtype=np.float32,
+    )
+    boxes, scores, classes = decode_predictions(output, conf_threshold=0.25, iou_threshold=0.5)
+    assert classes.tolist() == [0, 1]
+    assert scores.tolist() == pytest.approx([0.9, 0.8])
+    assert boxes[0].tolist() == [3.0, 3.0, 7.0, 7.0]
+
+
+def test_letterbox_maps_back_to_source_pixels():
+    """A point in the source image survives letterbox + inverse mapping."""
+    image = np.zeros((300, 500, 3), dtype=np.uint8)
+    padded, (scale_x, scale_y, left, top) = letterbox(image, 320, 32, auto=False)
+    assert padded.shape == (320, 320, 3)
+
+    box = np.array([[100.0, 50.0, 400.0, 250.0]], dtype=np.float32)
+    letterboxed = box.copy()
+    letterboxed[:, [0, 2]] = letterboxed[:, [0, 2]] * scale_x + left
+    letterboxed[:, [1, 3]] = letterboxed[:, [1, 3]] * scale_y + top
+    restored = OnnxInferenceService._scale_boxes(letterboxed, (scale_x, scale_y, left, top), (500, 300))
+    assert restored == pytest.approx(box, abs=1e-3)
+
+
+def test_letterbox_auto_pads_to_stride_multiple():
+    """Minimal-rectangle letterboxing only pads up to the model stride."""
+    padded, _ = letterbox(np.zeros((300, 500, 3), dtype=np.uint8), 320, 32, auto=True)
+    assert padded.shape == (192, 320, 3)
+
+
+@pytest.mark.slow
+def test_parity_with_inference_service(tmp_path):
+    """ONNX detections match the ultralytics service for the same weights."""
+    import torch
+    from ultralytics import YOLO
+
+    from app.model_service import InferenceService
+    from app.replica_pool import ReplicaPool
+
+    # A freshly initialised yolo11n scores every anchor the same; rescale the
+    # class head so scores differ and there are detections to compare.
+    torch.manual_seed(0)
+    model = YOLO("yolo11n.yaml")
+    with torch.no_grad():
+        for module in model.model.modules():
+            if isinstance(module, torch.nn.Conv2d):
+                torch.nn.init.kaiming_normal_(module.weight)
+        for branch in model.model.model[-1].cv3:
+            branch[-1].weight.mul_(500.0)
+            branch[-1].bias.fill_(-2.0)
+    weights = tmp_path / "tiny.pt"
+    model.save(str(weights))
+
+    config = {"weights_path": weights, "confidence_threshold": 0.9, "imgsz": 160, "iou": 0.45}
+    onnx_service = OnnxInferenceService(**config)
+    yolo_service = InferenceService(**config)
+
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 255, shape, dtype=np.uint8)) for shape in ((200, 150), (120, 260))
+    ]
+    # Inherited paths: single-image predict and named views, through a replica pool.
+    pool = ReplicaPool([onnx_service, onnx_service.clone()])
+    assert pool.predict(images[0]) == pool.predict_batch({"lcc": images[0]})["lcc"]
+    assert onnx_service._lock is not None
+    for actual, expected in zip(onnx_service.predict_many(images), yolo_service.predict_many(images)):
+        assert actual.size == expected.size
+        assert expected.detections
+        assert len(actual.detections) == len(expected.detections)
+        for a, b in zip(actual.detections, expected.detections):
+            assert a.label == b.label
+            assert a.confidence == pytest.approx(b.confidence, abs=1e-3)
+            for coord in ("x1", "y1", "x2", "y2"):
+                assert getattr(a.bbox, coord) == pytest.approx(getattr(b.bbox, coord), abs=1.0)
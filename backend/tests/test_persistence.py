@@ -0,0 +1,61 @@
+"""Tests for single-transaction persistence of inference results."""
+import io
+
+from PIL import Image
+from sqlalchemy import event
+from sqlmodel import select
+
+from app import crud, main, models
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _record_sql(engine):
+    """Collect the statement verbs and commits issued on ``engine``."""
+    statements, commits = [], []
+    event.listen(
+        engine, "before_cursor_execute", lambda _c, _cur, sql, *_: statements.append(sql.split()[0])
+    )
+    event.listen(engine, "commit", lambda _c: commits.append(True))
+    return statements, commits
+
+
+def test_multi_study_is_written_in_one_transaction(client, session, async_engine, inference_env, sample_patient):
+    statements, commits = _record_sql(async_engine.sync_engine)
+
+    response = client.post(
+        "/infer/multi",
+        data={"patient_id": str(sample_patient.id)},
+        files={view: (f"{view}.png", _png(), "image/png") for view in VIEWS},
+    )
+
+    assert response.status_code == 200
+    # Patient lookup, then the analysis and its four images in one transaction.
+    assert statements == ["SELECT", "INSERT", "INSERT"]
+    assert len(commits) == 1
+    analysis = crud.get_analysis(session, response.json()["analysis_id"])
+    assert analysis.status == models.AnalysisStatus.COMPLETED
+    assert analysis.total_findings == 4
+    images = crud.list_analysis_images(session, analysis.id)
+    assert sorted(image.view_type.value for image in images) == sorted(VIEWS)
+
+
+def test_failed_study_is_recorded_and_its_files_removed(client, session, inference_env):
+    main.get_model_service().error = RuntimeError("CUDA out of memory")
+
+    response = client.post(
+        "/infer/multi", files={view: (f"{view}.png", _png(), "image/png") for view in VIEWS}
+    )
+
+    assert response.status_code == 500
+    analysis = session.exec(select(models.Analysis)).one()
+    assert analysis.status == models.AnalysisStatus.FAILED
+    assert analysis.error_message == "CUDA out of memory"
+    assert session.exec(select(models.AnalysisImage)).all() == []
+    assert not any(path.is_file() for path in main.file_manager.images_dir.rglob("*"))
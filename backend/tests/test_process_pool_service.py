@@ -0,0 +1,63 @@
+"""Tests for the process-pool inference service."""
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.process_pool_service import ProcessPoolInferenceService, share_image
+
+
+def test_share_image_round_trip():
+    """Images copied into shared memory can be read back by block name."""
+    array = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    block, (name, shape) = share_image(array)
+    try:
+        attached = SharedMemory(name=name)
+        view = np.ndarray(shape, dtype=np.uint8, buffer=attached.buf)
+        assert np.array_equal(view, array)
+        del view
+        attached.close()
+    finally:
+        block.close()
+        block.unlink()
+
+
+@pytest.mark.slow
+def test_process_pool_matches_in_process_service(tmp_path):
+    """Worker-process predictions equal those of the in-process service."""
+    from ultralytics import YOLO
+
+    from app.model_service import InferenceService
+
+    weights = tmp_path / "tiny.pt"
+    YOLO("yolo11n.yaml").save(str(weights))
+    config = {"weights_path": weights, "confidence_threshold": 0.0001, "imgsz": 160}
+
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 255, (200, 150), dtype=np.uint8)).convert("RGB")
+        for _ in range(2)
+    ]
+
+    service = ProcessPoolInferenceService(**config, workers=1)
+    try:
+        pooled = service.predict_many(images)
+        # A batch still in flight when the API shuts down.
+        unfinished, (name, _) = share_image(np.zeros((4, 4), np.uint8))
+        service._blocks.add(unfinished)
+    finally:
+        service.close()
+    local = InferenceService(**config).predict_many(images)
+
+    assert not service._blocks
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=name)
+    assert service.model_info.classes == InferenceService(**config).model_info.classes
+    for a, b in zip(pooled, local):
+        assert a.size == b.size
+        assert len(a.detections) == len(b.detections)
+        for da, db in zip(a.detections, b.detections):
+            assert da.label == db.label
+            assert da.confidence == pytest.approx(db.confidence, rel=1e-5)
+            assert da.bbox.x1 == pytest.approx(db.bbox.x1, abs=1e-3)
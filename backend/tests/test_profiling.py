@@ -0,0 +1,93 @@
+"""Tests for on-demand request profiling."""
+import io
+import pstats
+import time
+
+import pytest
+from PIL import Image
+
+from app import main, profiling
+from app.config import get_settings
+from app.profiling import RequestProfiler
+
+TOKEN = {"X-Profiling-Token": "secret"}
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(name="profiler")
+def profiler_fixture(tmp_path, monkeypatch):
+    """Profiling enabled with token ``secret``, writing into a temp directory."""
+    profiler = RequestProfiler(tmp_path / "profiles")
+    monkeypatch.setattr(get_settings(), "profiling_token", "secret")
+    monkeypatch.setattr(profiling, "get_request_profiler", lambda: profiler)
+    monkeypatch.setattr(main, "get_request_profiler", lambda: profiler)
+    return profiler
+
+
+def test_profiling_endpoints_need_the_token(client, monkeypatch):
+    assert client.get("/admin/profiling", headers=TOKEN).status_code == 404
+
+    monkeypatch.setattr(get_settings(), "profiling_token", "secret")
+
+    assert client.get("/admin/profiling").status_code == 403
+    assert client.get("/admin/profiling", headers={"X-Profiling-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/profiling", headers=TOKEN).status_code == 200
+
+
+def test_next_matching_requests_are_profiled_with_cprofile(client, profiler):
+    armed = client.post("/admin/profiling", json={"route": "/health", "count": 2}, headers=TOKEN)
+    request_ids = [client.get("/health").headers["X-Request-ID"] for _ in range(3)]
+
+    status = client.get("/admin/profiling", headers=TOKEN).json()
+    report = client.get(f"/admin/profiling/{request_ids[0]}", headers=TOKEN).json()
+    raw = client.get(f"/admin/profiling/{request_ids[0]}/profile", headers=TOKEN)
+
+    assert armed.json()["armed"]["remaining"] == 2
+    assert status["armed"] is None
+    assert sorted(p["request_id"] for p in status["profiles"]) == sorted(request_ids[:2])
+    assert (report["path"], report["status_code"], report["profiler"]) == ("/health", 200, "cprofile")
+    assert report["functions"] and {"calls", "self_s", "cumulative_s"} <= set(report["functions"][0])
+    assert raw.status_code == 200
+    stats = pstats.Stats(str(profiler.directory / f"{request_ids[0]}.prof"))
+    assert "health" in {name for _, _, name in stats.stats}
+    missing = client.get(f"/admin/profiling/{request_ids[2]}", headers=TOKEN)
+    assert missing.status_code == 404
+
+
+def test_sampling_profiler_sees_worker_threads(client, inference_env, profiler, monkeypatch):
+    service = main.get_model_service()
+    predict_batch = service.predict_batch
+
+    def slow_predict(images):
+        time.sleep(0.1)
+        return predict_batch(images)
+
+    monkeypatch.setattr(service, "predict_batch", slow_predict)
+    client.post(
+        "/admin/profiling",
+        json={"route": "/infer/single", "profiler": "sampling", "method": "post"},
+        headers=TOKEN,
+    )
+
+    response = client.post("/infer/single", files={"image": ("view.png", _png(), "image/png")})
+    report = profiler.report(response.headers["X-Request-ID"])
+
+    assert report["samples"] > 0
+    assert any("slow_predict" in row["function"] for row in report["functions"])
+    folded = (profiler.directory / report["profile_file"]).read_text()
+    assert "slow_predict" in folded
+
+
+def test_route_templates_and_methods_are_matched(tmp_path):
+    profiler = RequestProfiler(tmp_path)
+    profiler.arm("/analyses/{analysis_id}", count=1, method="get")
+
+    assert profiler.claim({"method": "POST", "path": "/analyses/7"}) is None
+    assert profiler.claim({"method": "GET", "path": "/analyses"}) is None
+    assert profiler.claim({"method": "GET", "path": "/analyses/7"}) == "cprofile"
+    assert profiler.armed is None
@@ -0,0 +1,73 @@
+"""Tests for the model replica pool."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from app.replica_pool import ReplicaPool
+from app.schemas import ImageSize, ViewPrediction
+
+
+class FakeReplica:
+    """Replica stand-in that tracks how many calls overlap in time."""
+
+    model_info = "fake"
+
+    def __init__(self, tracker: dict, delay: float = 0.05):
+        self.tracker = tracker
+        self.delay = delay
+        self.calls = 0
+
+    def predict(self, image):
+        with self.tracker["lock"]:
+            self.tracker["active"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["active"])
+        self.calls += 1
+        time.sleep(self.delay)
+        with self.tracker["lock"]:
+            self.tracker["active"] -= 1
+        return ViewPrediction(size=ImageSize(width=image.width, height=image.height), detections=[])
+
+
+@pytest.fixture
+def tracker():
+    return {"lock": threading.Lock(), "active": 0, "peak": 0}
+
+
+def test_pool_runs_replicas_concurrently(tracker):
+    """Concurrent callers are spread across all replicas."""
+    replicas = [FakeReplica(tracker) for _ in range(3)]
+    pool = ReplicaPool(replicas)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda w: pool.predict(Image.new("L", (w, 4))), range(1, 7)))
+
+    assert [r.size.width for r in results] == list(range(1, 7))
+    assert tracker["peak"] == 3
+    assert [r.calls for r in replicas] == [2, 2, 2]
+    assert pool.stats()["served"] == [2, 2, 2]
+    assert pool.stats()["busy"] == 0
+
+
+def test_pool_prefers_least_loaded_idle_replica(tracker):
+    """Sequential calls rotate over replicas instead of reusing the first one."""
+    replicas = [FakeReplica(tracker, delay=0.0) for _ in range(2)]
+    pool = ReplicaPool(replicas)
+
+    for _ in range(4):
+        pool.predict(Image.new("L", (2, 2)))
+
+    assert [r.calls for r in replicas] == [2, 2]
+
+
+def test_pool_exposes_replica_attributes(tracker):
+    """Attribute lookups fall through to the replicas."""
+    pool = ReplicaPool([FakeReplica(tracker)])
+    assert pool.model_info == "fake"
+
+
+def test_pool_requires_replicas():
+    with pytest.raises(ValueError):
+        ReplicaPool([])
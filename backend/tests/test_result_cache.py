@@ -0,0 +1,166 @@
+"""Tests for the content-hash inference result cache."""
+import io
+
+import pytest
+import redis
+from PIL import Image
+
+from app import main
+from app.result_cache import InferenceResultCache, hash_image_bytes, model_fingerprint
+from app.schemas import BoundingBox, Detection, ImageSize, ModelInfo, ViewPrediction
+
+
+def _prediction(width: int = 10) -> ViewPrediction:
+    return ViewPrediction(
+        size=ImageSize(width=width, height=10),
+        detections=[
+            Detection(
+                bbox=BoundingBox(x1=1, y1=2, x2=3, y2=4),
+                confidence=0.9,
+                label="mass",
+                category="malignant",
+                traffic_light="red",
+            )
+        ],
+    )
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the handful of Redis calls the cache makes."""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+class BrokenRedis:
+    def get(self, key):
+        raise redis.ConnectionError("down")
+
+    def set(self, key, value, ex=None):
+        raise redis.ConnectionError("down")
+
+
+class CountingService:
+    """Model service stand-in that records which views reached the model."""
+
+    def __init__(self, confidence_threshold: float = 0.25):
+        self.calls = []
+        self.model_info = ModelInfo(
+            name="fake",
+            weights="fake.pt",
+            device="cpu",
+            confidence_threshold=confidence_threshold,
+            iou_threshold=None,
+            augmentation=False,
+            classes={0: "mass"},
+            categories={0: "malignant"},
+        )
+
+    def predict_batch(self, images):
+        self.calls.append(sorted(images))
+        return {view: _prediction(image.size[0]) for view, image in images.items()}
+
+
+def _png(width: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, 4), color=width).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_hit_and_miss_counters():
+    cache = InferenceResultCache(max_bytes=1 << 20)
+    key = cache.make_key("abc", "model")
+
+    assert cache.get(key) is None
+    cache.set(key, _prediction())
+    assert cache.get(key) == _prediction()
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["stores"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_memory_tier_evicts_least_recently_used_within_budget():
+    entry_size = len(_prediction().model_dump_json())
+    cache = InferenceResultCache(max_bytes=entry_size * 2)
+    for name in ("a", "b"):
+        cache.set(name, _prediction())
+    cache.get("a")  # "b" becomes the least recently used entry
+    cache.set("c", _prediction())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= entry_size * 2
+
+
+def test_redis_tier_is_shared_and_refills_memory():
+    shared = FakeRedis()
+    writer = InferenceResultCache(max_bytes=1 << 20, redis_client=shared)
+    reader = InferenceResultCache(max_bytes=1 << 20, redis_client=shared)
+
+    writer.set("key", _prediction())
+    assert reader.get("key") == _prediction()
+    assert reader.get("key") == _prediction()
+    assert reader.stats()["redis_hits"] == 1
+    assert reader.stats()["memory_hits"] == 1
+
+
+def test_redis_errors_are_treated_as_misses():
+    cache = InferenceResultCache(max_bytes=1 << 20, redis_client=BrokenRedis())
+    cache.set("key", _prediction())
+    cache.clear()
+
+    assert cache.get("key") is None
+    assert cache.stats()["redis_errors"] == 2
+
+
+def test_fingerprint_changes_with_model_configuration():
+    assert model_fingerprint(CountingService(0.25)) == model_fingerprint(CountingService(0.25))
+    assert model_fingerprint(CountingService(0.25)) != model_fingerprint(CountingService(0.5))
+
+
+def test_hash_matches_stored_file_hash_algorithm():
+    assert hash_image_bytes(b"abc") == (
+        "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+    )
+
+
+def test_cache_hits_skip_decode_and_model(monkeypatch, predict_stored):
+    cache = InferenceResultCache(max_bytes=1 << 20)
+    monkeypatch.setattr(main, "get_result_cache", lambda: cache)
+    service = CountingService()
+
+    first, _ = predict_stored(service, {"cc": _png(5), "mlo": _png(6)})
+    # "cc" repeats; the undecodable "mlo" bytes would fail if they were decoded.
+    cache.set(
+        cache.make_key(hash_image_bytes(b"not an image"), main._result_fingerprint(service)),
+        _prediction(7),
+    )
+    second, files = predict_stored(service, {"cc": _png(5), "mlo": b"not an image", "x": _png(8)})
+
+    assert service.calls == [["cc", "mlo"], ["x"]]
+    assert second["cc"] == first["cc"]
+    assert list(second) == ["cc", "mlo", "x"]
+    assert second["mlo"].size.width == 7
+    thumbnails = {view: main.file_manager.get_file_path(info["thumbnail_path"]) for view, info in files.items()}
+    assert thumbnails["x"].exists()
+    # Hits are not decoded, so their thumbnails are only made when first requested.
+    assert not thumbnails["cc"].exists()
+    assert main.file_manager.ensure_thumbnail(thumbnails["cc"])
+    assert Image.open(thumbnails["cc"]).size == (5, 4)
+
+
+def test_invalid_image_miss_still_rejected(monkeypatch, predict_stored):
+    monkeypatch.setattr(main, "get_result_cache", lambda: None)
+    with pytest.raises(main.HTTPException) as exc_info:
+        predict_stored(CountingService(), {"cc": b"nope"})
+    assert exc_info.value.status_code == 400
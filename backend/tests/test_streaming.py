@@ -0,0 +1,74 @@
+"""Tests for the streamed multi-view inference endpoint."""
+import io
+import json
+import time
+
+from PIL import Image
+
+from app import main
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png(width: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _files(overrides=None):
+    files = {view: (f"{view}.png", _png(8 + index), "image/png") for index, view in enumerate(VIEWS)}
+    files.update(overrides or {})
+    return files
+
+
+def _parse_sse(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_views_stream_in_completion_order_then_summary(client, session, inference_env):
+    service = main.get_model_service()
+    predict_batch = service.predict_batch
+
+    def slow_lcc(images):
+        if "lcc" in images:
+            time.sleep(0.2)
+        return predict_batch(images)
+
+    service.predict_batch = slow_lcc
+    response = client.post("/infer/multi/stream", files=_files())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["view"] * 4 + ["summary"]
+    assert events[3][1]["view"] == "lcc"
+    assert {payload["view"] for _, payload in events[:4]} == set(VIEWS)
+    assert events[0][1]["prediction"]["detections"][0]["label"] == "mass"
+
+    summary = events[-1][1]
+    assert summary["total_findings"] == 4
+    assert summary["dominant_category"] == "malignant"
+    assert summary["totals"]["category_counts"]["malignant"] == 4
+    analysis = client.get(f"/analyses/{summary['analysis_id']}").json()
+    assert analysis["status"] == "completed"
+    assert len(analysis["images"]) == 4
+
+
+def test_ndjson_format_and_error_event(client, session, inference_env):
+    response = client.post(
+        "/infer/multi/stream?format=ndjson",
+        files=_files({"rmlo": ("rmlo.png", b"not an image", "image/png")}),
+    )
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["event"] == "error"
+    assert "rmlo" in events[-1]["detail"]
+    session.expire_all()
+    status_body = client.get(f"/analyses/{events[-1]['analysis_id']}/status").json()
+    assert status_body["status"] == "failed"
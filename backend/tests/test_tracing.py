@@ -0,0 +1,124 @@
+"""Tests for request tracing."""
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from PIL import Image
+
+from app import tracing
+
+VIEWS = ("lcc", "rcc", "lmlo", "rmlo")
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 6), color=100).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(name="trace_file")
+def trace_file_fixture(tmp_path, monkeypatch):
+    """Export spans to a JSON-lines file for the duration of a test."""
+    exporter = tracing.JsonlExporter(tmp_path / "traces.jsonl")
+    monkeypatch.setattr(tracing, "get_exporter", lambda: exporter)
+
+    def read():
+        exporter.flush()
+        with open(exporter.path, encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle]
+
+    return read
+
+
+def _ancestors(span, by_id):
+    while span["parent_id"] in by_id:
+        span = by_id[span["parent_id"]]
+        yield span
+
+
+def test_multi_view_trace_nests_spans_across_threads(client, inference_env, trace_file):
+    response = client.post(
+        "/infer/multi", files={view: (f"{view}.png", _png(), "image/png") for view in VIEWS}
+    )
+
+    spans = trace_file()
+    assert response.status_code == 200
+    by_id = {span["span_id"]: span for span in spans}
+    (root,) = [span for span in spans if span["parent_id"] is None]
+    assert root["name"] == "POST /infer/multi"
+    assert root["trace_id"] == response.headers["X-Request-ID"].replace("-", "")
+    assert {span["trace_id"] for span in spans} == {root["trace_id"]}
+
+    names = [span["name"] for span in spans]
+    assert sorted(s["attributes"]["view"] for s in spans if s["name"] == "save_upload") == sorted(VIEWS)
+    assert sorted(s["attributes"]["view"] for s in spans if s["name"] == "decode") == sorted(VIEWS)
+    assert {"predict", "thumbnail", "complete_analysis", "commit"} <= set(names)
+    for span in spans:
+        assert span is root or root in _ancestors(span, by_id)
+    decode = next(span for span in spans if span["name"] == "decode")
+    assert decode["thread"] != root["thread"]
+    commit = next(span for span in spans if span["name"] == "commit")
+    assert by_id[commit["parent_id"]]["name"] == "complete_analysis"
+
+
+def test_queued_job_continues_the_request_trace(client, inference_env, trace_file):
+    response = client.post(
+        "/infer/multi",
+        params={"async": "true"},
+        files={view: (f"{view}.png", _png(), "image/png") for view in VIEWS},
+    )
+    inference_env.join()
+
+    spans = trace_file()
+    assert response.status_code == 202
+    job = next(span for span in spans if span["name"] == "inference_job")
+    request = next(span for span in spans if span["parent_id"] is None)
+    assert job["trace_id"] == request["trace_id"]
+    assert job["parent_id"] == request["span_id"]
+    assert job["thread"].startswith("inference-job")
+
+
+def test_spans_are_no_ops_without_a_trace(monkeypatch):
+    monkeypatch.setattr(tracing, "get_exporter", lambda: None)
+    with tracing.trace("request") as root, tracing.span("child") as child:
+        assert root is None and child is None
+        assert tracing.current_traceparent() is None
+
+
+def test_otlp_exporter_posts_json_spans():
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, json.loads(body)))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        exporter = tracing.OtlpExporter(f"http://127.0.0.1:{server.server_port}", "test-service")
+        root = tracing.Span("root", "ab" * 16, None, {"views": 4})
+        child = tracing.Span("decode", root.trace_id, root.span_id, {"view": "lcc"})
+        child.error = "ValueError: bad"
+        for span in (child, root):
+            span.end_ns = span.start_ns + 1000
+            exporter.export(span)
+        exporter.flush()
+    finally:
+        server.shutdown()
+
+    (path, payload), = received
+    assert path == "/v1/traces"
+    resource = payload["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "test-service"}
+    decode, top = resource["scopeSpans"][0]["spans"]
+    assert decode["parentSpanId"] == top["spanId"] and "parentSpanId" not in top
+    assert decode["status"] == {"code": 2, "message": "ValueError: bad"}
+    assert {"key": "views", "value": {"intValue": "4"}} in top["attributes"]
@@ -0,0 +1,131 @@
+"""Tests for the Redis stream job queue and inference worker."""
+import pytest
+
+from app.exceptions import DatabaseError, ServiceUnavailableError
+from app.jobs import InferenceJob, RedisJobQueue
+from app.worker import RedisInferenceWorker
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class Recorder:
+    """Batch handler stand-in that records jobs and returns preset errors."""
+
+    def __init__(self, errors=None):
+        self.batches = []
+        self.dead = []
+        self.errors = errors or {}
+
+    def __call__(self, jobs):
+        self.batches.append([job.analysis_id for job in jobs])
+        return [self.errors.get(job.analysis_id) for job in jobs]
+
+    def dead_letter(self, job, reason):
+        self.dead.append((job.analysis_id, reason))
+
+
+@pytest.fixture(name="client")
+def redis_client_fixture():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def _job(analysis_id: int) -> InferenceJob:
+    return InferenceJob(
+        analysis_id=analysis_id, mode="single", files={"image": {"file_path": "x.png"}}
+    )
+
+
+def _worker(client, recorder, consumer="w1", **kwargs) -> RedisInferenceWorker:
+    options = {"batch_size": 4, "block_ms": 1, "visibility_timeout_ms": 60_000, **kwargs}
+    return RedisInferenceWorker(
+        client, recorder, recorder.dead_letter, consumer=consumer, **options
+    )
+
+
+def test_jobs_round_trip_through_the_stream(client):
+    queue = RedisJobQueue(client, max_queue=10)
+    queue.ensure_group()
+    queue.ensure_group()  # idempotent
+    job = _job(7)
+    queue.submit(job)
+
+    recorder = Recorder()
+    assert _worker(client, recorder).run_once() == 1
+
+    assert recorder.batches == [[7]]
+    assert client.xlen(queue.stream) == 0
+    assert queue.stats()["submitted"] == 1
+    assert InferenceJob.from_message(job.to_message()) == job
+
+
+def test_worker_processes_jobs_in_batches(client):
+    queue = RedisJobQueue(client, max_queue=10)
+    queue.ensure_group()
+    for analysis_id in range(1, 6):
+        queue.submit(_job(analysis_id))
+
+    recorder = Recorder()
+    worker = _worker(client, recorder, batch_size=3)
+    while worker.run_once():
+        pass
+
+    assert recorder.batches == [[1, 2, 3], [4, 5]]
+    assert client.xlen(queue.stream) == 0
+
+
+def test_full_stream_rejects_submissions(client):
+    queue = RedisJobQueue(client, max_queue=2)
+    queue.ensure_group()
+    queue.submit(_job(1))
+    queue.submit(_job(2))
+
+    assert queue.full()
+    with pytest.raises(ServiceUnavailableError):
+        queue.submit(_job(3))
+    assert queue.stats()["rejected"] == 1
+    assert queue.stats()["queued"] == 2
+
+
+def test_jobs_of_a_crashed_worker_are_redelivered(client):
+    queue = RedisJobQueue(client, max_queue=10)
+    queue.ensure_group()
+    queue.submit(_job(1))
+
+    crashed = _worker(client, Recorder(), consumer="crashed")
+    assert len(crashed._read_new()) == 1  # read, then died before acknowledging
+    assert queue.stats()["running"] == 1
+
+    recorder = Recorder()
+    assert _worker(client, recorder, consumer="w2", visibility_timeout_ms=60_000).run_once() == 0
+    assert _worker(client, recorder, consumer="w2", visibility_timeout_ms=0).run_once() == 1
+    assert recorder.batches == [[1]]
+    assert client.xlen(queue.stream) == 0
+
+
+def test_repeatedly_interrupted_job_is_dead_lettered(client):
+    queue = RedisJobQueue(client, max_queue=10)
+    queue.ensure_group()
+    queue.submit(_job(1))
+    _worker(client, Recorder(), consumer="a")._read_new()
+    _worker(client, Recorder(), consumer="b", visibility_timeout_ms=0)._claim_stale()
+
+    recorder = Recorder()
+    _worker(client, recorder, consumer="c", visibility_timeout_ms=0, max_deliveries=2).run_once()
+
+    assert recorder.batches == []
+    assert recorder.dead == [(1, "Inference abandoned after 2 interrupted attempts")]
+    assert client.xlen(queue.stream) == 0
+
+
+def test_unrecorded_failures_stay_pending(client):
+    queue = RedisJobQueue(client, max_queue=10)
+    queue.ensure_group()
+    queue.submit(_job(1))
+    queue.submit(_job(2))
+
+    recorder = Recorder(errors={1: DatabaseError("db down"), 2: RuntimeError("bad image")})
+    _worker(client, recorder).run_once()
+
+    # Job 2 was recorded as FAILED and acknowledged; job 1 awaits redelivery.
+    assert client.xlen(queue.stream) == 1
+    assert queue.stats()["running"] == 1